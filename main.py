@@ -1,11 +1,85 @@
+import os
+
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from pathlib import Path
+
 from rich.console import Console
 
+from scripts.programmer_node import programmer_node
+from src.models import Plan
+from src.sandbox import SandboxPool
+from src.modules import describe_dataframe, generate_plan, stream_report
+from src.utils import start_run
+
 console = Console()
 
 
 def main():
     console.print("[bold cyan]== データ分析AIエージェント 起動 ==[/]")
 
+    data_file = os.getenv("DATA_FILE", "data/sample.csv")
+    model = os.getenv("OPENAI_MODEL", "gpt-4o-mini-2024-07-18")
+    user_request = os.getenv(
+        "USER_REQUEST", "scoreを最大化するための広告キャンペーンを検討したい"
+    )
+    output_dir = Path("artifacts") / "report"
+    output_dir.mkdir(parents=True, exist_ok=True)
+    run_ledger = start_run()
+
+    # 計画生成の間にサンドボックスを起動・準備しておく
+    # （計画生成が失敗・中断しても with を抜けるときに必ず破棄する）
+    with SandboxPool.from_env(data_file) as pool:
+        data_info = describe_dataframe(file_object=data_file)
+        with console.status("分析計画を作成しています..."):
+            plan: Plan = generate_plan(
+                data_info=data_info,
+                user_request=user_request,
+                model=model,
+            ).content
+        for idx, task in enumerate(plan.tasks):
+            console.print(f"[bold]仮説{idx}:[/] {task.hypothesis}")
+
+        # 各タスクの実行
+        with (
+            console.status("分析タスクを実行しています..."),
+            ThreadPoolExecutor() as executor,
+        ):
+            futures = [
+                executor.submit(
+                    programmer_node,
+                    data_file=data_file,
+                    user_request=task.hypothesis,
+                    model=model,
+                    process_id=f"sample-{idx}",
+                    idx=idx,
+                    data_info=data_info,
+                    pool=pool,
+                )
+                for idx, task in enumerate(plan.tasks)
+            ]
+            _results = [future.result() for future in as_completed(futures)]
+    process_data_threads = [
+        data_threads[-1]
+        for _, data_threads in sorted(_results, key=lambda x: x[0])
+    ]
+
+    # レポートを生成しながら逐次表示
+    console.rule("[bold]分析レポート")
+    for chunk in stream_report(
+        data_info=data_info,
+        user_request=user_request,
+        process_data_threads=process_data_threads,
+        model=model,
+        output_dir=str(output_dir),
+    ):
+        console.print(chunk, end="", markup=False, highlight=False)
+    console.print()
+    console.rule(f"[bold green]完了: {output_dir / 'report.md'}")
+
+    # ステージ別のトークン・コスト・処理時間
+    console.print(run_ledger.summary_table(), markup=False)
+    run_ledger.export_jsonl(output_dir / "ledger.jsonl")
+
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,57 @@
+import asyncio
+import io
+import sys
+
+from pathlib import Path
+from loguru import logger
+
+
+root_dir = Path(__file__).resolve().parents[1]
+sys.path.append(str(root_dir))
+
+
+from src.llms.apis.client import aclose_clients  # noqa: E402
+from src.modules import agenerate_plan, describe_dataframe  # noqa: E402
+
+
+async def run(data_info: str, user_requests: list[str]) -> None:
+    # 1つのイベントループで複数の計画生成を並行実行する
+    tasks = [
+        asyncio.create_task(
+            agenerate_plan(
+                data_info=data_info,
+                user_request=user_request,
+                model="gpt-4o-mini-2024-07-18",
+            )
+        )
+        for user_request in user_requests
+    ]
+    try:
+        responses = await asyncio.gather(*tasks)
+    finally:
+        # 途中で失敗・中断した場合は残りのタスクをキャンセルする
+        for task in tasks:
+            task.cancel()
+        await aclose_clients()
+
+    for user_request, response in zip(user_requests, responses):
+        logger.info(f"{user_request=}")
+        logger.info(response.content.model_dump_json(indent=4))
+
+
+def main() -> None:
+    data_path = "data/sample.csv"
+    user_requests = [
+        "scoreを最大化するための広告キャンペーンを検討したい",
+        "購入金額が高いユーザーの特徴を知りたい",
+        "チャネルごとのコンバージョン率を比較したい",
+    ]
+
+    with open(data_path, "rb") as fi:
+        file_object = io.BytesIO(fi.read())
+    data_info = describe_dataframe(file_object=file_object)
+    asyncio.run(run(data_info, user_requests))
+
+
+if __name__ == "__main__":
+    main()
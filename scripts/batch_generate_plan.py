@@ -0,0 +1,73 @@
+import argparse
+import io
+import sys
+
+from pathlib import Path
+from loguru import logger
+
+
+root_dir = Path(__file__).resolve().parents[1]
+sys.path.append(str(root_dir))
+
+from src.llms.apis.batch import (  # noqa: E402
+    LocalBatchServer,
+    forward_to_api,
+    run_batch,
+)
+from src.modules import describe_dataframe, plan_batch_request  # noqa: E402
+from src.utils import start_run  # noqa: E402
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--data_file", type=str, default="data/sample.csv")
+    parser.add_argument("--model", type=str, default="gpt-4o-mini-2024-07-18")
+    parser.add_argument("--poll_interval", type=float, default=30.0)
+    parser.add_argument(
+        "--local",
+        action="store_true",
+        help="Batch APIの代わりにローカルのスタンドイン（モック応答）を使う",
+    )
+    parser.add_argument(
+        "--forward",
+        action="store_true",
+        help="--local のリクエストを通常のAPIに転送する（通常料金で課金される）",
+    )
+    args = parser.parse_args()
+    run_ledger = start_run("batch_generate_plan")
+
+    user_requests = [
+        "scoreを最大化するための広告キャンペーンを検討したい",
+        "購入金額が高いユーザーの特徴を知りたい",
+        "チャネルごとのコンバージョン率を比較したい",
+    ]
+    with open(args.data_file, "rb") as fi:
+        file_object = io.BytesIO(fi.read())
+    data_info = describe_dataframe(file_object=file_object)
+
+    requests = [
+        plan_batch_request(
+            custom_id=f"plan-{idx}",
+            data_info=data_info,
+            user_request=user_request,
+            model=args.model,
+        )
+        for idx, user_request in enumerate(user_requests)
+    ]
+    server = (
+        LocalBatchServer(handler=forward_to_api if args.forward else None)
+        if args.local
+        else None
+    )
+    responses = run_batch(
+        requests,
+        server=server,
+        poll_interval=1.0 if args.local else args.poll_interval,
+    )
+    for custom_id, response in sorted(responses.items()):
+        logger.info(f"{custom_id}: {response.content.model_dump_json(indent=4)}")
+    logger.info("\n" + run_ledger.summary_table())
+
+
+if __name__ == "__main__":
+    main()
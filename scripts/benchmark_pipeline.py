@@ -0,0 +1,186 @@
+"""モックLLMでパイプラインのオーバーヘッドを計測する
+
+ネットワークを使わず、テンプレート展開・データ概要作成・画像処理などの
+ローカル処理時間をステージ別に出力する。--sandbox local を指定すると、
+生成したコードをローカルのサンドボックスで実際に実行する。
+
+    python scripts/benchmark_pipeline.py --n-tasks 8 --latency 0.2
+    python scripts/benchmark_pipeline.py --sandbox local
+"""
+import argparse
+import base64
+import io
+import os
+import sys
+import tempfile
+import time
+
+from collections import defaultdict
+from collections.abc import Iterator
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from pathlib import Path
+
+from PIL import Image
+from tabulate import tabulate
+
+
+root_dir = Path(__file__).resolve().parents[1]
+sys.path.append(str(root_dir))
+
+# import より前に設定する（バックエンドとレート制限は環境変数から決まる）
+os.environ["LLM_BACKEND"] = "mock"
+os.environ.setdefault("LLM_RATE_LIMIT", "0")
+os.environ.setdefault("LLM_CACHE_MODE", "off")
+
+from src.llms.apis.backend import register_backend  # noqa: E402
+from src.llms.apis.mock import MockBackend  # noqa: E402
+from src.models import DataThread  # noqa: E402
+from src.modules import (  # noqa: E402
+    describe_dataframe,
+    execute_code,
+    generate_code,
+    generate_plan,
+    generate_report,
+    generate_review,
+)
+from src.sandbox import LocalSandbox, prepare_sandbox  # noqa: E402
+from src.utils import start_run  # noqa: E402
+
+
+timings: dict[str, list[float]] = defaultdict(list)
+
+
+@contextmanager
+def timer(stage: str) -> Iterator[None]:
+    started_at = time.perf_counter()
+    try:
+        yield
+    finally:
+        timings[stage].append(time.perf_counter() - started_at)
+
+
+def _dummy_png(size: int = 800) -> str:
+    buf = io.BytesIO()
+    Image.new("RGB", (size, size), (31, 119, 180)).save(buf, format="PNG")
+    return base64.b64encode(buf.getvalue()).decode()
+
+
+def _execute_local(data_file: str, code: str, idx: int) -> DataThread:
+    with timer("sandbox_setup"):
+        sandbox = LocalSandbox.create()
+        prepare_sandbox(sandbox, data_file)
+    with sandbox, timer("execute_code"):
+        return execute_code(
+            sandbox, process_id=f"bench-{idx}", thread_id=0, code=code
+        )
+
+
+def _run_task(
+    data_info: str,
+    hypothesis: str,
+    model: str,
+    idx: int,
+    png: str,
+    data_file: str | None = None,
+) -> DataThread:
+    with timer("generate_code"):
+        program = generate_code(
+            data_info=data_info,
+            user_request=hypothesis,
+            remote_save_dir=f"outputs/bench-{idx}",
+            model=model,
+        ).content
+    if data_file is not None:
+        data_thread = _execute_local(data_file, program.code, idx)
+        data_thread.user_request = hypothesis
+    else:
+        # サンドボックスの代わりに固定の実行結果を与える
+        data_thread = DataThread(
+            process_id=f"bench-{idx}",
+            thread_id=0,
+            user_request=hypothesis,
+            code=program.code,
+            stdout="(1000, 5)",
+            results=[{"type": "png", "content": png}],
+        )
+    with timer("generate_review"):
+        review = generate_review(
+            data_info=data_info,
+            user_request=hypothesis,
+            data_thread=data_thread,
+            has_results=True,
+            remote_save_dir=f"outputs/bench-{idx}",
+            model=model,
+        ).content
+    data_thread.observation = review.observation
+    data_thread.is_completed = review.is_completed
+    return data_thread
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--data-file", default="data/sample.csv")
+    parser.add_argument("--model", default="gpt-4o-mini-2024-07-18")
+    parser.add_argument("--n-tasks", type=int, default=4)
+    parser.add_argument("--latency", type=float, default=0.0)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--sandbox", choices=["none", "local"], default="none")
+    args = parser.parse_args()
+    register_backend("mock", MockBackend(latency=args.latency))
+
+    run_ledger = start_run("benchmark")
+    png = _dummy_png()
+    user_request = "scoreを最大化するための広告キャンペーンを検討したい"
+    for _ in range(args.repeat):
+        with timer("describe"):
+            with open(args.data_file, "rb") as fi:
+                data_info = describe_dataframe(io.BytesIO(fi.read()))
+        with timer("generate_plan"):
+            plan = generate_plan(
+                data_info=data_info,
+                user_request=user_request,
+                model=args.model,
+            ).content
+        hypotheses = [
+            plan.tasks[i % len(plan.tasks)].hypothesis
+            for i in range(args.n_tasks)
+        ]
+        with timer("tasks"), ThreadPoolExecutor() as executor:
+            data_threads = list(
+                executor.map(
+                    lambda item, data_info=data_info: _run_task(
+                        data_info,
+                        item[1],
+                        args.model,
+                        item[0],
+                        png,
+                        args.data_file if args.sandbox == "local" else None,
+                    ),
+                    enumerate(hypotheses),
+                )
+            )
+        with timer("generate_report"), tempfile.TemporaryDirectory() as tmp:
+            generate_report(
+                data_info=data_info,
+                user_request=user_request,
+                process_data_threads=data_threads,
+                model=args.model,
+                output_dir=tmp,
+            )
+
+    rows = [
+        {
+            "stage": stage,
+            "calls": len(values),
+            "mean_ms": 1000 * sum(values) / len(values),
+            "max_ms": 1000 * max(values),
+        }
+        for stage, values in timings.items()
+    ]
+    print(tabulate(rows, headers="keys", tablefmt="github", floatfmt=".2f"))
+    print(run_ledger.summary_table())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,47 @@
+import argparse
+import sys
+
+from pathlib import Path
+
+from e2b import Template, default_build_logger
+
+
+root_dir = Path(__file__).resolve().parents[1]
+sys.path.append(str(root_dir))
+
+
+from src.sandbox import COMMON_LIBRARIES, TEMPLATE_NAME
+
+
+def main() -> None:
+    """分析ライブラリを固定バージョンで導入済みのサンドボックステンプレートをビルドする
+
+    ビルド後は SANDBOX_TEMPLATE にテンプレート名を設定すると、
+    起動時の pip install が省略される。
+    """
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--name", type=str, default=TEMPLATE_NAME)
+    parser.add_argument("--base", type=str, default="code-interpreter-v1")
+    parser.add_argument("--cpu_count", type=int, default=2)
+    parser.add_argument("--memory_mb", type=int, default=2048)
+    parser.add_argument("--skip_cache", action="store_true")
+    args = parser.parse_args()
+
+    template = (
+        Template()
+        .from_template(args.base)
+        .pip_install(["--no-cache-dir", *COMMON_LIBRARIES])
+    )
+    build_info = Template.build(
+        template,
+        args.name,
+        cpu_count=args.cpu_count,
+        memory_mb=args.memory_mb,
+        skip_cache=args.skip_cache,
+        on_build_logs=default_build_logger(),
+    )
+    print(f"SANDBOX_TEMPLATE={build_info.name}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,11 +1,15 @@
 #!/usr/bin/env python
 # -*- coding: utf-8 -*-
 import os
+import sys
 from pathlib import Path
 from datetime import datetime
 from rich.console import Console
 from rich.panel import Panel
-from e2b_code_interpreter import Sandbox
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+
+from src.sandbox import COMMON_LIBRARIES, create_sandbox, install_libraries  # noqa: E402
 
 ARTIFACTS = Path("artifacts")
 REMOTE_PNG = "/workspace/output.png"
@@ -34,15 +38,17 @@ def main():
         console.print("[red]E2B_API_KEY が未設定です (.env を確認)[/]")
         raise SystemExit(1)
 
-    with Sandbox.create() as sbx:
-        # 作業ディレクトリ & 依存
+    with create_sandbox() as sbx:
+        # 作業ディレクトリ & 依存（インストール済みなら省略）
         sbx.run_code("import os; os.makedirs('/workspace', exist_ok=True)")
-        install_cmd = (
-            "import subprocess; "
-            "subprocess.run(['pip','install','--quiet',"
-            "'numpy','pandas','matplotlib'], check=False)"
+        install_libraries(
+            sbx,
+            [
+                lib
+                for lib in COMMON_LIBRARIES
+                if lib.split("==")[0] in ("numpy", "pandas", "matplotlib")
+            ],
         )
-        sbx.run_code(install_cmd)
 
         # ---- サンドボックスで実行するコード（stdoutを必ず出す）----
         code = r"""
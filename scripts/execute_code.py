@@ -6,15 +6,15 @@ root_dir = Path(__file__).resolve().parents[1]
 sys.path.append(str(root_dir))
 
 from dotenv import load_dotenv  # noqa: E402
-from e2b_code_interpreter import Sandbox  # noqa: E402
 
 from src.modules import execute_code, set_dataframe  # noqa: E402
+from src.sandbox import create_sandbox  # noqa: E402
 
 load_dotenv()
 
 
 def main() -> None:
-    with Sandbox.create() as sandbox:
+    with create_sandbox() as sandbox:
         with open("data/sample.csv", "rb") as fi:
             set_dataframe(sandbox=sandbox, file_object=fi)
         data_thread = execute_code(
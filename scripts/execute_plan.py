@@ -12,7 +12,10 @@ root_dir = Path(__file__).resolve().parents[1]
 sys.path.append(str(root_dir))
 
 from scripts.programmer_node import programmer_node  # noqa: E402
+from src.llms.apis.hedge import latency_snapshot  # noqa: E402
+from src.llms.apis.rate_limit import get_rate_limiter  # noqa: E402
 from src.models import Plan  # noqa: E402
+from src.utils import start_run  # noqa: E402
 from src.modules import (  # noqa: E402
     describe_dataframe,
     generate_plan,
@@ -24,6 +27,7 @@ def main() -> None:
     template_file = "src/prompts/generate_plan.jinja"
     user_request = "scoreを最大化するための広告キャンペーンを検討したい"
     output_dir = "outputs/tmp"
+    run_ledger = start_run("execute_plan")
     Path(output_dir).mkdir(parents=True, exist_ok=True)
 
     with open(data_file, "rb") as fi:
@@ -113,6 +117,19 @@ def main() -> None:
     else:
         print("\n保存されたファイルはありません。")
 
+    # レート制限の待ち時間を確認
+    rate_limiter = get_rate_limiter()
+    if rate_limiter is not None:
+        for metrics in rate_limiter.metrics():
+            logger.info(metrics.model_dump_json())
+    # ヘッジ送信の閾値調整用にモデル別のレイテンシ分布を出力
+    for model, histogram in latency_snapshot().items():
+        logger.info(f"{model=} {histogram=}")
+
+    # ステージ別のトークン・コスト・処理時間
+    logger.info("\n" + run_ledger.summary_table())
+    run_ledger.export_jsonl(f"{output_dir}/ledger.jsonl")
+
 
 if __name__ == "__main__":
     main()
@@ -1,9 +1,9 @@
 import argparse
-import io
 import sys
 
 from concurrent.futures import ThreadPoolExecutor, as_completed
 from pathlib import Path
+from loguru import logger
 
 
 root_dir = Path(__file__).resolve().parents[1]
@@ -11,11 +11,16 @@ sys.path.append(str(root_dir))
 
 
 from scripts.programmer_node import programmer_node
+from src.llms.apis.hedge import latency_snapshot
+from src.llms.apis.rate_limit import get_rate_limiter
 from src.models import Plan
+from src.sandbox import SandboxPool
+from src.utils import start_run
 from src.modules import (
     describe_dataframe,
     generate_plan,
     generate_report,
+    stream_report,
 )
 
 
@@ -28,47 +33,76 @@ def main() -> None:
         "--user_request",
         type=str,
         default="scoreを最大化するための広告キャンペーンを検討したい"),
+    parser.add_argument("--stream", action="store_true")
     args = parser.parse_args()
+    run_ledger = start_run(args.process_id)
 
     output_dir = Path("artifacts") / "report"
     output_dir.mkdir(parents=True, exist_ok=True)
 
-    # 計画生成
-    with open(args.data_file, "rb") as fi:
-        file_object = io.BytesIO(fi.read())
-    data_info = describe_dataframe(file_object=file_object)
-    response = generate_plan(
-        data_info=data_info,
-        user_request=args.user_request,
-        model=args.model,
-    )
-    plan: Plan = response.content
-
-    with ThreadPoolExecutor() as executor:
-        futures = [
-            executor.submit(
-                programmer_node,
-                data_file=args.data_file,
-                user_request=task.hypothesis,
-                model=args.model,
-                process_id=f"sample-{idx}",
-                idx=idx,
-            )
-            for idx, task in enumerate(plan.tasks)
-        ]
-        _results = [future.result() for future in as_completed(futures)]
+    # 計画生成の間にサンドボックスを起動・準備しておく
+    # （計画生成が失敗・中断しても with を抜けるときに必ず破棄する）
+    with SandboxPool.from_env(args.data_file) as pool:
+        data_info = describe_dataframe(file_object=args.data_file)
+        response = generate_plan(
+            data_info=data_info,
+            user_request=args.user_request,
+            model=args.model,
+        )
+        plan: Plan = response.content
+
+        with ThreadPoolExecutor() as executor:
+            futures = [
+                executor.submit(
+                    programmer_node,
+                    data_file=args.data_file,
+                    user_request=task.hypothesis,
+                    model=args.model,
+                    process_id=f"sample-{idx}",
+                    idx=idx,
+                    data_info=data_info,
+                    pool=pool,
+                )
+                for idx, task in enumerate(plan.tasks)
+            ]
+            _results = [future.result() for future in as_completed(futures)]
 
     process_data_threads = []
     for _, data_threads in sorted(_results, key=lambda x: x[0]):
         process_data_threads.append(data_threads[-1])
 
-    response = generate_report(
-        data_info=data_info,
-        user_request=args.user_request,
-        process_data_threads=process_data_threads,
-        model=args.model,
-        output_dir=str(output_dir),
-    )
+    if args.stream:
+        # レポートを生成しながら標準出力へ逐次表示
+        for chunk in stream_report(
+            data_info=data_info,
+            user_request=args.user_request,
+            process_data_threads=process_data_threads,
+            model=args.model,
+            output_dir=str(output_dir),
+        ):
+            print(chunk, end="", flush=True)
+        print()
+    else:
+        response = generate_report(
+            data_info=data_info,
+            user_request=args.user_request,
+            process_data_threads=process_data_threads,
+            model=args.model,
+            output_dir=str(output_dir),
+        )
+
+    # レート制限の待ち時間を確認
+    rate_limiter = get_rate_limiter()
+    if rate_limiter is not None:
+        for metrics in rate_limiter.metrics():
+            logger.info(metrics.model_dump_json())
+    # ヘッジ送信の閾値調整用にモデル別のレイテンシ分布を出力
+    for model, histogram in latency_snapshot().items():
+        logger.info(f"{model=} {histogram=}")
+
+    # ステージ別のトークン・コスト・処理時間
+    logger.info("\n" + run_ledger.summary_table())
+    run_ledger.export_jsonl(output_dir / "ledger.jsonl")
 
 
 if __name__ == "__main__":
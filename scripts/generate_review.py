@@ -7,7 +7,6 @@ root_dir = Path(__file__).resolve().parents[1]
 sys.path.append(str(root_dir))
 
 from dotenv import load_dotenv  # noqa: E402
-from e2b_code_interpreter import Sandbox  # noqa: E402
 from loguru import logger  # noqa: E402
 
 from src.modules import (  # noqa: E402
@@ -16,6 +15,7 @@ from src.modules import (  # noqa: E402
     generate_review,
     set_dataframe,
 )
+from src.sandbox import create_sandbox  # noqa: E402
 
 load_dotenv()
 
@@ -33,7 +33,7 @@ def main() -> None:
         template_file=template_file,
     )
 
-    with Sandbox.create() as sandbox:
+    with create_sandbox() as sandbox:
         with open(data_path, "rb") as fi:
             set_dataframe(sandbox=sandbox, file_object=fi)
         data_thread = execute_code(
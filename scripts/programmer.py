@@ -8,9 +8,11 @@ root_dir = Path(__file__).resolve().parents[1]
 sys.path.append(str(root_dir))
 
 from scripts.programmer_node import programmer_node  # noqa: E402
+from src.utils import start_run  # noqa: E402
 
 
 def main() -> None:
+    run_ledger = start_run("programmer")
     _, data_threads = programmer_node(
         data_file="data/sample.csv",
         user_request="スコアの分布を可視化して",
@@ -68,6 +70,10 @@ def main() -> None:
                     else:
                         print(f"  テキスト {result_idx + 1}: {content}")
 
+    # ステージ別のトークン・コスト・処理時間
+    logger.info("\n" + run_ledger.summary_table())
+    run_ledger.export_jsonl("artifacts/programmer/ledger.jsonl")
+
 
 if __name__ == "__main__":
     main()
@@ -1,17 +1,56 @@
-import io
+import time
+
+from collections.abc import Iterator
+from contextlib import ExitStack, contextmanager
 from pathlib import Path
 
-from e2b_code_interpreter import Sandbox
 from loguru import logger
 
 from src.models import DataThread
+from src.utils import ledger
+from src.utils.ledger import ledger_scope
 from src.modules import (
     describe_dataframe,
     execute_code,
+    known_names,
     generate_code,
     generate_review,
-    set_dataframe,
 )
+from src.sandbox import (
+    ArtifactSync,
+    CodeSandbox,
+    SandboxPool,
+    create_sandbox,
+    prepare_sandbox,
+)
+
+
+@contextmanager
+def _sandbox(
+    data_file: str,
+    pool: SandboxPool | None,
+) -> Iterator[CodeSandbox]:
+    """プールがあれば準備済みのサンドボックスを借り、なければ新規に作成する"""
+    if pool is not None:
+        with pool.lease() as sandbox:
+            yield sandbox
+        return
+    with create_sandbox() as sandbox:
+        prepare_sandbox(sandbox, data_file)
+        yield sandbox
+
+
+def _open_sandbox(
+    stack: ExitStack,
+    data_file: str,
+    pool: SandboxPool | None,
+    remote_save_dir: str,
+    local_dir: Path,
+) -> tuple[CodeSandbox, ArtifactSync]:
+    sandbox = stack.enter_context(_sandbox(data_file, pool))
+    # 出力ディレクトリを作成
+    sandbox.run_code(f"import os; os.makedirs('{remote_save_dir}', exist_ok=True)")
+    return sandbox, ArtifactSync(sandbox, remote_save_dir, local_dir)
 
 
 def programmer_node(
@@ -21,210 +60,188 @@ def programmer_node(
     model: str = "gpt-4o-mini-2024-07-18",
     n_trial: int = 3,
     idx: int = 0,
+    data_info: str | None = None,
+    pool: SandboxPool | None = None,
+    incremental: bool = True,
 ) -> tuple[int, list[DataThread]]:
+    with ledger_scope(process_id=process_id):
+        return idx, _programmer_node(
+            data_file=data_file,
+            user_request=user_request,
+            process_id=process_id,
+            model=model,
+            n_trial=n_trial,
+            data_info=data_info,
+            pool=pool,
+            incremental=incremental,
+        )
+
+
+def _programmer_node(
+    data_file: str,
+    user_request: str,
+    process_id: str,
+    model: str,
+    n_trial: int,
+    data_info: str | None,
+    pool: SandboxPool | None,
+    incremental: bool,
+) -> list[DataThread]:
     template_file = "src/prompts/describe_dataframe.jinja"
     remote_save_dir = f"outputs/{process_id}"
-    with open(data_file, "rb") as fi:
-        file_object = io.BytesIO(fi.read())
-    data_info = describe_dataframe(
-        file_object=file_object,
-        template_file=template_file,
-    )
-    data_threads: list[DataThread] = []
-    with Sandbox.create() as sandbox:
-        # 出力ディレクトリを作成
-        sandbox.run_code(
-            f"import os; os.makedirs('{remote_save_dir}', exist_ok=True)"
+    # 呼び出し元と同じ data_info を使い回すとプロンプトの先頭が全タスクで一致する
+    if data_info is None:
+        # パスを渡すと内容ハッシュがメモ化され、キャッシュ済みなら解析しない
+        started_at = time.time()
+        data_info = describe_dataframe(
+            file_object=data_file,
+            template_file=template_file,
         )
-
-        # 一般的なデータ分析ライブラリをインストール
-        common_libraries = [
-            "statsmodels",
-            "seaborn",
-            "scikit-learn",
-            "scipy",
-        ]
-        install_cmd = (
-            "import subprocess; "
-            "subprocess.run(['pip', 'install', '--quiet', '--upgrade', "
-            + ", ".join([f"'{lib}'" for lib in common_libraries])
-            + "], check=False)"
+        ledger.record("describe", started_at)
+    # artifactsディレクトリのパスを決定
+    # process_idがsample-で始まる場合はplanフォルダに格納
+    if process_id.startswith("sample-"):
+        artifacts_base_dir = Path("artifacts") / "plan"
+    else:
+        artifacts_base_dir = Path("artifacts")
+    data_threads: list[DataThread] = []
+    with ExitStack() as stack:
+        sandbox, artifact_sync = _open_sandbox(
+            stack, data_file, pool, remote_save_dir, artifacts_base_dir / process_id
         )
-        sandbox.run_code(install_cmd)
-        logger.info(f"一般的なライブラリをインストールしました: {common_libraries}")
-
-        with open(data_file, "rb") as fi:
-            set_dataframe(
-                sandbox=sandbox,
-                file_object=fi,
-            )
         for thread_id in range(n_trial):
-            previous_thread = data_threads[-1] if data_threads else None
-            response = generate_code(
-                data_info=data_info,
-                user_request=user_request,
-                previous_thread=previous_thread,
-                model=model,
-                remote_save_dir=remote_save_dir,
-            )
-            program = response.content
-            logger.info(program.model_dump_json())
-
-            data_thread = execute_code(
-                sandbox,
-                process_id=process_id,
-                thread_id=thread_id,
-                code=program.code,
-                user_request=user_request,
-            )
-            if data_thread.stdout:
-                logger.info(f"{data_thread.stdout=}")
-            if data_thread.stderr:
-                # 無視すべき警告をフィルタリング
-                filtered_stderr = data_thread.stderr
-                ignored_warnings = [
-                    "Out of range float values are not JSON compliant",
-                    "FutureWarning",
-                    "Passing `palette` without assigning `hue`",
-                ]
-
-                should_ignore = any(
-                    warning in filtered_stderr for warning in ignored_warnings
+            with ledger_scope(thread_id=thread_id):
+                previous_thread = data_threads[-1] if data_threads else None
+                response = generate_code(
+                    data_info=data_info,
+                    user_request=user_request,
+                    previous_thread=previous_thread,
+                    model=model,
+                    remote_save_dir=remote_save_dir,
                 )
-
-                if should_ignore:
-                    # これらの警告は無視（実行には影響しない）
-                    logger.debug(
-                        "無視可能な警告を検出（無視します）"
-                    )
-                elif filtered_stderr.strip():
-                    # その他のstderrは警告として表示
-                    logger.warning(f"{data_thread.stderr=}")
-            response = generate_review(
-                user_request=user_request,
-                data_info=data_info,
-                data_thread=data_thread,
-                model=model,
-                remote_save_dir=remote_save_dir,
-            )
-            review = response.content
-            logger.info(review.model_dump_json())
-            data_thread.observation = review.observation
-            data_thread.is_completed = review.is_completed
-
-            # artifactsディレクトリのパスを決定
-            # process_idがsample-で始まる場合はplanフォルダに格納
-            if process_id.startswith("sample-"):
-                artifacts_base_dir = Path("artifacts") / "plan"
-            else:
-                artifacts_base_dir = Path("artifacts")
-
-            # サンドボックス内の出力ファイルを取得
-            try:
-                # outputs/{process_id} ディレクトリ内のファイルを取得
-                output_files = sandbox.files.list(remote_save_dir)
-                saved_files = {}
-                for file_info in output_files:
-                    # EntryInfoオブジェクトの属性を確認
-                    # is_file属性がない場合は、is_dir属性で判定するか、
-                    # パスに拡張子があるかで判定
-                    is_file = False
-                    if hasattr(file_info, "is_file"):
-                        is_file = file_info.is_file
-                    elif hasattr(file_info, "is_dir"):
-                        is_file = not file_info.is_dir
-                    else:
-                        # パスに拡張子がある場合はファイルとみなす
-                        file_path = (
-                            getattr(file_info, "path", None)
-                            or getattr(file_info, "name", None)
+                program = response.content
+                logger.info(program.model_dump_json())
+                if program.is_incremental:
+                    logger.info("前回のカーネル状態から続きのセルを実行します")
+
+                # インクリメンタル実行では、再試行に備えてカーネルの変数を要約する
+                data_thread = execute_code(
+                    sandbox,
+                    process_id=process_id,
+                    thread_id=thread_id,
+                    code=program.code,
+                    user_request=user_request,
+                    with_namespace=incremental and thread_id < n_trial - 1,
+                    known=known_names(data_threads),
+                )
+                if data_thread.is_sandbox_broken:
+                    # 打ち切ったセルが動き続けているため、新しいサンドボックスに替える
+                    logger.warning("打ち切ったセルが止まらないため破棄します")
+                    if pool is not None:
+                        pool.mark_broken(sandbox)
+                    stack.close()
+                    if thread_id < n_trial - 1:
+                        sandbox, artifact_sync = _open_sandbox(
+                            stack,
+                            data_file,
+                            pool,
+                            remote_save_dir,
+                            artifacts_base_dir / process_id,
                         )
-                        if file_path:
-                            is_file = "." in Path(file_path).name
+                if data_thread.is_preflight_error:
+                    # 実行もレビューもせず、検出した問題を添えて再生成する
+                    data_thread.observation = (
+                        "実行前の静的チェックで問題が見つかりました。"
+                        "エラー内容を修正したコードを生成してください。"
+                    )
+                    # カーネルの状態は変わっていないので、直前の要約を引き継ぐ
+                    if previous_thread is not None:
+                        data_thread.namespace = previous_thread.namespace
+                    data_threads.append(data_thread)
+                    continue
+                if data_thread.stdout:
+                    logger.info(f"{data_thread.stdout=}")
+                if data_thread.stderr:
+                    # 無視すべき警告をフィルタリング
+                    filtered_stderr = data_thread.stderr
+                    ignored_warnings = [
+                        "Out of range float values are not JSON compliant",
+                        "FutureWarning",
+                        "Passing `palette` without assigning `hue`",
+                    ]
+
+                    should_ignore = any(
+                        warning in filtered_stderr for warning in ignored_warnings
+                    )
 
-                    if is_file:
-                        file_path = (
-                            getattr(file_info, "path", None)
-                            or getattr(file_info, "name", None)
+                    if should_ignore:
+                        # これらの警告は無視（実行には影響しない）
+                        logger.debug(
+                            "無視可能な警告を検出（無視します）"
                         )
-                        if not file_path:
-                            continue
-
-                        try:
-                            # 画像ファイルは実行結果から保存されるため、ここではスキップ
-                            file_ext = Path(file_path).suffix.lower()
-                            image_exts = [
-                                ".png", ".jpg", ".jpeg", ".gif", ".bmp"
-                            ]
-                            if file_ext in image_exts:
-                                logger.debug(
-                                    "画像ファイルは実行結果から保存されるため"
-                                    f"スキップ: {file_path}"
-                                )
-                                continue
-
-                            file_content = sandbox.files.read(file_path)
-                            # ローカルのartifactsディレクトリに保存
-                            artifacts_dir = artifacts_base_dir / process_id
-                            artifacts_dir.mkdir(parents=True, exist_ok=True)
-                            local_path = artifacts_dir / Path(file_path).name
-
-                            if isinstance(file_content, bytes):
-                                local_path.write_bytes(file_content)
+                    elif filtered_stderr.strip():
+                        # その他のstderrは警告として表示
+                        logger.warning(f"{data_thread.stderr=}")
+                response = generate_review(
+                    user_request=user_request,
+                    data_info=data_info,
+                    data_thread=data_thread,
+                    model=model,
+                    remote_save_dir=remote_save_dir,
+                )
+                review = response.content
+                logger.info(review.model_dump_json())
+                data_thread.observation = review.observation
+                data_thread.is_completed = review.is_completed
+
+                # サンドボックス内の出力ファイルを差分だけ1回の転送で取得
+                # （破棄したサンドボックスの出力は取得できない）
+                try:
+                    if not data_thread.is_sandbox_broken:
+                        data_thread.pathes = artifact_sync.sync()
+                except Exception as e:
+                    logger.warning(f"出力ディレクトリの取得に失敗: {e}")
+
+                # 実行結果の画像を保存
+                if data_thread.results:
+                    artifacts_dir = artifacts_base_dir / process_id
+                    artifacts_dir.mkdir(parents=True, exist_ok=True)
+                    for result_idx, result in enumerate(data_thread.results):
+                        if result.get("type") == "png" and result.get("content"):
+                            image_path = (
+                                artifacts_dir
+                                / f"thread_{thread_id}_result_{result_idx}.png"
+                            )
+                            content = result["content"]
+                            # PIL Imageオブジェクトの場合
+                            if hasattr(content, "save"):
+                                content.save(image_path)
+                            # バイト列の場合
+                            elif isinstance(content, bytes):
+                                image_path.write_bytes(content)
+                            # 文字列の場合（base64エンコードされた可能性）
+                            elif isinstance(content, str):
+                                try:
+                                    import base64
+
+                                    # base64デコードを試みる
+                                    image_bytes = base64.b64decode(content)
+                                    image_path.write_bytes(image_bytes)
+                                except Exception:
+                                    # base64でない場合は、そのままテキストとして保存
+                                    logger.warning(
+                                        f"画像の保存に失敗（文字列形式）: {image_path}"
+                                    )
                             else:
-                                local_path.write_text(
-                                    str(file_content), encoding="utf-8"
-                                )
-
-                            saved_files[file_path] = str(local_path)
-                            logger.info(f"保存しました: {local_path}")
-                        except Exception as e:
-                            logger.warning(f"ファイル取得失敗 {file_path}: {e}")
-
-                data_thread.pathes = saved_files
-            except Exception as e:
-                logger.warning(f"出力ディレクトリの取得に失敗: {e}")
-
-            # 実行結果の画像を保存
-            if data_thread.results:
-                artifacts_dir = artifacts_base_dir / process_id
-                artifacts_dir.mkdir(parents=True, exist_ok=True)
-                for result_idx, result in enumerate(data_thread.results):
-                    if result.get("type") == "png" and result.get("content"):
-                        image_path = (
-                            artifacts_dir
-                            / f"thread_{thread_id}_result_{result_idx}.png"
-                        )
-                        content = result["content"]
-                        # PIL Imageオブジェクトの場合
-                        if hasattr(content, "save"):
-                            content.save(image_path)
-                        # バイト列の場合
-                        elif isinstance(content, bytes):
-                            image_path.write_bytes(content)
-                        # 文字列の場合（base64エンコードされた可能性）
-                        elif isinstance(content, str):
-                            try:
-                                import base64
-
-                                # base64デコードを試みる
-                                image_bytes = base64.b64decode(content)
-                                image_path.write_bytes(image_bytes)
-                            except Exception:
-                                # base64でない場合は、そのままテキストとして保存
                                 logger.warning(
-                                    f"画像の保存に失敗（文字列形式）: {image_path}"
+                                    f"未対応の画像形式: {type(content)}"
                                 )
-                        else:
-                            logger.warning(
-                                f"未対応の画像形式: {type(content)}"
-                            )
-                        logger.info(f"画像を保存しました: {image_path}")
-
-            data_threads.append(data_thread)
-            if data_thread.is_completed:
-                logger.success(f"{user_request=}")
-                logger.success(f"{program.code=}")
-                logger.success(f"{review.observation=}")
-                break
-    return idx, data_threads
+                            logger.info(f"画像を保存しました: {image_path}")
+
+                data_threads.append(data_thread)
+                if data_thread.is_completed:
+                    logger.success(f"{user_request=}")
+                    logger.success(f"{program.code=}")
+                    logger.success(f"{review.observation=}")
+                    break
+    return data_threads
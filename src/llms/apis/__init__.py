@@ -1,3 +1,12 @@
-from . import openai
+from . import backend, batch, client, hedge, mock, openai, rate_limit, retry
 
-__all__ = ["openai"]
+__all__ = [
+    "backend",
+    "batch",
+    "client",
+    "hedge",
+    "mock",
+    "openai",
+    "rate_limit",
+    "retry",
+]
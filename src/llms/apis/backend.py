@@ -0,0 +1,58 @@
+import os
+
+from collections.abc import Generator
+from typing import Protocol
+
+from pydantic import BaseModel
+
+from src.llms.apis.client import ClientConfig
+from src.llms.models.llm_response import LLMResponse
+
+
+class LLMBackend(Protocol):
+    """generate_response から1回分のLLM呼び出しを委譲される実装
+
+    キャッシュ・レート制限・再試行・台帳記録は呼び出し側で行うため、
+    バックエンドは単発の呼び出しだけを担当する。
+    """
+
+    def create(
+        self,
+        messages: list[dict],
+        model: str,
+        response_format: type[BaseModel] | None = None,
+        timeout: float | None = None,
+        client_config: ClientConfig | None = None,
+    ) -> LLMResponse: ...
+
+    async def acreate(
+        self,
+        messages: list[dict],
+        model: str,
+        response_format: type[BaseModel] | None = None,
+        timeout: float | None = None,
+        client_config: ClientConfig | None = None,
+    ) -> LLMResponse: ...
+
+    def stream(
+        self,
+        messages: list[dict],
+        model: str,
+        timeout: float | None = None,
+        client_config: ClientConfig | None = None,
+    ) -> Generator[str, None, LLMResponse]: ...
+
+
+_backends: dict[str, LLMBackend] = {}
+
+
+def register_backend(name: str, backend: LLMBackend) -> None:
+    _backends[name] = backend
+
+
+def get_backend(name: str | None = None) -> LLMBackend:
+    """名前（未指定時は環境変数 LLM_BACKEND、既定は openai）でバックエンドを選ぶ"""
+    name = name or os.getenv("LLM_BACKEND", "openai")
+    if name not in _backends:
+        raise ValueError(f"Unknown LLM backend: {name}")
+    return _backends[name]
@@ -0,0 +1,274 @@
+import json
+import threading
+import time
+import uuid
+
+from collections.abc import Callable
+from pathlib import Path
+from typing import Protocol
+
+from loguru import logger
+from openai.types.responses import Response
+from pydantic import BaseModel, ConfigDict
+
+from src.llms.apis.client import ClientConfig, get_client
+from src.llms.apis.mock import MockBackend
+from src.llms.apis.openai import calculate_cost
+from src.llms.models.llm_response import LLMResponse
+from src.llms.utils.response_cache import get_response_cache
+from src.utils import ledger
+
+
+# Batch API は通常の半額で課金される
+BATCH_DISCOUNT = 0.5
+TERMINAL_STATUSES = {"completed", "failed", "expired", "cancelled"}
+
+
+def _strict_schema(schema: object) -> object:
+    """Structured Outputs の strict モードで受け付けられる形に JSON Schema を直す
+
+    object はすべてのプロパティを required にして追加プロパティを禁止し、
+    nullable なフィールドの default: null を除く。
+    """
+    if isinstance(schema, list):
+        return [_strict_schema(item) for item in schema]
+    if not isinstance(schema, dict):
+        return schema
+    schema = {
+        key: _strict_schema(value)
+        for key, value in schema.items()
+        if not (key == "default" and value is None)
+    }
+    # pydantic が説明付きの参照に出力する allOf: [{$ref}] は $ref に展開する
+    if len(schema.get("allOf", [])) == 1:
+        schema.update(schema.pop("allOf")[0])
+    if schema.get("type") == "object" and "properties" in schema:
+        schema["required"] = list(schema["properties"])
+        schema["additionalProperties"] = False
+    return schema
+
+
+def text_format_param(response_format: type[BaseModel]) -> dict:
+    """Responses API の text.format（JSON Schema による構造化出力）"""
+    return {
+        "type": "json_schema",
+        "name": response_format.__name__,
+        "schema": _strict_schema(response_format.model_json_schema()),
+        "strict": True,
+    }
+
+
+class BatchRequest(BaseModel):
+    model_config = ConfigDict(arbitrary_types_allowed=True)
+
+    custom_id: str
+    messages: list[dict]
+    model: str
+    response_format: type[BaseModel] | None = None
+    stage: str = "batch"
+
+    def to_line(self) -> dict:
+        body: dict = {"model": self.model, "input": self.messages}
+        if self.response_format is not None:
+            body["text"] = {
+                "format": text_format_param(self.response_format)
+            }
+        return {
+            "custom_id": self.custom_id,
+            "method": "POST",
+            "url": "/v1/responses",
+            "body": body,
+        }
+
+
+class BatchServer(Protocol):
+    def submit(self, input_path: Path) -> str: ...
+
+    def status(self, batch_id: str) -> str: ...
+
+    def results(self, batch_id: str) -> list[dict]: ...
+
+
+class OpenAIBatchServer:
+    def __init__(self, client_config: ClientConfig | None = None) -> None:
+        self.client = get_client(client_config)
+
+    def submit(self, input_path: Path) -> str:
+        with open(input_path, "rb") as fi:
+            input_file = self.client.files.create(file=fi, purpose="batch")
+        batch = self.client.batches.create(
+            input_file_id=input_file.id,
+            endpoint="/v1/responses",
+            completion_window="24h",
+        )
+        return batch.id
+
+    def status(self, batch_id: str) -> str:
+        return self.client.batches.retrieve(batch_id).status
+
+    def results(self, batch_id: str) -> list[dict]:
+        batch = self.client.batches.retrieve(batch_id)
+        lines = []
+        for file_id in (batch.output_file_id, batch.error_file_id):
+            if file_id:
+                content = self.client.files.content(file_id).text
+                lines.extend(
+                    json.loads(line) for line in content.splitlines() if line
+                )
+        return lines
+
+
+def forward_to_api(body: dict) -> dict:
+    """LocalBatchServer 用: 通常の Responses API に転送する（通常料金で課金される）"""
+    return get_client().responses.create(**body).model_dump(mode="json")
+
+
+class LocalBatchServer:
+    """ディレクトリ上でBatch APIを模擬するスタンドイン（テスト用）
+
+    <root>/<batch_id>/ に input.jsonl・output.jsonl・status を書き出し、
+    各リクエストを handler（Responses APIのbodyを受け取りResponse JSONを返す）で処理する。
+    handler の既定はネットワークを使わない MockBackend。実際のAPIで処理する場合は
+    handler=forward_to_api を明示的に渡す。
+    """
+
+    def __init__(
+        self,
+        root_dir: str | Path = ".cache/batches/local",
+        handler: Callable[[dict], dict] | None = None,
+    ) -> None:
+        self.root_dir = Path(root_dir)
+        self.handler = handler or MockBackend().batch_handler
+
+    def submit(self, input_path: Path) -> str:
+        batch_id = f"batch_local_{uuid.uuid4().hex[:12]}"
+        batch_dir = self.root_dir / batch_id
+        batch_dir.mkdir(parents=True, exist_ok=True)
+        (batch_dir / "input.jsonl").write_bytes(input_path.read_bytes())
+        (batch_dir / "status").write_text("in_progress")
+        threading.Thread(
+            target=self._process, args=(batch_dir,), daemon=True
+        ).start()
+        return batch_id
+
+    def _process(self, batch_dir: Path) -> None:
+        # 入力の破損や書き込みエラーでも終了状態にし、run_batch が待ち続けないようにする
+        try:
+            with (
+                open(batch_dir / "input.jsonl", encoding="utf-8") as fi,
+                open(batch_dir / "output.jsonl", "w", encoding="utf-8") as fo,
+            ):
+                for line in fi:
+                    result = self._handle(json.loads(line))
+                    fo.write(json.dumps(result, ensure_ascii=False) + "\n")
+        except Exception as e:
+            logger.exception(f"Local batch {batch_dir.name} failed: {e}")
+            (batch_dir / "status").write_text("failed")
+            return
+        (batch_dir / "status").write_text("completed")
+
+    def _handle(self, request: dict) -> dict:
+        try:
+            result = {
+                "response": {
+                    "status_code": 200,
+                    "body": self.handler(request["body"]),
+                },
+                "error": None,
+            }
+        except Exception as e:
+            result = {
+                "response": None,
+                "error": {
+                    "code": e.__class__.__name__,
+                    "message": str(e),
+                },
+            }
+        result["custom_id"] = request["custom_id"]
+        return result
+
+    def status(self, batch_id: str) -> str:
+        return (self.root_dir / batch_id / "status").read_text().strip()
+
+    def results(self, batch_id: str) -> list[dict]:
+        output_path = self.root_dir / batch_id / "output.jsonl"
+        if not output_path.exists():
+            return []
+        with open(output_path, encoding="utf-8") as fi:
+            return [json.loads(line) for line in fi if line.strip()]
+
+
+def _to_llm_response(request: BatchRequest, body: dict) -> LLMResponse:
+    completion = Response.model_validate(body)
+    text = completion.output_text
+    content = (
+        request.response_format.model_validate_json(text)
+        if request.response_format is not None
+        else text
+    )
+    usage = completion.usage
+    details = getattr(usage, "input_tokens_details", None)
+    cached_tokens = getattr(details, "cached_tokens", 0) or 0
+    cost = BATCH_DISCOUNT * calculate_cost(
+        request.model, usage.input_tokens, usage.output_tokens, cached_tokens
+    )
+    return LLMResponse(
+        messages=request.messages,
+        content=content,
+        model=request.model,
+        created_at=completion.created_at,
+        input_tokens=usage.input_tokens,
+        output_tokens=usage.output_tokens,
+        cached_tokens=cached_tokens,
+        cost=cost,
+    )
+
+
+def run_batch(
+    requests: list[BatchRequest],
+    server: BatchServer | None = None,
+    work_dir: str | Path = ".cache/batches",
+    poll_interval: float = 30.0,
+    timeout: float = 24 * 60 * 60,
+) -> dict[str, LLMResponse]:
+    """リクエスト群をJSONLにまとめて投入し、完了後に custom_id ごとの応答を返す
+
+    失敗したリクエストは結果に含まれない（ログに警告を出す）。
+    """
+    server = server or OpenAIBatchServer()
+    by_id = {request.custom_id: request for request in requests}
+    assert len(by_id) == len(requests), "custom_id must be unique"
+
+    work_dir = Path(work_dir)
+    work_dir.mkdir(parents=True, exist_ok=True)
+    input_path = work_dir / f"input_{uuid.uuid4().hex[:12]}.jsonl"
+    with open(input_path, "w", encoding="utf-8") as fo:
+        for request in requests:
+            fo.write(json.dumps(request.to_line(), ensure_ascii=False) + "\n")
+
+    started_at = time.time()
+    batch_id = server.submit(input_path)
+    logger.info(f"Submitted batch {batch_id}: {len(requests)} requests")
+    while (status := server.status(batch_id)) not in TERMINAL_STATUSES:
+        if time.time() - started_at > timeout:
+            raise TimeoutError(f"Batch {batch_id} did not finish: {status}")
+        time.sleep(poll_interval)
+    logger.info(f"Batch {batch_id} finished: {status}")
+
+    cache = get_response_cache()
+    responses: dict[str, LLMResponse] = {}
+    for line in server.results(batch_id):
+        request = by_id[line["custom_id"]]
+        response = line.get("response") or {}
+        if line.get("error") or response.get("status_code") != 200:
+            logger.warning(f"Batch request failed {request.custom_id}: {line}")
+            ledger.record(
+                request.stage, started_at, model=request.model, error=str(line)
+            )
+            continue
+        llm_response = _to_llm_response(request, response["body"])
+        ledger.record_llm_response(request.stage, started_at, llm_response)
+        if cache is not None:
+            cache.save(llm_response, request.response_format)
+        responses[request.custom_id] = llm_response
+    return responses
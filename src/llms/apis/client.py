@@ -0,0 +1,126 @@
+import asyncio
+import atexit
+import os
+import threading
+import weakref
+
+import httpx
+from openai import (
+    AsyncOpenAI,
+    DefaultAsyncHttpxClient,
+    DefaultHttpxClient,
+    OpenAI,
+)
+from pydantic import BaseModel, ConfigDict
+
+
+class ClientConfig(BaseModel):
+    """OpenAIクライアントの接続設定（レジストリのキーとしても利用）"""
+
+    model_config = ConfigDict(frozen=True)
+
+    api_key: str | None = None
+    base_url: str | None = None
+    max_connections: int = 20
+    max_keepalive_connections: int = 10
+    keepalive_expiry: float = 30.0
+    connect_timeout: float = 10.0
+    read_timeout: float = 600.0
+    # 再試行は src.llms.apis.retry で制御するため、SDK側では行わない
+    max_retries: int = 0
+
+    @classmethod
+    def from_env(cls) -> "ClientConfig":
+        return cls(
+            api_key=os.getenv("OPENAI_API_KEY"),
+            base_url=os.getenv("OPENAI_BASE_URL"),
+            max_connections=int(os.getenv("OPENAI_MAX_CONNECTIONS", "20")),
+            max_keepalive_connections=int(
+                os.getenv("OPENAI_MAX_KEEPALIVE_CONNECTIONS", "10")
+            ),
+            keepalive_expiry=float(os.getenv("OPENAI_KEEPALIVE_EXPIRY", "30")),
+            connect_timeout=float(os.getenv("OPENAI_CONNECT_TIMEOUT", "10")),
+            read_timeout=float(os.getenv("OPENAI_READ_TIMEOUT", "600")),
+            max_retries=int(os.getenv("OPENAI_MAX_RETRIES", "0")),
+        )
+
+    def limits(self) -> httpx.Limits:
+        return httpx.Limits(
+            max_connections=self.max_connections,
+            max_keepalive_connections=self.max_keepalive_connections,
+            keepalive_expiry=self.keepalive_expiry,
+        )
+
+    def timeout(self) -> httpx.Timeout:
+        return httpx.Timeout(self.read_timeout, connect=self.connect_timeout)
+
+
+_clients: dict[ClientConfig, OpenAI] = {}
+# 非同期クライアントのコネクションはイベントループに紐づくため、ループごとに保持する
+_async_clients: weakref.WeakKeyDictionary[
+    asyncio.AbstractEventLoop, dict[ClientConfig, AsyncOpenAI]
+] = weakref.WeakKeyDictionary()
+_lock = threading.Lock()
+
+
+def get_client(config: ClientConfig | None = None) -> OpenAI:
+    """設定ごとに1つのOpenAIクライアントを共有し、コネクションを再利用する"""
+    config = config or ClientConfig.from_env()
+    client = _clients.get(config)
+    if client is not None:
+        return client
+    with _lock:
+        client = _clients.get(config)
+        if client is None:
+            client = OpenAI(
+                api_key=config.api_key,
+                base_url=config.base_url,
+                timeout=config.timeout(),
+                max_retries=config.max_retries,
+                http_client=DefaultHttpxClient(
+                    limits=config.limits(),
+                    timeout=config.timeout(),
+                ),
+            )
+            _clients[config] = client
+    return client
+
+
+def get_async_client(config: ClientConfig | None = None) -> AsyncOpenAI:
+    """実行中のイベントループ内で共有されるAsyncOpenAIクライアントを返す"""
+    config = config or ClientConfig.from_env()
+    loop = asyncio.get_running_loop()
+    with _lock:
+        clients = _async_clients.setdefault(loop, {})
+        client = clients.get(config)
+        if client is None:
+            client = AsyncOpenAI(
+                api_key=config.api_key,
+                base_url=config.base_url,
+                timeout=config.timeout(),
+                max_retries=config.max_retries,
+                http_client=DefaultAsyncHttpxClient(
+                    limits=config.limits(),
+                    timeout=config.timeout(),
+                ),
+            )
+            clients[config] = client
+    return client
+
+
+async def aclose_clients() -> None:
+    loop = asyncio.get_running_loop()
+    with _lock:
+        clients = _async_clients.pop(loop, {})
+    for client in clients.values():
+        await client.close()
+
+
+def close_clients() -> None:
+    with _lock:
+        for client in _clients.values():
+            client.close()
+        _clients.clear()
+
+
+atexit.register(close_clients)
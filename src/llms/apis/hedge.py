@@ -0,0 +1,167 @@
+import asyncio
+import bisect
+import os
+import threading
+
+from collections.abc import Awaitable, Callable
+from concurrent.futures import (
+    FIRST_COMPLETED,
+    Future,
+    ThreadPoolExecutor,
+    wait,
+)
+from typing import TypeVar
+
+from loguru import logger
+from pydantic import BaseModel
+
+
+T = TypeVar("T")
+
+# 0.1秒〜約10分を対数間隔で区切ったヒストグラムの上限値
+BUCKET_BOUNDS = [0.1 * 1.25**i for i in range(40)]
+
+
+class LatencyHistogram:
+    def __init__(self) -> None:
+        self.counts = [0] * (len(BUCKET_BOUNDS) + 1)
+        self.total = 0
+        self.sum = 0.0
+        self._lock = threading.Lock()
+
+    def record(self, seconds: float) -> None:
+        with self._lock:
+            self.counts[bisect.bisect_left(BUCKET_BOUNDS, seconds)] += 1
+            self.total += 1
+            self.sum += seconds
+
+    def quantile(self, q: float) -> float | None:
+        with self._lock:
+            if self.total == 0:
+                return None
+            rank = q * self.total
+            cumulative = 0
+            for idx, n in enumerate(self.counts):
+                cumulative += n
+                if cumulative >= rank:
+                    return BUCKET_BOUNDS[min(idx, len(BUCKET_BOUNDS) - 1)]
+            return BUCKET_BOUNDS[-1]
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {
+                "count": self.total,
+                "mean": self.sum / self.total if self.total else None,
+                "buckets": {
+                    f"le_{bound:.2f}": n
+                    for bound, n in zip(BUCKET_BOUNDS, self.counts)
+                    if n
+                },
+            }
+
+
+_histograms: dict[str, LatencyHistogram] = {}
+_lock = threading.Lock()
+
+
+def get_latency_histogram(model: str) -> LatencyHistogram:
+    with _lock:
+        return _histograms.setdefault(model, LatencyHistogram())
+
+
+def latency_snapshot() -> dict[str, dict]:
+    with _lock:
+        histograms = dict(_histograms)
+    return {model: h.snapshot() for model, h in histograms.items()}
+
+
+class HedgePolicy(BaseModel):
+    enabled: bool = False
+    quantile: float = 0.95
+    min_delay: float = 1.0
+    # 十分なサンプルが集まるまでに使う待機秒数
+    default_delay: float = 15.0
+    min_samples: int = 20
+
+    @classmethod
+    def from_env(cls) -> "HedgePolicy":
+        return cls(
+            enabled=os.getenv("LLM_HEDGE", "0") == "1",
+            quantile=float(os.getenv("LLM_HEDGE_QUANTILE", "0.95")),
+            default_delay=float(os.getenv("LLM_HEDGE_DEFAULT_DELAY", "15")),
+        )
+
+    def delay(self, model: str) -> float:
+        histogram = get_latency_histogram(model)
+        if histogram.total < self.min_samples:
+            return self.default_delay
+        return max(self.min_delay, histogram.quantile(self.quantile) or 0.0)
+
+
+_executor: ThreadPoolExecutor | None = None
+
+
+def _get_executor() -> ThreadPoolExecutor:
+    global _executor
+    with _lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=32, thread_name_prefix="llm-hedge"
+            )
+        return _executor
+
+
+def call_hedged(fn: Callable[[], T], delay: float) -> T:
+    """delay秒で応答がなければ同じ要求を重複送信し、先に返った方を採用する
+
+    同期クライアントでは通信中の要求を中断できないため、
+    敗者の結果は破棄するだけになる。
+    """
+    executor = _get_executor()
+    primary = executor.submit(fn)
+    done, _ = wait([primary], timeout=delay)
+    if done:
+        return primary.result()
+
+    logger.debug(f"Hedging LLM request after {delay:.2f}s")
+    pending: set[Future[T]] = {primary, executor.submit(fn)}
+    error: BaseException | None = None
+    while pending:
+        done, pending = wait(pending, return_when=FIRST_COMPLETED)
+        for future in done:
+            if future.exception() is None:
+                for loser in pending:
+                    loser.cancel()
+                return future.result()
+            error = future.exception()
+    assert error is not None
+    raise error
+
+
+async def acall_hedged(fn: Callable[[], Awaitable[T]], delay: float) -> T:
+    primary = asyncio.ensure_future(fn())
+    tasks: set[asyncio.Future[T]] = {primary}
+    try:
+        done, _ = await asyncio.wait(tasks, timeout=delay)
+        if done:
+            return primary.result()
+
+        logger.debug(f"Hedging LLM request after {delay:.2f}s")
+        tasks.add(asyncio.ensure_future(fn()))
+        pending = set(tasks)
+        error: BaseException | None = None
+        while pending:
+            done, pending = await asyncio.wait(
+                pending, return_when=asyncio.FIRST_COMPLETED
+            )
+            for task in done:
+                if task.exception() is None:
+                    return task.result()
+                error = task.exception()
+        assert error is not None
+        raise error
+    finally:
+        # 敗者（または呼び出し元のキャンセル時は全て）の要求を中断する
+        for task in tasks:
+            if not task.done():
+                task.cancel()
@@ -0,0 +1,227 @@
+import asyncio
+import hashlib
+import json
+import os
+import random
+import time
+
+from collections.abc import Generator
+
+from pydantic import BaseModel
+
+from src.llms.apis.backend import register_backend
+from src.llms.apis.client import ClientConfig
+from src.llms.apis.openai import calculate_cost
+from src.llms.apis.rate_limit import estimate_tokens
+from src.llms.models.llm_response import LLMResponse
+
+
+# 生成コードがそのままサンドボックスで実行でき、1回で完了扱いになる既定値
+DEFAULT_FIELD_VALUES = {
+    "code": "print(df.shape)",
+    "is_incremental": False,
+    "is_completed": True,
+}
+
+WORDS = [
+    "売上", "スコア", "チャネル", "キャンペーン", "ユーザー", "購入", "傾向",
+    "分布", "比較", "相関", "仮説", "示唆", "施策", "効果", "検証", "指標",
+]
+
+
+def synthesize(
+    schema: dict,
+    rng: random.Random,
+    field_values: dict,
+    defs: dict | None = None,
+    name: str | None = None,
+) -> object:
+    """JSON Schema に適合する値を乱数生成器から決定的に作る"""
+    defs = schema.get("$defs", {}) if defs is None else defs
+    if name in field_values:
+        return field_values[name]
+    if "$ref" in schema:
+        return synthesize(
+            defs[schema["$ref"].split("/")[-1]], rng, field_values, defs, name
+        )
+    if "anyOf" in schema:
+        options = [s for s in schema["anyOf"] if s.get("type") != "null"]
+        return synthesize(options[0], rng, field_values, defs, name)
+    match schema.get("type"):
+        case "object":
+            return {
+                key: synthesize(value, rng, field_values, defs, key)
+                for key, value in schema.get("properties", {}).items()
+            }
+        case "array":
+            return [
+                synthesize(schema["items"], rng, field_values, defs, name)
+                for _ in range(rng.randint(2, 4))
+            ]
+        case "boolean":
+            return rng.random() < 0.5
+        case "integer":
+            return rng.randint(0, 100)
+        case "number":
+            return round(rng.uniform(0, 100), 2)
+        case _:
+            label = schema.get("description") or name or "value"
+            return f"{label} #{rng.randrange(1000)}"
+
+
+class MockBackend:
+    """ネットワークを使わずスキーマ準拠の応答を返す決定的なバックエンド
+
+    同じ (model, messages) には常に同じ内容を返す。
+    遅延とトークン数は引数または MOCK_LLM_* 環境変数で指定する。
+    """
+
+    def __init__(
+        self,
+        latency: float | None = None,
+        jitter: float | None = None,
+        output_tokens: int | None = None,
+        field_values: dict | None = None,
+        n_chunks: int = 20,
+    ) -> None:
+        self.latency = (
+            latency
+            if latency is not None
+            else float(os.getenv("MOCK_LLM_LATENCY", "0"))
+        )
+        self.jitter = (
+            jitter if jitter is not None else float(os.getenv("MOCK_LLM_JITTER", "0"))
+        )
+        self.output_tokens = (
+            output_tokens
+            if output_tokens is not None
+            else int(os.getenv("MOCK_LLM_OUTPUT_TOKENS", "200"))
+        )
+        self.field_values = {
+            **DEFAULT_FIELD_VALUES,
+            **json.loads(os.getenv("MOCK_LLM_FIELD_VALUES", "{}")),
+            **(field_values or {}),
+        }
+        self.n_chunks = n_chunks
+
+    def _rng(self, messages: list[dict], model: str) -> random.Random:
+        seed = hashlib.sha256(
+            json.dumps(
+                [model, messages], sort_keys=True, ensure_ascii=False, default=str
+            ).encode()
+        ).hexdigest()
+        return random.Random(seed)
+
+    def _content(
+        self,
+        rng: random.Random,
+        schema: dict | None,
+    ) -> object:
+        if schema is not None:
+            return synthesize(schema, rng, self.field_values)
+        words = [rng.choice(WORDS) for _ in range(self.output_tokens)]
+        lines = [" ".join(words[i:i + 16]) for i in range(0, len(words), 16)]
+        return "# データ分析レポート\n\n" + "\n\n".join(lines)
+
+    def _respond(
+        self,
+        messages: list[dict],
+        model: str,
+        response_format: type[BaseModel] | None,
+    ) -> tuple[LLMResponse, float]:
+        rng = self._rng(messages, model)
+        content = self._content(
+            rng,
+            response_format.model_json_schema() if response_format else None,
+        )
+        if response_format is not None:
+            content = response_format.model_validate(content)
+        input_tokens = estimate_tokens(messages)
+        delay = max(0.0, self.latency + rng.uniform(-self.jitter, self.jitter))
+        return LLMResponse(
+            messages=messages,
+            content=content,
+            model=model,
+            created_at=int(time.time()),
+            input_tokens=input_tokens,
+            output_tokens=self.output_tokens,
+            cost=calculate_cost(model, input_tokens, self.output_tokens),
+        ), delay
+
+    def create(
+        self,
+        messages: list[dict],
+        model: str,
+        response_format: type[BaseModel] | None = None,
+        timeout: float | None = None,
+        client_config: ClientConfig | None = None,
+    ) -> LLMResponse:
+        llm_response, delay = self._respond(messages, model, response_format)
+        time.sleep(delay)
+        return llm_response
+
+    async def acreate(
+        self,
+        messages: list[dict],
+        model: str,
+        response_format: type[BaseModel] | None = None,
+        timeout: float | None = None,
+        client_config: ClientConfig | None = None,
+    ) -> LLMResponse:
+        llm_response, delay = self._respond(messages, model, response_format)
+        await asyncio.sleep(delay)
+        return llm_response
+
+    def stream(
+        self,
+        messages: list[dict],
+        model: str,
+        timeout: float | None = None,
+        client_config: ClientConfig | None = None,
+    ) -> Generator[str, None, LLMResponse]:
+        llm_response, delay = self._respond(messages, model, None)
+        text = llm_response.content
+        size = max(1, len(text) // self.n_chunks)
+        for i in range(0, len(text), size):
+            time.sleep(delay / self.n_chunks)
+            yield text[i:i + size]
+        return llm_response
+
+    def batch_handler(self, body: dict) -> dict:
+        """LocalBatchServer 用: Responses API の body から Response JSON を作る"""
+        messages, model = body["input"], body["model"]
+        rng = self._rng(messages, model)
+        text_format = (body.get("text") or {}).get("format") or {}
+        content = self._content(rng, text_format.get("schema"))
+        text = content if isinstance(content, str) else json.dumps(content)
+        return {
+            "id": f"resp_mock_{rng.getrandbits(48):012x}",
+            "object": "response",
+            "created_at": int(time.time()),
+            "model": model,
+            "status": "completed",
+            "output": [
+                {
+                    "type": "message",
+                    "id": "msg_mock",
+                    "status": "completed",
+                    "role": "assistant",
+                    "content": [
+                        {"type": "output_text", "text": text, "annotations": []}
+                    ],
+                }
+            ],
+            "parallel_tool_calls": False,
+            "tool_choice": "auto",
+            "tools": [],
+            "usage": {
+                "input_tokens": estimate_tokens(messages),
+                "input_tokens_details": {"cached_tokens": 0},
+                "output_tokens": self.output_tokens,
+                "output_tokens_details": {"reasoning_tokens": 0},
+                "total_tokens": estimate_tokens(messages) + self.output_tokens,
+            },
+        }
+
+
+register_backend("mock", MockBackend())
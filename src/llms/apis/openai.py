@@ -1,11 +1,39 @@
+import asyncio
 import os
+import time
+import weakref
+
+from collections.abc import Generator
 
 from dotenv import load_dotenv
-from openai import OpenAI
-from openai.types.responses import ResponseOutputRefusal
+from loguru import logger
+from openai.types.responses import (
+    Response,
+    ResponseCompletedEvent,
+    ResponseOutputRefusal,
+    ResponseTextDeltaEvent,
+)
 from pydantic import BaseModel
 
+from src.llms.apis.backend import get_backend, register_backend
+from src.llms.apis.client import ClientConfig, get_async_client, get_client
+from src.llms.apis.hedge import (
+    HedgePolicy,
+    acall_hedged,
+    call_hedged,
+    get_latency_histogram,
+)
+from src.llms.apis.rate_limit import get_rate_limiter
+from src.llms.apis.retry import (
+    RetryPolicy,
+    acall_with_retry,
+    backoff_delay,
+    call_with_retry,
+    is_retryable,
+)
 from src.llms.models.llm_response import LLMResponse
+from src.llms.utils.response_cache import get_response_cache
+from src.utils import ledger
 
 
 load_dotenv()
@@ -13,52 +41,72 @@ load_dotenv()
 COST = {
     "gpt-4o-2024-11-20": {
         "input": 2.50 / 1_000_000,
+        "cached_input": 1.25 / 1_000_000,
         "output": 1.25 / 1_000_000,
     },
     "gpt-4o-mini-2024-07-18": {
         "input": 0.150 / 1_000_000,
+        "cached_input": 0.075 / 1_000_000,
         "output": 0.600 / 1_000_000,
     }
 }
 
+# 1つのイベントループ内で同時に発行するLLMリクエスト数の上限
+MAX_CONCURRENCY = int(os.getenv("OPENAI_MAX_CONCURRENCY", "16"))
 
-def generate_response(
+_semaphores: weakref.WeakKeyDictionary[
+    asyncio.AbstractEventLoop, asyncio.Semaphore
+] = weakref.WeakKeyDictionary()
+
+
+def _get_semaphore() -> asyncio.Semaphore:
+    loop = asyncio.get_running_loop()
+    semaphore = _semaphores.get(loop)
+    if semaphore is None:
+        semaphore = asyncio.Semaphore(MAX_CONCURRENCY)
+        _semaphores[loop] = semaphore
+    return semaphore
+
+
+def calculate_cost(
+    model: str,
+    input_tokens: int,
+    output_tokens: int,
+    cached_tokens: int = 0,
+) -> float:
+    # プロンプトキャッシュに載った入力は割引単価
+    return (
+        (input_tokens - cached_tokens) * COST[model]["input"]
+        + cached_tokens * COST[model]["cached_input"]
+        + output_tokens * COST[model]["output"]
+    )
+
+
+def _cached_tokens(completion: Response) -> int:
+    details = getattr(completion.usage, "input_tokens_details", None)
+    return getattr(details, "cached_tokens", 0) or 0
+
+
+def _to_llm_response(
+    completion: Response,
     messages: list[dict],
-    model: str = "gpt-4o-2024-11-20",
+    model: str,
     response_format: BaseModel | None = None,
 ) -> LLMResponse:
-    assert model in COST, f"Invalid model name: {model}"
-    client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
-
-    # LLM Call
     content_idx = 1 if model.startswith(("o1", "o3")) else 0
+    content_item = completion.output[content_idx].content[0]
+    if isinstance(content_item, ResponseOutputRefusal):
+        refusal_reason = getattr(
+            content_item, 'refusal', 'Unknown reason'
+        )
+        raise ValueError(f"API response was refused: {refusal_reason}")
     if response_format is None:
-        completion = client.responses.create(model=model, input=messages)
-        content_item = completion.output[content_idx].content[0]
-        if isinstance(content_item, ResponseOutputRefusal):
-            refusal_reason = getattr(
-                content_item, 'refusal', 'Unknown reason'
-            )
-            raise ValueError(f"API response was refused: {refusal_reason}")
         content = content_item.text
     else:
-        completion = client.responses.parse(
-            model=model,
-            input=messages,
-            text_format=response_format,
-        )
-        content_item = completion.output[content_idx].content[0]
-        if isinstance(content_item, ResponseOutputRefusal):
-            refusal_reason = getattr(
-                content_item, 'refusal', 'Unknown reason'
-            )
-            raise ValueError(f"API response was refused: {refusal_reason}")
         content = content_item.parsed
 
     # Cost calculation
-    input_cost = completion.usage.input_tokens * COST[model]["input"]
-    output_cost = completion.usage.output_tokens * COST[model]["output"]
-
+    cached_tokens = _cached_tokens(completion)
     return LLMResponse(
         messages=messages,
         content=content,
@@ -66,5 +114,358 @@ def generate_response(
         created_at=completion.created_at,
         input_tokens=completion.usage.input_tokens,
         output_tokens=completion.usage.output_tokens,
-        cost=input_cost + output_cost,
+        cached_tokens=cached_tokens,
+        cost=calculate_cost(
+            model,
+            completion.usage.input_tokens,
+            completion.usage.output_tokens,
+            cached_tokens,
+        ),
+    )
+
+
+class OpenAIBackend:
+    """OpenAI Responses API を呼び出すバックエンド"""
+
+    def create(
+        self,
+        messages: list[dict],
+        model: str,
+        response_format: BaseModel | None = None,
+        timeout: float | None = None,
+        client_config: ClientConfig | None = None,
+    ) -> LLMResponse:
+        # プロセス共有のクライアントを利用し、keep-alive 接続を使い回す
+        client = get_client(client_config)
+        if timeout is not None:
+            client = client.with_options(timeout=timeout)
+        if response_format is None:
+            completion = client.responses.create(model=model, input=messages)
+        else:
+            completion = client.responses.parse(
+                model=model,
+                input=messages,
+                text_format=response_format,
+            )
+        return _to_llm_response(completion, messages, model, response_format)
+
+    async def acreate(
+        self,
+        messages: list[dict],
+        model: str,
+        response_format: BaseModel | None = None,
+        timeout: float | None = None,
+        client_config: ClientConfig | None = None,
+    ) -> LLMResponse:
+        client = get_async_client(client_config)
+        if timeout is not None:
+            client = client.with_options(timeout=timeout)
+        if response_format is None:
+            completion = await client.responses.create(
+                model=model,
+                input=messages,
+            )
+        else:
+            completion = await client.responses.parse(
+                model=model,
+                input=messages,
+                text_format=response_format,
+            )
+        return _to_llm_response(completion, messages, model, response_format)
+
+    def stream(
+        self,
+        messages: list[dict],
+        model: str,
+        timeout: float | None = None,
+        client_config: ClientConfig | None = None,
+    ) -> Generator[str, None, LLMResponse]:
+        client = get_client(client_config)
+        if timeout is not None:
+            client = client.with_options(timeout=timeout)
+        completion: Response | None = None
+        stream = client.responses.create(model=model, input=messages, stream=True)
+        with stream:
+            for event in stream:
+                if isinstance(event, ResponseTextDeltaEvent):
+                    yield event.delta
+                elif isinstance(event, ResponseCompletedEvent):
+                    completion = event.response
+        if completion is None:
+            raise ValueError("Stream ended without a completed response")
+        return _to_llm_response(completion, messages, model)
+
+
+register_backend("openai", OpenAIBackend())
+
+
+def _generate_response(
+    messages: list[dict],
+    model: str,
+    response_format: BaseModel | None,
+    timeout: float | None,
+    client_config: ClientConfig | None,
+    retry_policy: RetryPolicy | None,
+    hedge_policy: HedgePolicy | None,
+    backend: str | None,
+) -> LLMResponse:
+    assert model in COST, f"Invalid model name: {model}"
+    cache = get_response_cache()
+    if cache is not None:
+        cached = cache.lookup(messages, model, response_format)
+        if cached is not None:
+            return cached
+
+    llm_backend = get_backend(backend)
+    rate_limiter = get_rate_limiter()
+    retry_policy = retry_policy or RetryPolicy.from_env()
+    hedge_policy = hedge_policy or HedgePolicy.from_env()
+
+    def attempt() -> LLMResponse:
+        # RPM/TPMの予算が空くまで先着順に待機（再試行・ヘッジも1要求として数える）
+        if rate_limiter is not None:
+            reservation = rate_limiter.acquire(model, messages)
+        started_at = time.monotonic()
+
+        # LLM Call
+        llm_response = llm_backend.create(
+            messages,
+            model,
+            response_format=response_format,
+            timeout=timeout,
+            client_config=client_config,
+        )
+        get_latency_histogram(model).record(time.monotonic() - started_at)
+        if rate_limiter is not None:
+            rate_limiter.reconcile(
+                reservation,
+                llm_response.input_tokens + llm_response.output_tokens,
+            )
+        return llm_response
+
+    def hedged_attempt() -> LLMResponse:
+        return call_hedged(attempt, hedge_policy.delay(model))
+
+    llm_response = call_with_retry(
+        hedged_attempt if hedge_policy.enabled else attempt,
+        retry_policy,
+    )
+    if cache is not None:
+        cache.save(llm_response, response_format)
+    return llm_response
+
+
+async def _agenerate_response(
+    messages: list[dict],
+    model: str,
+    response_format: BaseModel | None,
+    timeout: float | None,
+    client_config: ClientConfig | None,
+    retry_policy: RetryPolicy | None,
+    hedge_policy: HedgePolicy | None,
+    backend: str | None,
+) -> LLMResponse:
+    assert model in COST, f"Invalid model name: {model}"
+    cache = get_response_cache()
+    if cache is not None:
+        cached = cache.lookup(messages, model, response_format)
+        if cached is not None:
+            return cached
+
+    llm_backend = get_backend(backend)
+    rate_limiter = get_rate_limiter()
+    retry_policy = retry_policy or RetryPolicy.from_env()
+    hedge_policy = hedge_policy or HedgePolicy.from_env()
+
+    async def attempt() -> LLMResponse:
+        if rate_limiter is not None:
+            reservation = await rate_limiter.aacquire(model, messages)
+
+        # LLM Call（セマフォで同時実行数を制限。キャンセル時も枠は解放される）
+        async with _get_semaphore():
+            started_at = time.monotonic()
+            llm_response = await llm_backend.acreate(
+                messages,
+                model,
+                response_format=response_format,
+                timeout=timeout,
+                client_config=client_config,
+            )
+            get_latency_histogram(model).record(time.monotonic() - started_at)
+        if rate_limiter is not None:
+            rate_limiter.reconcile(
+                reservation,
+                llm_response.input_tokens + llm_response.output_tokens,
+            )
+        return llm_response
+
+    async def hedged_attempt() -> LLMResponse:
+        return await acall_hedged(attempt, hedge_policy.delay(model))
+
+    llm_response = await acall_with_retry(
+        hedged_attempt if hedge_policy.enabled else attempt,
+        retry_policy,
     )
+    if cache is not None:
+        cache.save(llm_response, response_format)
+    return llm_response
+
+
+def _stream_response(
+    messages: list[dict],
+    model: str,
+    timeout: float | None,
+    client_config: ClientConfig | None,
+    retry_policy: RetryPolicy | None,
+    backend: str | None,
+) -> Generator[str, None, LLMResponse]:
+    assert model in COST, f"Invalid model name: {model}"
+    cache = get_response_cache()
+    if cache is not None:
+        cached = cache.lookup(messages, model)
+        if cached is not None:
+            yield cached.content
+            return cached
+
+    llm_backend = get_backend(backend)
+    rate_limiter = get_rate_limiter()
+    retry_policy = retry_policy or RetryPolicy.from_env()
+
+    for n_attempt in range(retry_policy.max_retries + 1):
+        if rate_limiter is not None:
+            reservation = rate_limiter.acquire(model, messages)
+        started_at = time.monotonic()
+        has_output = False
+        chunks = llm_backend.stream(
+            messages,
+            model,
+            timeout=timeout,
+            client_config=client_config,
+        )
+        try:
+            while True:
+                try:
+                    chunk = next(chunks)
+                except StopIteration as stop:
+                    llm_response = stop.value
+                    break
+                has_output = True
+                yield chunk
+        except Exception as exc:
+            # 出力済みの差分は取り消せないため、再試行は最初のトークン前に限る
+            if (
+                has_output
+                or n_attempt >= retry_policy.max_retries
+                or not is_retryable(exc)
+            ):
+                raise
+            delay = backoff_delay(retry_policy, n_attempt, exc)
+            logger.warning(
+                f"LLM stream failed ({exc.__class__.__name__}), "
+                f"retrying in {delay:.2f}s "
+                f"[{n_attempt + 1}/{retry_policy.max_retries}]"
+            )
+            time.sleep(delay)
+            continue
+        break
+
+    get_latency_histogram(model).record(time.monotonic() - started_at)
+    if rate_limiter is not None:
+        rate_limiter.reconcile(
+            reservation,
+            llm_response.input_tokens + llm_response.output_tokens,
+        )
+    if cache is not None:
+        cache.save(llm_response)
+    return llm_response
+
+
+def generate_response(
+    messages: list[dict],
+    model: str = "gpt-4o-2024-11-20",
+    response_format: BaseModel | None = None,
+    timeout: float | None = None,
+    client_config: ClientConfig | None = None,
+    retry_policy: RetryPolicy | None = None,
+    hedge_policy: HedgePolicy | None = None,
+    stage: str | None = None,
+    backend: str | None = None,
+) -> LLMResponse:
+    started_at = time.time()
+    try:
+        llm_response = _generate_response(
+            messages,
+            model=model,
+            response_format=response_format,
+            timeout=timeout,
+            client_config=client_config,
+            retry_policy=retry_policy,
+            hedge_policy=hedge_policy,
+            backend=backend,
+        )
+    except Exception as exc:
+        ledger.record(stage or "llm", started_at, model=model, error=repr(exc))
+        raise
+    ledger.record_llm_response(stage, started_at, llm_response)
+    return llm_response
+
+
+async def agenerate_response(
+    messages: list[dict],
+    model: str = "gpt-4o-2024-11-20",
+    response_format: BaseModel | None = None,
+    timeout: float | None = None,
+    client_config: ClientConfig | None = None,
+    retry_policy: RetryPolicy | None = None,
+    hedge_policy: HedgePolicy | None = None,
+    stage: str | None = None,
+    backend: str | None = None,
+) -> LLMResponse:
+    started_at = time.time()
+    try:
+        llm_response = await _agenerate_response(
+            messages,
+            model=model,
+            response_format=response_format,
+            timeout=timeout,
+            client_config=client_config,
+            retry_policy=retry_policy,
+            hedge_policy=hedge_policy,
+            backend=backend,
+        )
+    except Exception as exc:
+        ledger.record(stage or "llm", started_at, model=model, error=repr(exc))
+        raise
+    ledger.record_llm_response(stage, started_at, llm_response)
+    return llm_response
+
+
+def stream_response(
+    messages: list[dict],
+    model: str = "gpt-4o-2024-11-20",
+    timeout: float | None = None,
+    client_config: ClientConfig | None = None,
+    retry_policy: RetryPolicy | None = None,
+    stage: str | None = None,
+    backend: str | None = None,
+) -> Generator[str, None, LLMResponse]:
+    """テキスト応答を差分ごとにyieldし、完了時にLLMResponseを返すジェネレータ
+
+    最終的な LLMResponse は ``response = yield from stream_response(...)``
+    もしくは StopIteration.value から取得できる。
+    """
+    started_at = time.time()
+    try:
+        llm_response = yield from _stream_response(
+            messages,
+            model=model,
+            timeout=timeout,
+            client_config=client_config,
+            retry_policy=retry_policy,
+            backend=backend,
+        )
+    except Exception as exc:
+        ledger.record(stage or "llm", started_at, model=model, error=repr(exc))
+        raise
+    ledger.record_llm_response(stage, started_at, llm_response)
+    return llm_response
@@ -0,0 +1,278 @@
+import asyncio
+import json
+import os
+import statistics
+import threading
+import time
+
+from collections import deque
+from itertools import count
+
+from pydantic import BaseModel
+
+
+# モデルごとのプロバイダ上限（requests / tokens per minute）
+RATE_LIMITS = {
+    "gpt-4o-2024-11-20": {
+        "rpm": 500,
+        "tpm": 30_000,
+        "output_tokens": 2_000,
+    },
+    "gpt-4o-mini-2024-07-18": {
+        "rpm": 500,
+        "tpm": 200_000,
+        "output_tokens": 2_000,
+    },
+}
+
+# 画像1枚あたりの入力トークン見積もり
+IMAGE_TOKENS = 765
+# 先頭以外の待機者がキューを確認する間隔（秒）
+POLL_INTERVAL = 0.02
+MAX_SLEEP = 1.0
+
+
+def estimate_tokens(messages: list[dict]) -> int:
+    """メッセージの入力トークン数を概算する（ASCIIは4文字≒1トークン）"""
+    tokens = 0
+
+    def visit(value: object) -> None:
+        nonlocal tokens
+        if isinstance(value, str):
+            non_ascii = sum(1 for ch in value if ord(ch) > 127)
+            tokens += non_ascii + (len(value) - non_ascii) // 4
+        elif isinstance(value, dict):
+            if value.get("type") in ("input_image", "image_url"):
+                tokens += IMAGE_TOKENS
+                return
+            for v in value.values():
+                visit(v)
+        elif isinstance(value, list):
+            for v in value:
+                visit(v)
+        elif value is not None:
+            visit(json.dumps(value, default=str))
+
+    visit(messages)
+    return tokens + 4 * len(messages)
+
+
+class TokenBucket:
+    def __init__(self, capacity: float, period: float = 60.0) -> None:
+        self.capacity = capacity
+        self.rate = capacity / period
+        self.level = capacity
+        self.updated_at = time.monotonic()
+
+    def _refill(self, now: float) -> None:
+        elapsed = now - self.updated_at
+        self.level = min(self.capacity, self.level + elapsed * self.rate)
+        self.updated_at = now
+
+    def wait_time(self, amount: float, now: float) -> float:
+        self._refill(now)
+        # 容量を超える要求はバケット満杯で許可する（デッドロック防止）
+        amount = min(amount, self.capacity)
+        if self.level >= amount:
+            return 0.0
+        return (amount - self.level) / self.rate
+
+    def consume(self, amount: float) -> None:
+        self.level -= min(amount, self.capacity)
+
+    def refund(self, amount: float) -> None:
+        self.level = min(self.capacity, self.level + amount)
+
+
+class Reservation(BaseModel):
+    model: str
+    estimated_tokens: int
+    wait_seconds: float
+
+
+class RateLimitMetrics(BaseModel):
+    model: str
+    queue_depth: int
+    requests: int
+    total_wait_seconds: float
+    max_wait_seconds: float
+    p50_wait_seconds: float
+    p95_wait_seconds: float
+
+
+class ModelScheduler:
+    """1モデル分のRPM/TPMバケットとFIFO待ち行列"""
+
+    def __init__(
+        self,
+        model: str,
+        rpm: int,
+        tpm: int,
+        output_tokens: int,
+    ) -> None:
+        self.model = model
+        self.output_tokens = output_tokens
+        self._requests = TokenBucket(rpm)
+        self._tokens = TokenBucket(tpm)
+        self._queue: deque[int] = deque()
+        self._tickets = count()
+        self._lock = threading.Lock()
+        self._waits: deque[float] = deque(maxlen=1000)
+        self._n_requests = 0
+        self._total_wait = 0.0
+        self._max_wait = 0.0
+
+    def _enqueue(self) -> int:
+        with self._lock:
+            ticket = next(self._tickets)
+            self._queue.append(ticket)
+            return ticket
+
+    def _dequeue(self, ticket: int) -> None:
+        with self._lock:
+            if ticket in self._queue:
+                self._queue.remove(ticket)
+
+    def _try_acquire(self, ticket: int, tokens: int) -> float:
+        """許可できれば0、そうでなければ次に確認するまでの秒数を返す"""
+        with self._lock:
+            # 先着順を保証するため、先頭の呼び出し元だけが予算を消費できる
+            if self._queue[0] != ticket:
+                return POLL_INTERVAL
+            now = time.monotonic()
+            wait = max(
+                self._requests.wait_time(1, now),
+                self._tokens.wait_time(tokens, now),
+            )
+            if wait > 0:
+                return min(wait, MAX_SLEEP)
+            self._requests.consume(1)
+            self._tokens.consume(tokens)
+            self._queue.popleft()
+            return 0.0
+
+    def _record_wait(self, wait: float) -> None:
+        with self._lock:
+            self._waits.append(wait)
+            self._n_requests += 1
+            self._total_wait += wait
+            self._max_wait = max(self._max_wait, wait)
+
+    def acquire(self, tokens: int) -> Reservation:
+        started_at = time.monotonic()
+        ticket = self._enqueue()
+        try:
+            while (delay := self._try_acquire(ticket, tokens)) > 0:
+                time.sleep(delay)
+        except BaseException:
+            self._dequeue(ticket)
+            raise
+        wait = time.monotonic() - started_at
+        self._record_wait(wait)
+        return Reservation(
+            model=self.model, estimated_tokens=tokens, wait_seconds=wait
+        )
+
+    async def aacquire(self, tokens: int) -> Reservation:
+        started_at = time.monotonic()
+        ticket = self._enqueue()
+        try:
+            while (delay := self._try_acquire(ticket, tokens)) > 0:
+                await asyncio.sleep(delay)
+        except BaseException:
+            # キャンセルされた場合も待ち行列から確実に外す
+            self._dequeue(ticket)
+            raise
+        wait = time.monotonic() - started_at
+        self._record_wait(wait)
+        return Reservation(
+            model=self.model, estimated_tokens=tokens, wait_seconds=wait
+        )
+
+    def reconcile(self, reservation: Reservation, actual_tokens: int) -> None:
+        """見積もりと実績の差分をトークンバケットに反映する"""
+        with self._lock:
+            diff = reservation.estimated_tokens - actual_tokens
+            if diff > 0:
+                self._tokens.refund(diff)
+            else:
+                self._tokens.consume(-diff)
+
+    def metrics(self) -> RateLimitMetrics:
+        with self._lock:
+            waits = sorted(self._waits)
+            return RateLimitMetrics(
+                model=self.model,
+                queue_depth=len(self._queue),
+                requests=self._n_requests,
+                total_wait_seconds=self._total_wait,
+                max_wait_seconds=self._max_wait,
+                p50_wait_seconds=statistics.median(waits) if waits else 0.0,
+                p95_wait_seconds=(
+                    waits[int(0.95 * (len(waits) - 1))] if waits else 0.0
+                ),
+            )
+
+
+class RateLimiter:
+    def __init__(self, limits: dict[str, dict[str, int]] | None = None) -> None:
+        self.limits = dict(limits or RATE_LIMITS)
+        self._schedulers: dict[str, ModelScheduler] = {}
+        self._lock = threading.Lock()
+
+    def scheduler(self, model: str) -> ModelScheduler:
+        with self._lock:
+            scheduler = self._schedulers.get(model)
+            if scheduler is None:
+                limit = self.limits[model]
+                scheduler = ModelScheduler(
+                    model,
+                    rpm=limit["rpm"],
+                    tpm=limit["tpm"],
+                    output_tokens=limit["output_tokens"],
+                )
+                self._schedulers[model] = scheduler
+            return scheduler
+
+    def _estimate(self, model: str, messages: list[dict]) -> int:
+        return estimate_tokens(messages) + self.limits[model]["output_tokens"]
+
+    def acquire(self, model: str, messages: list[dict]) -> Reservation:
+        return self.scheduler(model).acquire(self._estimate(model, messages))
+
+    async def aacquire(self, model: str, messages: list[dict]) -> Reservation:
+        return await self.scheduler(model).aacquire(
+            self._estimate(model, messages)
+        )
+
+    def reconcile(self, reservation: Reservation, actual_tokens: int) -> None:
+        self.scheduler(reservation.model).reconcile(reservation, actual_tokens)
+
+    def metrics(self) -> list[RateLimitMetrics]:
+        with self._lock:
+            schedulers = list(self._schedulers.values())
+        return [scheduler.metrics() for scheduler in schedulers]
+
+
+_rate_limiter: RateLimiter | None = None
+_configured = False
+_lock = threading.Lock()
+
+
+def get_rate_limiter() -> RateLimiter | None:
+    """プロセス共有のレート制限器を返す（LLM_RATE_LIMIT=0 で無効化）"""
+    global _rate_limiter, _configured
+    if not _configured:
+        with _lock:
+            if not _configured:
+                if os.getenv("LLM_RATE_LIMIT", "1") != "0":
+                    _rate_limiter = RateLimiter()
+                _configured = True
+    return _rate_limiter
+
+
+def set_rate_limiter(rate_limiter: RateLimiter | None) -> None:
+    global _rate_limiter, _configured
+    with _lock:
+        _rate_limiter = rate_limiter
+        _configured = True
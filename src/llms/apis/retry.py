@@ -0,0 +1,114 @@
+import asyncio
+import os
+import random
+import time
+
+from collections.abc import Awaitable, Callable
+from email.utils import parsedate_to_datetime
+from typing import TypeVar
+
+import openai
+from loguru import logger
+from pydantic import BaseModel
+
+
+T = TypeVar("T")
+
+RETRYABLE_STATUS_CODES = {408, 409, 429}
+
+
+class RetryPolicy(BaseModel):
+    max_retries: int = 3
+    base_delay: float = 0.5
+    max_delay: float = 30.0
+    # Retry-After がこの秒数を超える場合はそれ以上待たずに失敗させる
+    max_retry_after: float = 120.0
+
+    @classmethod
+    def from_env(cls) -> "RetryPolicy":
+        return cls(
+            max_retries=int(os.getenv("LLM_MAX_RETRIES", "3")),
+            base_delay=float(os.getenv("LLM_RETRY_BASE_DELAY", "0.5")),
+            max_delay=float(os.getenv("LLM_RETRY_MAX_DELAY", "30")),
+        )
+
+
+def is_retryable(exc: BaseException) -> bool:
+    if isinstance(exc, openai.APIConnectionError):
+        return True
+    if isinstance(exc, openai.APIStatusError):
+        return (
+            exc.status_code in RETRYABLE_STATUS_CODES
+            or exc.status_code >= 500
+        )
+    return False
+
+
+def retry_after(exc: BaseException) -> float | None:
+    """Retry-After(-ms) ヘッダーから待機秒数を取得する"""
+    if not isinstance(exc, openai.APIStatusError):
+        return None
+    headers = exc.response.headers
+    if value := headers.get("retry-after-ms"):
+        try:
+            return float(value) / 1000
+        except ValueError:
+            pass
+    if value := headers.get("retry-after"):
+        try:
+            return float(value)
+        except ValueError:
+            try:
+                return parsedate_to_datetime(value).timestamp() - time.time()
+            except (TypeError, ValueError):
+                return None
+    return None
+
+
+def backoff_delay(
+    policy: RetryPolicy,
+    attempt: int,
+    exc: BaseException,
+) -> float:
+    delay = retry_after(exc)
+    if delay is not None and 0 <= delay <= policy.max_retry_after:
+        return delay
+    # full jitter 付きの指数バックオフ
+    return random.uniform(0, min(policy.max_delay, policy.base_delay * 2**attempt))
+
+
+def call_with_retry(fn: Callable[[], T], policy: RetryPolicy) -> T:
+    for attempt in range(policy.max_retries + 1):
+        try:
+            return fn()
+        except Exception as exc:
+            if attempt >= policy.max_retries or not is_retryable(exc):
+                raise
+            delay = backoff_delay(policy, attempt, exc)
+            logger.warning(
+                f"LLM call failed ({exc.__class__.__name__}), "
+                f"retrying in {delay:.2f}s "
+                f"[{attempt + 1}/{policy.max_retries}]"
+            )
+            time.sleep(delay)
+    raise AssertionError("unreachable")
+
+
+async def acall_with_retry(
+    fn: Callable[[], Awaitable[T]],
+    policy: RetryPolicy,
+) -> T:
+    for attempt in range(policy.max_retries + 1):
+        try:
+            return await fn()
+        except Exception as exc:
+            if attempt >= policy.max_retries or not is_retryable(exc):
+                raise
+            delay = backoff_delay(policy, attempt, exc)
+            logger.warning(
+                f"LLM call failed ({exc.__class__.__name__}), "
+                f"retrying in {delay:.2f}s "
+                f"[{attempt + 1}/{policy.max_retries}]"
+            )
+            await asyncio.sleep(delay)
+    raise AssertionError("unreachable")
@@ -8,4 +8,6 @@ class LLMResponse(BaseModel):
     created_at: int
     input_tokens: int
     output_tokens: int
+    cached_tokens: int = 0
     cost: float | None = Field(default=None, init=False)
+    from_cache: bool = False
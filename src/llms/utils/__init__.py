@@ -1,3 +1,36 @@
-from .load_template import load_template
+from .load_template import clear_template_cache, load_template
+from .prompt_budget import (
+    PromptBudget,
+    PromptTrimmer,
+    TrimRecord,
+    count_tokens,
+    prune_data_info,
+    truncate_middle,
+)
+from .response_cache import (
+    CacheMissError,
+    CacheMode,
+    MemoryCacheStore,
+    ResponseCache,
+    SQLiteCacheStore,
+    get_response_cache,
+    set_response_cache,
+)
 
-__all__ = ["load_template"]
+__all__ = [
+    "load_template",
+    "clear_template_cache",
+    "PromptBudget",
+    "PromptTrimmer",
+    "TrimRecord",
+    "count_tokens",
+    "prune_data_info",
+    "truncate_middle",
+    "CacheMissError",
+    "CacheMode",
+    "MemoryCacheStore",
+    "ResponseCache",
+    "SQLiteCacheStore",
+    "get_response_cache",
+    "set_response_cache",
+]
@@ -1,12 +1,59 @@
+import os
+import threading
+
 from pathlib import Path
-from jinja2 import Environment, FileSystemLoader, Template
+from jinja2 import (
+    Environment,
+    FileSystemBytecodeCache,
+    FileSystemLoader,
+    Template,
+)
+
+
+# テンプレートディレクトリごとの Environment（コンパイル済みテンプレートを保持）
+_environments: dict[str, Environment] = {}
+# 自動再読み込みが無効な場合はパスからテンプレートを直接引く
+_templates: dict[str, Template] = {}
+_lock = threading.Lock()
+
+
+def _get_environment(template_dir: str) -> Environment:
+    env = _environments.get(template_dir)
+    if env is not None:
+        return env
+    with _lock:
+        if template_dir not in _environments:
+            # 開発中は TEMPLATE_AUTO_RELOAD=1 で更新時刻を確認して再読み込みする
+            auto_reload = os.getenv("TEMPLATE_AUTO_RELOAD", "0") == "1"
+            bytecode_dir = os.getenv("TEMPLATE_BYTECODE_CACHE_DIR")
+            bytecode_cache = None
+            if bytecode_dir:
+                Path(bytecode_dir).mkdir(parents=True, exist_ok=True)
+                bytecode_cache = FileSystemBytecodeCache(bytecode_dir)
+            _environments[template_dir] = Environment(
+                loader=FileSystemLoader(template_dir),
+                autoescape=True,
+                auto_reload=auto_reload,
+                bytecode_cache=bytecode_cache,
+            )
+        return _environments[template_dir]
 
 
 def load_template(template_file: str) -> Template:
+    """テンプレートを読み込む（2回目以降はキャッシュ済みのものを返す）"""
+    template = _templates.get(template_file)
+    if template is not None:
+        return template
     template_path = Path(template_file)
-    env = Environment(
-        loader=FileSystemLoader(template_path.parent),
-        autoescape=True
-    )
+    env = _get_environment(str(template_path.parent))
+    template = env.get_template(template_path.name)
+    if not env.auto_reload:
+        _templates[template_file] = template
+    return template
+
 
-    return env.get_template(template_path.name)
+def clear_template_cache() -> None:
+    """Environment とコンパイル済みテンプレートをすべて破棄する"""
+    with _lock:
+        _environments.clear()
+        _templates.clear()
@@ -0,0 +1,226 @@
+import os
+import re
+import time
+
+from functools import lru_cache
+
+from loguru import logger
+from pydantic import BaseModel
+
+from src.utils import ledger
+
+try:
+    import tiktoken
+except ImportError:  # 未インストール時は文字数から概算する
+    tiktoken = None
+    logger.warning(
+        "tiktoken がないため、トークン数は文字数からの概算で計算します"
+    )
+
+
+# モデルごとの入力トークン上限（コンテキスト長から出力分を差し引いた値）
+MAX_INPUT_TOKENS = {
+    "gpt-4o-2024-11-20": 100_000,
+    "gpt-4o-mini-2024-07-18": 100_000,
+}
+DEFAULT_MAX_INPUT_TOKENS = 100_000
+IMAGE_TOKENS = 765
+INFO_ROW = re.compile(r"^\s*\d+\s+\S")
+
+
+@lru_cache(maxsize=8)
+def _encoding(model: str) -> "tiktoken.Encoding":
+    try:
+        return tiktoken.encoding_for_model(model)
+    except KeyError:
+        return tiktoken.get_encoding("o200k_base")
+
+
+def count_tokens(text: str | None, model: str = "gpt-4o-2024-11-20") -> int:
+    """テキストのトークン数（tiktoken があれば正確に、なければ概算）"""
+    if not text:
+        return 0
+    if tiktoken is not None:
+        return len(_encoding(model).encode(text, disallowed_special=()))
+    non_ascii = sum(1 for ch in text if ord(ch) > 127)
+    return non_ascii + (len(text) - non_ascii) // 4
+
+
+def truncate_middle(
+    text: str,
+    max_tokens: int,
+    model: str = "gpt-4o-2024-11-20",
+) -> str:
+    """先頭と末尾を残して中間を省略する（ログは両端に情報が多いため）"""
+    total = count_tokens(text, model)
+    if total <= max_tokens:
+        return text
+    ratio = max_tokens / total
+    while True:
+        keep = int(len(text) * ratio / 2)
+        head = text[:keep]
+        tail = text[len(text) - keep:] if keep else ""
+        # 行の途中で切らないよう改行位置に寄せる
+        if "\n" in head:
+            head = head[: head.rfind("\n") + 1]
+        if "\n" in tail:
+            tail = tail[tail.find("\n") + 1:]
+        omitted = total - count_tokens(head, model) - count_tokens(tail, model)
+        truncated = f"{head}\n...(中略: 約{omitted}トークン)...\n{tail}"
+        if count_tokens(truncated, model) <= max_tokens or keep == 0:
+            return truncated
+        ratio *= 0.9
+
+
+def _prune_columns(data_info: str, keep: int) -> str:
+    """markdown表と df.info() の列を先頭 keep 列に絞る"""
+    lines = []
+    n_info_rows = 0
+    for line in data_info.splitlines():
+        if line.startswith("|"):
+            cells = line.split("|")
+            # cells: ["", index, col1, col2, ..., ""]
+            if len(cells) > keep + 3:
+                filler = "---" if set(cells[2].strip()) <= {"-", ":"} else "…"
+                line = "|".join([*cells[: keep + 2], filler, ""])
+        elif INFO_ROW.match(line):
+            n_info_rows += 1
+            if n_info_rows > keep:
+                continue
+        elif n_info_rows > keep and line.startswith("dtypes"):
+            lines.append(f"... (他 {n_info_rows - keep} 列を省略)")
+            n_info_rows = 0
+        lines.append(line)
+    return "\n".join(lines)
+
+
+@lru_cache(maxsize=32)
+def prune_data_info(
+    data_info: str,
+    max_tokens: int,
+    model: str = "gpt-4o-2024-11-20",
+) -> str:
+    """列数を減らして data_info を予算内に収める（結果は決定的）"""
+    if count_tokens(data_info, model) <= max_tokens:
+        return data_info
+    n_columns = sum(1 for line in data_info.splitlines() if INFO_ROW.match(line))
+    keep = n_columns
+    while keep > 1:
+        keep //= 2
+        pruned = _prune_columns(data_info, keep)
+        if count_tokens(pruned, model) <= max_tokens:
+            return pruned
+    return truncate_middle(_prune_columns(data_info, 1), max_tokens, model)
+
+
+class TrimRecord(BaseModel):
+    section: str
+    original_tokens: int
+    kept_tokens: int
+
+
+class PromptBudget(BaseModel):
+    """プロンプトのセクション別トークン予算"""
+
+    max_input_tokens: int = DEFAULT_MAX_INPUT_TOKENS
+    data_info_tokens: int = 8_000
+    # stdout / stderr / error / テキスト出力のそれぞれに適用
+    log_tokens: int = 4_000
+    code_tokens: int = 8_000
+    review_tokens: int = 2_000
+
+    @classmethod
+    def for_model(cls, model: str) -> "PromptBudget":
+        return cls(
+            max_input_tokens=int(
+                os.getenv(
+                    "PROMPT_MAX_INPUT_TOKENS",
+                    MAX_INPUT_TOKENS.get(model, DEFAULT_MAX_INPUT_TOKENS),
+                )
+            ),
+            data_info_tokens=int(os.getenv("PROMPT_DATA_INFO_TOKENS", "8000")),
+            log_tokens=int(os.getenv("PROMPT_LOG_TOKENS", "4000")),
+        )
+
+
+class PromptTrimmer:
+    """予算に従ってセクションを切り詰め、省略した内容を記録する"""
+
+    def __init__(
+        self,
+        budget: PromptBudget | None = None,
+        model: str = "gpt-4o-2024-11-20",
+    ) -> None:
+        self.budget = budget or PromptBudget()
+        self.model = model
+        self.trims: list[TrimRecord] = []
+
+    def _record(self, section: str, original: str, kept: str) -> None:
+        if original == kept:
+            return
+        trim = TrimRecord(
+            section=section,
+            original_tokens=count_tokens(original, self.model),
+            kept_tokens=count_tokens(kept, self.model),
+        )
+        self.trims.append(trim)
+        logger.info(f"Trimmed prompt section: {trim.model_dump()}")
+        ledger.record(
+            "prompt_trim",
+            time.time(),
+            model=self.model,
+            trimmed_tokens=trim.original_tokens - trim.kept_tokens,
+        )
+
+    def data_info(self, data_info: str) -> str:
+        pruned = prune_data_info(data_info, self.budget.data_info_tokens, self.model)
+        self._record("data_info", data_info, pruned)
+        return pruned
+
+    def fit(
+        self,
+        sections: dict[str, tuple[str | None, int]],
+        reserved: list[dict] | None = None,
+    ) -> dict[str, str | None]:
+        """各セクションを (本文, 予算) に収め、合計が上限を超えるなら比例配分で縮める
+
+        reserved は切り詰めない固定部分（システムメッセージなど）で、
+        上限からその分を差し引いた残りをセクションに割り当てる。
+        """
+        available = self.budget.max_input_tokens - self._count_messages(reserved)
+        requested = {
+            name: min(count_tokens(text, self.model), budget)
+            for name, (text, budget) in sections.items()
+        }
+        total = sum(requested.values())
+        scale = min(1.0, max(available, 0) / total) if total else 1.0
+        fitted: dict[str, str | None] = {}
+        for name, (text, _) in sections.items():
+            if not text:
+                fitted[name] = text
+                continue
+            fitted[name] = truncate_middle(
+                text, int(requested[name] * scale), self.model
+            )
+            self._record(name, text, fitted[name])
+        return fitted
+
+    def _count_messages(self, messages: list[dict] | None) -> int:
+        tokens = 0
+
+        def visit(value: object) -> None:
+            nonlocal tokens
+            if isinstance(value, str):
+                tokens += count_tokens(value, self.model)
+            elif isinstance(value, dict):
+                if value.get("type") in ("input_image", "image_url"):
+                    tokens += IMAGE_TOKENS
+                    return
+                for v in value.values():
+                    visit(v)
+            elif isinstance(value, list):
+                for v in value:
+                    visit(v)
+
+        visit(messages or [])
+        return tokens
@@ -0,0 +1,272 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+
+from collections import OrderedDict
+from enum import StrEnum
+from pathlib import Path
+from typing import Protocol
+
+from loguru import logger
+from pydantic import BaseModel
+
+from src.llms.models.llm_response import LLMResponse
+
+
+class CacheMode(StrEnum):
+    OFF = "off"
+    # キャッシュがあれば利用し、なければAPIを呼び出して記録する
+    READ_WRITE = "read_write"
+    # 常にAPIを呼び出し、結果でキャッシュを上書きする
+    RECORD = "record"
+    # 記録済みの応答のみを返す（ミス時は例外）
+    REPLAY = "replay"
+
+
+class CacheMissError(LookupError):
+    pass
+
+
+class CacheStore(Protocol):
+    def get(self, key: str) -> str | None: ...
+
+    def set(self, key: str, value: str) -> None: ...
+
+
+class MemoryCacheStore:
+    """プロセス内のLRUストア"""
+
+    def __init__(self, max_entries: int = 1024, ttl: float | None = None) -> None:
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries: OrderedDict[str, tuple[float, str]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> str | None:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            created_at, value = entry
+            if self.ttl is not None and time.time() - created_at > self.ttl:
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key: str, value: str) -> None:
+        with self._lock:
+            self._entries[key] = (time.time(), value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+
+class SQLiteCacheStore:
+    """SQLiteによるディスクストア（LRU・サイズ上限・TTLで退避）"""
+
+    def __init__(
+        self,
+        path: str | Path,
+        max_entries: int | None = None,
+        max_bytes: int | None = None,
+        ttl: float | None = None,
+    ) -> None:
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(
+            self.path, check_same_thread=False, isolation_level=None
+        )
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS responses ("
+            " key TEXT PRIMARY KEY,"
+            " value TEXT NOT NULL,"
+            " size INTEGER NOT NULL,"
+            " created_at REAL NOT NULL,"
+            " accessed_at REAL NOT NULL)"
+        )
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS responses_accessed_at"
+            " ON responses (accessed_at)"
+        )
+
+    def get(self, key: str) -> str | None:
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value, created_at FROM responses WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                return None
+            value, created_at = row
+            if self.ttl is not None and now - created_at > self.ttl:
+                self._conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+                return None
+            self._conn.execute(
+                "UPDATE responses SET accessed_at = ? WHERE key = ?", (now, key)
+            )
+            return value
+
+    def set(self, key: str, value: str) -> None:
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?)",
+                (key, value, len(value.encode()), now, now),
+            )
+            self._evict()
+
+    def _evict(self) -> None:
+        if self.ttl is not None:
+            self._conn.execute(
+                "DELETE FROM responses WHERE created_at < ?",
+                (time.time() - self.ttl,),
+            )
+        if self.max_entries is not None:
+            self._conn.execute(
+                "DELETE FROM responses WHERE key IN ("
+                " SELECT key FROM responses ORDER BY accessed_at DESC"
+                " LIMIT -1 OFFSET ?)",
+                (self.max_entries,),
+            )
+        if self.max_bytes is not None:
+            # 最近参照されたものから累積し、上限を超えた分を削除
+            total = 0
+            evicted = []
+            for key, size in self._conn.execute(
+                "SELECT key, size FROM responses ORDER BY accessed_at DESC"
+            ).fetchall():
+                total += size
+                if total > self.max_bytes:
+                    evicted.append((key,))
+            self._conn.executemany("DELETE FROM responses WHERE key = ?", evicted)
+
+
+def _normalize(value: object) -> object:
+    if isinstance(value, str):
+        return value.strip()
+    if isinstance(value, dict):
+        return {k: _normalize(v) for k, v in sorted(value.items())}
+    if isinstance(value, (list, tuple)):
+        return [_normalize(v) for v in value]
+    return value
+
+
+def cache_key(
+    messages: list[dict],
+    model: str,
+    response_format: type[BaseModel] | None = None,
+) -> str:
+    payload = {
+        "model": model,
+        "messages": _normalize(messages),
+        "schema": (
+            response_format.model_json_schema() if response_format else None
+        ),
+    }
+    serialized = json.dumps(
+        payload, sort_keys=True, ensure_ascii=False, separators=(",", ":")
+    )
+    return hashlib.sha256(serialized.encode()).hexdigest()
+
+
+class ResponseCache:
+    def __init__(
+        self,
+        store: CacheStore,
+        mode: CacheMode = CacheMode.READ_WRITE,
+    ) -> None:
+        self.store = store
+        self.mode = mode
+
+    @classmethod
+    def from_env(cls) -> "ResponseCache | None":
+        mode = CacheMode(os.getenv("LLM_CACHE_MODE", CacheMode.OFF))
+        if mode == CacheMode.OFF:
+            return None
+        ttl = os.getenv("LLM_CACHE_TTL")
+        max_entries = os.getenv("LLM_CACHE_MAX_ENTRIES")
+        max_bytes = os.getenv("LLM_CACHE_MAX_BYTES")
+        store = SQLiteCacheStore(
+            os.getenv("LLM_CACHE_PATH", ".cache/llm_responses.sqlite3"),
+            max_entries=int(max_entries) if max_entries else None,
+            max_bytes=int(max_bytes) if max_bytes else None,
+            ttl=float(ttl) if ttl else None,
+        )
+        return cls(store, mode=mode)
+
+    def lookup(
+        self,
+        messages: list[dict],
+        model: str,
+        response_format: type[BaseModel] | None = None,
+    ) -> LLMResponse | None:
+        if self.mode == CacheMode.RECORD:
+            return None
+        key = cache_key(messages, model, response_format)
+        value = self.store.get(key)
+        if value is None:
+            if self.mode == CacheMode.REPLAY:
+                raise CacheMissError(f"No recorded response for key: {key}")
+            return None
+        record = json.loads(value)
+        content = record.pop("content")
+        if response_format is not None:
+            content = response_format.model_validate(content)
+        logger.debug(f"Cache hit: {key}")
+        return LLMResponse(
+            **record,
+            messages=messages,
+            content=content,
+            from_cache=True,
+        )
+
+    def save(
+        self,
+        response: LLMResponse,
+        response_format: type[BaseModel] | None = None,
+    ) -> None:
+        if self.mode == CacheMode.REPLAY:
+            return
+        key = cache_key(response.messages, response.model, response_format)
+        content = response.content
+        record = response.model_dump(
+            mode="json", exclude={"messages", "content", "from_cache"}
+        )
+        record["content"] = (
+            content.model_dump(mode="json")
+            if isinstance(content, BaseModel)
+            else content
+        )
+        self.store.set(key, json.dumps(record, ensure_ascii=False))
+
+
+_response_cache: ResponseCache | None = None
+_configured = False
+_lock = threading.Lock()
+
+
+def get_response_cache() -> ResponseCache | None:
+    """環境変数 LLM_CACHE_* から初期化されるプロセス共有のキャッシュを返す"""
+    global _response_cache, _configured
+    if not _configured:
+        with _lock:
+            if not _configured:
+                _response_cache = ResponseCache.from_env()
+                _configured = True
+    return _response_cache
+
+
+def set_response_cache(cache: ResponseCache | None) -> None:
+    global _response_cache, _configured
+    with _lock:
+        _response_cache = cache
+        _configured = True
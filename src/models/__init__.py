@@ -1,6 +1,18 @@
 from .data_thread import DataThread
+from .dataset_profile import ColumnProfile, DatasetProfile, ProfileOptions
+from .ledger_entry import LedgerEntry, StageSummary
 from .plan import Plan
 from .program import Program
 from .review import Review
 
-__all__ = ["DataThread", "Plan", "Program", "Review"]
+__all__ = [
+    "ColumnProfile",
+    "DataThread",
+    "DatasetProfile",
+    "LedgerEntry",
+    "Plan",
+    "ProfileOptions",
+    "Program",
+    "Review",
+    "StageSummary",
+]
@@ -13,3 +13,9 @@ class DataThread(BaseModel):
     observation: str | None = None
     results: list[dict] = Field(default_factory=list)
     pathes: dict = Field(default_factory=dict)
+    # 実行後にカーネルに残っている変数の要約（名前・型・形状・dtype）
+    namespace: str | None = None
+    # 実行前の静的チェックで弾かれた（サンドボックスでは実行していない）
+    is_preflight_error: bool = False
+    # 打ち切ったセルが止まらず、このサンドボックスでは続きを実行できない
+    is_sandbox_broken: bool = False
@@ -0,0 +1,54 @@
+from pydantic import BaseModel, ConfigDict, Field
+
+
+class ProfileOptions(BaseModel):
+    """データ概要の作成条件（キャッシュキーの一部になる）"""
+
+    model_config = ConfigDict(frozen=True)
+
+    template_file: str = "src/prompts/describe_dataframe.jinja"
+    n_sample: int = 5
+    # サンプル行の乱数シード（None で毎回変わる）
+    sample_seed: int | None = 0
+    # 水準を網羅するよう層別に抽出する列（None で自動選択、() で層別しない）
+    stratify_by: tuple[str, ...] | None = None
+    stratify_max_levels: int = 20
+    # 列ごとの集計（上位値の件数・ヒストグラムのビン数）
+    top_k: int = 5
+    histogram_bins: int = 10
+    # 読み込む列（None で全列）
+    columns: tuple[str, ...] | None = None
+    # 指定時、またはファイルが上限の1/4を超える場合はチャンク単位で集計する
+    chunk_size: int | None = None
+    max_memory_mb: int = 1024
+    # チャンク集計時の分位点（近似）に使う列ごとの標本サイズ
+    quantile_sample_size: int = 10_000
+
+
+class ColumnProfile(BaseModel):
+    name: str
+    dtype: str
+    count: int
+    null_rate: float
+    n_unique: int
+    # n_unique が上限で打ち切られた下限値の場合 True
+    n_unique_truncated: bool = False
+    top_values: dict[str, int] = Field(default_factory=dict)
+    histogram_edges: list[float] | None = None
+    histogram_counts: list[int] | None = None
+
+
+class DatasetProfile(BaseModel):
+    content_hash: str
+    options: ProfileOptions
+    n_rows: int
+    n_columns: int
+    dtypes: dict[str, str]
+    df_info: str
+    df_sample: str
+    df_describe: str
+    data_info: str
+    column_profiles: list[ColumnProfile] = Field(default_factory=list)
+    # 数値列の相関係数 {列: {列: 係数}}
+    correlations: dict[str, dict[str, float]] = Field(default_factory=dict)
+    created_at: float
@@ -0,0 +1,31 @@
+from pydantic import BaseModel
+
+
+class LedgerEntry(BaseModel):
+    run_id: str
+    stage: str
+    process_id: str | None = None
+    thread_id: int | None = None
+    model: str | None = None
+    started_at: float
+    wall_seconds: float
+    input_tokens: int = 0
+    output_tokens: int = 0
+    cached_tokens: int = 0
+    cost: float = 0.0
+    # プロンプト予算で切り詰めたトークン数
+    trimmed_tokens: int = 0
+    from_cache: bool = False
+    error: str | None = None
+
+
+class StageSummary(BaseModel):
+    stage: str
+    calls: int
+    errors: int
+    wall_seconds: float
+    input_tokens: int
+    output_tokens: int
+    cached_tokens: int
+    trimmed_tokens: int
+    cost: float
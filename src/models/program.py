@@ -5,3 +5,10 @@ class Program(BaseModel):
     achievement_condition: str = Field(description="要求の達成条件")
     execution_plan: str = Field(description="実行計画")
     code: str = Field(description="生成対象となるコード")
+    is_incremental: bool = Field(
+        default=False,
+        description=(
+            "カーネルに残っている前回までの変数を使い、"
+            "続きのセルだけを記述した場合は true"
+        ),
+    )
@@ -1,17 +1,32 @@
-from .describe_dataframe import describe_dataframe
-from .generate_code import generate_code
-from .execute_code import execute_code
+from .describe_dataframe import describe_dataframe, profile_dataframe
+from .generate_code import agenerate_code, code_batch_request, generate_code
+from .execute_code import execute_code, known_names, summarize_namespace
 from .set_dataframe import set_dataframe
-from .generate_review import generate_review
-from .generate_plan import generate_plan
-from .generate_report import generate_report
+from .generate_review import (
+    agenerate_review,
+    generate_review,
+    review_batch_request,
+)
+from .generate_plan import agenerate_plan, generate_plan, plan_batch_request
+from .generate_report import agenerate_report, generate_report, stream_report
 
 __all__ = [
     "describe_dataframe",
+    "profile_dataframe",
     "generate_code",
+    "agenerate_code",
+    "code_batch_request",
     "execute_code",
+    "known_names",
+    "summarize_namespace",
     "set_dataframe",
     "generate_review",
+    "agenerate_review",
+    "review_batch_request",
     "generate_plan",
+    "agenerate_plan",
+    "plan_batch_request",
     "generate_report",
+    "agenerate_report",
+    "stream_report",
 ]
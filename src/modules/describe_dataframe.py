@@ -1,20 +1,143 @@
 import io
-import pandas as pd
+import time
+
+from pathlib import Path
+
+from loguru import logger
 
 from src.llms.utils import load_template
+from src.models import DatasetProfile, ProfileOptions
+from src.utils.column_stats import (
+    column_profiles,
+    correlations,
+    render_column_profiles,
+)
+from src.utils.dataframe_io import iter_dataframe, read_dataframe
+from src.utils.sampling import categorical_columns, stratified_sample
+from src.utils.profile_cache import DataSource, get_profile_cache, hash_source
+from src.utils.streaming_profile import MB, StreamingProfiler, estimate_chunk_rows
 
 
-def describe_dataframe(
-    file_object: io.BytesIO,
-    template_file: str = "src/prompts/describe_dataframe.jinja",
-) -> str:
-    df = pd.read_csv(file_object)
+def _source_size(file_object: DataSource) -> int:
+    if isinstance(file_object, io.BytesIO):
+        return file_object.getbuffer().nbytes
+    return Path(file_object).stat().st_size
+
+
+def _columns(options: ProfileOptions) -> list[str] | None:
+    return list(options.columns) if options.columns is not None else None
+
+
+def _read_full(file_object: DataSource, options: ProfileOptions) -> dict:
+    df = read_dataframe(file_object, columns=_columns(options))
     buf = io.StringIO()
     df.info(buf=buf)
-    df_info = buf.getvalue()
-    template = load_template(template_file)
-    return template.render(
-        df_info=df_info,
-        df_sample=df.sample(5).to_markdown(),
-        df_describe=df.describe().to_markdown(),
+    stratify_by = (
+        list(options.stratify_by)
+        if options.stratify_by is not None
+        else categorical_columns(df, options.stratify_max_levels)
+    )
+    sample = stratified_sample(
+        df, options.n_sample, options.sample_seed, stratify_by
+    )
+    return {
+        "n_rows": len(df),
+        "dtypes": df.dtypes.to_dict(),
+        "df_info": buf.getvalue(),
+        "df_sample": sample.to_markdown(),
+        "df_describe": df.describe().to_markdown(),
+        "column_profiles": column_profiles(
+            df, options.top_k, options.histogram_bins
+        ),
+        "correlations": correlations(df),
+    }
+
+
+def _read_chunked(file_object: DataSource, options: ProfileOptions) -> dict:
+    columns = _columns(options)
+    chunk_size = options.chunk_size
+    if chunk_size is None:
+        head = next(iter_dataframe(file_object, 1_000, columns))
+        chunk_size = estimate_chunk_rows(head, options.max_memory_mb)
+    logger.info(f"Profiling in chunks of {chunk_size} rows")
+    profiler = StreamingProfiler(
+        n_sample=options.n_sample,
+        quantile_sample_size=options.quantile_sample_size,
+        seed=options.sample_seed,
+        stratify_by=(
+            list(options.stratify_by) if options.stratify_by is not None else None
+        ),
+        max_levels=options.stratify_max_levels,
+        top_k=options.top_k,
+        histogram_bins=options.histogram_bins,
+    )
+    for chunk in iter_dataframe(file_object, chunk_size, columns):
+        profiler.update(chunk)
+    return {
+        "n_rows": profiler.n_rows,
+        "dtypes": profiler.dtypes,
+        "df_info": profiler.info(),
+        "df_sample": profiler.sample().to_markdown(),
+        "df_describe": profiler.describe().to_markdown(),
+        "column_profiles": profiler.column_profiles(),
+        "correlations": profiler.correlations(),
+    }
+
+
+def _profile(
+    file_object: DataSource,
+    content_hash: str,
+    options: ProfileOptions,
+) -> DatasetProfile:
+    # 大きなファイルは全体を読み込まず、チャンクごとの集計で同じ出力を作る
+    if (
+        options.chunk_size is not None
+        or _source_size(file_object) > options.max_memory_mb * MB / 4
+    ):
+        summary = _read_chunked(file_object, options)
+    else:
+        summary = _read_full(file_object, options)
+    dtypes = summary.pop("dtypes")
+    template = load_template(options.template_file)
+    return DatasetProfile(
+        content_hash=content_hash,
+        options=options,
+        n_columns=len(dtypes),
+        dtypes={str(k): str(v) for k, v in dtypes.items()},
+        data_info=template.render(
+            df_info=summary["df_info"],
+            df_sample=summary["df_sample"],
+            df_describe=summary["df_describe"],
+            column_profile=render_column_profiles(
+                summary["column_profiles"], summary["correlations"]
+            ),
+        ),
+        created_at=time.time(),
+        **summary,
+    )
+
+
+def profile_dataframe(
+    file_object: DataSource,
+    options: ProfileOptions | None = None,
+) -> DatasetProfile:
+    """データ概要を作成する（同じ内容・条件なら解析せずキャッシュを返す）"""
+    options = options or ProfileOptions()
+    content_hash = hash_source(file_object)
+    cache = get_profile_cache()
+    if cache is None:
+        return _profile(file_object, content_hash, options)
+    return cache.get_or_create(
+        content_hash,
+        options,
+        lambda: _profile(file_object, content_hash, options),
     )
+
+
+def describe_dataframe(
+    file_object: DataSource,
+    template_file: str = "src/prompts/describe_dataframe.jinja",
+    options: ProfileOptions | None = None,
+) -> str:
+    options = options or ProfileOptions(template_file=template_file)
+    return profile_dataframe(file_object, options).data_info
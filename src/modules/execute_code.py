@@ -1,15 +1,77 @@
+import os
 import re
+import time
 
-from e2b_code_interpreter import Sandbox
+from typing import TYPE_CHECKING
+
+from e2b.exceptions import TimeoutException
+from e2b_code_interpreter.models import Execution, ExecutionError
 from loguru import logger
 
 from src.models import DataThread
+from src.utils import ledger
+from src.utils.output_capture import OutputCapture, OutputLimitExceeded
+from src.utils.preflight import SANDBOX_NAMES, code_bound_names, preflight
+
+if TYPE_CHECKING:
+    # src.sandbox は src.modules に依存するため型注釈のみで参照する
+    from src.sandbox import CodeSandbox
+
+
+# 打ち切った後にカーネルが次の実行を受け付けるか確かめる時間
+KERNEL_PROBE_TIMEOUT = 10
+
+FENCED_BLOCK = re.compile(r"```(?:python|py)?[^\n]*\n(.*?)```", re.DOTALL)
+
+# カーネルのユーザー変数を1行ずつ出力する（実行後に名前を残さない）
+NAMESPACE_CODE = """
+def _summarize_namespace(max_vars=50, max_columns=20):
+    import types
+    skip = {"In", "Out", "get_ipython", "exit", "quit"}
+    lines = []
+    for name, value in list(globals().items()):
+        if name.startswith("_") or name in skip:
+            continue
+        if isinstance(value, types.ModuleType):
+            continue
+        kind = type(value).__name__
+        try:
+            if hasattr(value, "columns") and hasattr(value, "dtypes"):
+                dtypes = ", ".join(
+                    f"{c}: {t}" for c, t in list(value.dtypes.items())[:max_columns]
+                )
+                more = value.shape[1] - max_columns
+                if more > 0:
+                    dtypes += f", ... (+{more})"
+                line = f"{name}: {kind} shape={value.shape} [{dtypes}]"
+            elif hasattr(value, "dtype") and hasattr(value, "shape"):
+                line = f"{name}: {kind} shape={value.shape} dtype={value.dtype}"
+            elif isinstance(value, (int, float, bool, str)):
+                line = f"{name}: {kind} = {repr(value)[:80]}"
+            elif isinstance(value, (list, tuple, dict, set)):
+                line = f"{name}: {kind} len={len(value)}"
+            else:
+                line = f"{name}: {kind}"
+        except Exception:
+            line = f"{name}: {kind}"
+        lines.append(line)
+    if len(lines) > max_vars:
+        lines = lines[:max_vars] + [f"... (+{len(lines) - max_vars})"]
+    print("\\n".join(lines))
+_summarize_namespace()
+del _summarize_namespace
+"""
 
 
 def clean_code(code: str) -> str:
     """マークダウンのコードブロック記号を除去"""
     # 先頭と末尾の空白を除去
     code = code.strip()
+
+    # 説明文の中にコードブロックがある場合は、ブロックの中身だけを使う
+    blocks = FENCED_BLOCK.findall(code)
+    if blocks:
+        code = "\n\n".join(block.strip() for block in blocks)
     
     # マークダウンのコードブロック記号を除去
     # ```python や ```py や ``` で始まる場合
@@ -31,26 +93,143 @@ def clean_code(code: str) -> str:
     return code.strip()
 
 
+def known_names(previous_threads: list[DataThread]) -> set[str]:
+    """これまでの試行でカーネルに定義された（はずの）名前"""
+    names = set(SANDBOX_NAMES)
+    for thread in previous_threads:
+        if thread.is_preflight_error:
+            continue
+        if thread.is_sandbox_broken:
+            # 新しいサンドボックスに切り替わり、それまでの変数は残っていない
+            names = set(SANDBOX_NAMES)
+            continue
+        names |= code_bound_names(thread.code)
+        for line in (thread.namespace or "").splitlines():
+            name, sep, _ = line.partition(": ")
+            if sep and name.isidentifier():
+                names.add(name)
+    return names
+
+
+def kernel_is_idle(
+    sandbox: "CodeSandbox",
+    timeout: int = KERNEL_PROBE_TIMEOUT,
+) -> bool:
+    """打ち切ったセルが止まり、カーネルが次の実行を受け付けるか
+
+    LocalSandbox は run_code の中でセルを中断するが、e2b はクライアント側の
+    ストリームを閉じるだけで、セルがカーネル上で動き続けることがある。
+    """
+    try:
+        execution = sandbox.run_code("None", timeout=timeout)
+    except Exception as e:
+        logger.warning(f"Kernel is still busy after abort: {e}")
+        return False
+    return execution.error is None
+
+
+def summarize_namespace(sandbox: "CodeSandbox", timeout: int = 60) -> str | None:
+    """カーネルに残っている変数の名前・型・形状・dtype を要約する"""
+    try:
+        execution = sandbox.run_code(NAMESPACE_CODE, timeout=timeout)
+    except TimeoutException:
+        # 打ち切ったセルがまだ実行中の場合など
+        logger.warning("Timed out summarizing namespace")
+        return None
+    if execution.error is not None:
+        logger.warning(f"Failed to summarize namespace: {execution.error.name}")
+        return None
+    return "".join(execution.logs.stdout).strip() or None
+
+
 def execute_code(
-    sandbox: Sandbox,
+    sandbox: "CodeSandbox",
     process_id: str,
     thread_id: int,
     code: str,
     user_request: str | None = None,
-    timeout: int = 1200,
+    timeout: int | None = None,
+    with_namespace: bool = False,
+    known: set[str] | None = None,
 ) -> DataThread:
     # マークダウンのコードブロック記号を除去
     cleaned_code = clean_code(code)
-    
-    execution = sandbox.run_code(
-        cleaned_code,
-        timeout=timeout,
+
+    # 確実に失敗するコードはサンドボックスに送らずに差し戻す
+    started_at = time.time()
+    issues = preflight(cleaned_code, known)
+    ledger.record(
+        "preflight",
+        started_at,
+        process_id=process_id,
+        thread_id=thread_id,
+        error="PreflightError" if issues else None,
+    )
+    if issues:
+        logger.warning(f"Preflight failed: {[str(issue) for issue in issues]}")
+        return DataThread(
+            process_id=process_id,
+            thread_id=thread_id,
+            user_request=user_request,
+            code=cleaned_code,
+            error="PreflightError: 実行前の静的チェックで問題が見つかりました\n"
+            + "\n".join(str(issue) for issue in issues),
+            is_preflight_error=True,
+        )
+
+    # 1回の試行の実行時間（既定は SANDBOX_EXEC_TIMEOUT）と出力量に上限を設け、
+    # 暴走したコードは早めに打ち切ってエラーとして差し戻す
+    timeout = timeout or int(os.getenv("SANDBOX_EXEC_TIMEOUT", "300"))
+    capture = OutputCapture.from_env()
+    started_at = time.time()
+    is_aborted = True
+    try:
+        execution = sandbox.run_code(
+            cleaned_code,
+            timeout=timeout,
+            on_stdout=capture.on_stdout,
+            on_stderr=capture.on_stderr,
+        )
+        is_aborted = False
+    except OutputLimitExceeded as e:
+        execution = Execution(
+            error=ExecutionError(
+                name="OutputLimitExceeded",
+                value=str(e),
+                traceback=(
+                    f"OutputLimitExceeded: 出力が {e.max_bytes} バイトを"
+                    "超えたため実行を中断しました。"
+                    "ループ内で行ごとに print せず、集計した結果だけを出力してください。"
+                ),
+            )
+        )
+    except TimeoutException as e:
+        execution = Execution(
+            error=ExecutionError(
+                name="TimeoutError",
+                value=str(e),
+                traceback=(
+                    f"TimeoutError: 実行時間が {timeout} 秒を超えたため中断しました。"
+                    "処理を軽くする（サンプリング・ベクトル化など）か、"
+                    "無限ループになっていないか確認してください。"
+                ),
+            )
+        )
+    # 中断できずにセルが動き続けている場合、このサンドボックスは使い続けない
+    is_sandbox_broken = is_aborted and not kernel_is_idle(sandbox)
+    ledger.record(
+        "execute",
+        started_at,
+        process_id=process_id,
+        thread_id=thread_id,
+        error=getattr(execution.error, "name", None),
     )
     # デバッグ情報を簡潔に出力（警告の詳細は除外）
     logger.debug(
         f"Execution completed: "
         f"results={len(execution.results)}, "
-        f"error={execution.error is not None}"
+        f"error={execution.error is not None}, "
+        f"output_bytes={capture.total_bytes}"
     )
     results = [
         {"type": "png", "content": r.png}
@@ -63,8 +242,21 @@ def execute_code(
         thread_id=thread_id,
         user_request=user_request,
         code=cleaned_code,  # クリーンアップされたコードを保存
-        error=getattr(execution.error, "traceback", None),
-        stderr="".join(execution.logs.stderr).strip(),
-        stdout="".join(execution.logs.stdout).strip(),
+        error=(
+            f"{execution.error.traceback}\n"
+            "サンドボックスを作り直すため、これまでのセルで定義した変数は残っていません。"
+            if is_sandbox_broken
+            else getattr(execution.error, "traceback", None)
+        ),
+        # 大量の出力は先頭と末尾だけを残す
+        stderr=capture.stderr.text().strip(),
+        stdout=capture.stdout.text().strip(),
         results=results,
+        # 再試行で続きのセルだけを生成できるよう、残っている変数を伝える
+        namespace=(
+            summarize_namespace(sandbox)
+            if with_namespace and not is_sandbox_broken
+            else None
+        ),
+        is_sandbox_broken=is_sandbox_broken,
     )
@@ -1,45 +1,150 @@
 from src.llms.apis import openai
+from src.llms.apis.batch import BatchRequest
 from src.llms.models import LLMResponse
-from src.llms.utils import load_template
+from src.llms.utils import PromptBudget, PromptTrimmer, load_template
 from src.models import DataThread, Program
 
 
-def generate_code(
+def build_messages(
     data_info: str,
     user_request: str,
-    remote_save_dir: str = "outputs/process_id/id",
-    previous_thread: DataThread | None = None,
+    remote_save_dir: str,
+    previous_thread: DataThread | None,
+    template_file: str,
+    budget: PromptBudget | None = None,
     model: str = "gpt-4o-mini-2024-07-18",
-    template_file: str = "src/prompts/generate_code.jinja"
-) -> LLMResponse:
+) -> list[dict]:
+    # トークン数の計算と切り詰めは実際に使うモデルのトークナイザで行う
+    trimmer = PromptTrimmer(budget, model=model)
+    # プロンプトキャッシュが効くよう、先頭のシステムメッセージは
+    # テンプレートとデータ情報のみで構成し、タスク・試行ごとに変化させない
     template = load_template(template_file)
     system_message = template.render(
-        data_info=data_info,
-        remote_save_dir=remote_save_dir
+        data_info=trimmer.data_info(data_info),
     )
     messages = [
         {"role": "system", "content": system_message},
-        {"role": "user", "content": user_request}
+        {
+            "role": "user",
+            "content": f"{user_request}\n\n保存先ディレクトリ: \"{remote_save_dir}\"",
+        },
     ]
     if previous_thread:
-        messages.append({"role": "assistant", "content": previous_thread.code})
-
-        if previous_thread.stdout and previous_thread.stderr:
-            messages.extend([
-                {
-                    "role": "system",
-                    "content": f"stdout: {previous_thread.stdout}"},
-                {
-                    "role": "system",
-                    "content": f"stderr: {previous_thread.stderr}"},
-            ])
-        if previous_thread.observation:
-            messages.append({
-                "role": "user",
-                "content": f"以下のレビューを参考にして、ユーザー要求を満たすコードを再生成してください: {previous_thread.observation}"
-            })
+        # 前回の出力は長くなり得るため、セクションごとの予算内に切り詰める
+        log_tokens = trimmer.budget.log_tokens
+        sections = trimmer.fit(
+            {
+                "code": (previous_thread.code, trimmer.budget.code_tokens),
+                "stdout": (previous_thread.stdout, log_tokens),
+                "stderr": (previous_thread.stderr, log_tokens),
+                "error": (previous_thread.error, log_tokens),
+                "observation": (
+                    previous_thread.observation,
+                    trimmer.budget.review_tokens,
+                ),
+                "namespace": (previous_thread.namespace, log_tokens),
+            },
+            reserved=messages,
+        )
+        messages.append({"role": "assistant", "content": sections["code"]})
+
+        # 前回の実行結果とレビューは1つのユーザーメッセージにまとめて末尾に追加
+        feedback = [
+            f"{name}: {sections[name]}"
+            for name in ["stdout", "stderr", "error"]
+            if sections[name]
+        ]
+        if sections["observation"]:
+            feedback.append(
+                "以下のレビューを参考にして、ユーザー要求を満たすコードを再生成してください: "
+                f"{sections['observation']}"
+            )
+        if sections["namespace"]:
+            # 実行済みの処理をやり直さずに済むよう、カーネルの状態を伝える
+            feedback.append(
+                "カーネルには以下の変数が残っています。"
+                "失敗した箇所より前の処理をやり直す必要がなければ、"
+                "これらの変数を使う続きのセルだけを記述し、"
+                "is_incremental を true にしてください:\n"
+                f"{sections['namespace']}"
+            )
+        if feedback:
+            messages.append({"role": "user", "content": "\n\n".join(feedback)})
+    return messages
+
+
+def generate_code(
+    data_info: str,
+    user_request: str,
+    remote_save_dir: str = "outputs/process_id/id",
+    previous_thread: DataThread | None = None,
+    model: str = "gpt-4o-mini-2024-07-18",
+    template_file: str = "src/prompts/generate_code.jinja"
+) -> LLMResponse:
+    messages = build_messages(
+        data_info,
+        user_request,
+        remote_save_dir,
+        previous_thread,
+        template_file,
+        PromptBudget.for_model(model),
+        model,
+    )
     return openai.generate_response(
         messages,
         model=model,
-        response_format=Program
+        response_format=Program,
+        stage="code",
+    )
+
+
+def code_batch_request(
+    custom_id: str,
+    data_info: str,
+    user_request: str,
+    remote_save_dir: str = "outputs/process_id/id",
+    previous_thread: DataThread | None = None,
+    model: str = "gpt-4o-mini-2024-07-18",
+    template_file: str = "src/prompts/generate_code.jinja"
+) -> BatchRequest:
+    messages = build_messages(
+        data_info,
+        user_request,
+        remote_save_dir,
+        previous_thread,
+        template_file,
+        PromptBudget.for_model(model),
+        model,
+    )
+    return BatchRequest(
+        custom_id=custom_id,
+        messages=messages,
+        model=model,
+        response_format=Program,
+        stage="code",
+    )
+
+
+async def agenerate_code(
+    data_info: str,
+    user_request: str,
+    remote_save_dir: str = "outputs/process_id/id",
+    previous_thread: DataThread | None = None,
+    model: str = "gpt-4o-mini-2024-07-18",
+    template_file: str = "src/prompts/generate_code.jinja"
+) -> LLMResponse:
+    messages = build_messages(
+        data_info,
+        user_request,
+        remote_save_dir,
+        previous_thread,
+        template_file,
+        PromptBudget.for_model(model),
+        model,
+    )
+    return await openai.agenerate_response(
+        messages,
+        model=model,
+        response_format=Program,
+        stage="code",
     )
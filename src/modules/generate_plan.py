@@ -1,25 +1,66 @@
 from src.llms.apis import openai
+from src.llms.apis.batch import BatchRequest
 from src.llms.models import LLMResponse
 from src.llms.utils import load_template
 from src.models import Plan
 
 
-def generate_plan(
+def build_messages(
     data_info: str,
     user_request: str,
-    model: str = "gpt-4o-mini-2024-07-18",
-    template_file: str = "src/prompts/generate_plan.jinja",
-) -> LLMResponse:
+    template_file: str,
+) -> list[dict]:
     template = load_template(template_file)
     system_message = template.render(
         data_info=data_info,
     )
-    messages = [
+    return [
         {"role": "system", "content": system_message},
         {"role": "user", "content": f"タスク要求: {user_request}"},
     ]
+
+
+def generate_plan(
+    data_info: str,
+    user_request: str,
+    model: str = "gpt-4o-mini-2024-07-18",
+    template_file: str = "src/prompts/generate_plan.jinja",
+) -> LLMResponse:
+    messages = build_messages(data_info, user_request, template_file)
     return openai.generate_response(
         messages,
         model=model,
         response_format=Plan,
+        stage="plan",
+    )
+
+
+def plan_batch_request(
+    custom_id: str,
+    data_info: str,
+    user_request: str,
+    model: str = "gpt-4o-mini-2024-07-18",
+    template_file: str = "src/prompts/generate_plan.jinja",
+) -> BatchRequest:
+    return BatchRequest(
+        custom_id=custom_id,
+        messages=build_messages(data_info, user_request, template_file),
+        model=model,
+        response_format=Plan,
+        stage="plan",
+    )
+
+
+async def agenerate_plan(
+    data_info: str,
+    user_request: str,
+    model: str = "gpt-4o-mini-2024-07-18",
+    template_file: str = "src/prompts/generate_plan.jinja",
+) -> LLMResponse:
+    messages = build_messages(data_info, user_request, template_file)
+    return await openai.agenerate_response(
+        messages,
+        model=model,
+        response_format=Plan,
+        stage="plan",
     )
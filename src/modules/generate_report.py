@@ -1,6 +1,7 @@
 import os
 
 from base64 import b64decode
+from collections.abc import Generator
 from io import BytesIO
 from loguru import logger
 from PIL import Image
@@ -11,14 +12,13 @@ from src.llms.utils import load_template
 from src.models import DataThread
 
 
-def generate_report(
+def build_messages(
     data_info: str,
     user_request: str,
-    process_data_threads: list[DataThread] = [],
-    model: str = "gpt-4o-mini-2024-07-18",
-    output_dir: str = "outputs/sample",
-    template_file: str = "src/prompts/generate_report.jinja",
-) -> LLMResponse:
+    process_data_threads: list[DataThread],
+    output_dir: str,
+    template_file: str,
+) -> list[dict]:
     os.makedirs(output_dir, exist_ok=True)
     template = load_template(template_file)
     system_message = template.render(
@@ -71,12 +71,91 @@ def generate_report(
         messages.append(
             {"role": "user", "content": user_contents}
         )
-    
+    return messages
+
+
+def _write_report(output_dir: str, content: str) -> None:
+    with open(f"{output_dir}/report.md", "w") as fo:
+        fo.write(content)
+        logger.success(f"WRITE ... {fo.name}")
+
+
+def generate_report(
+    data_info: str,
+    user_request: str,
+    process_data_threads: list[DataThread] = [],
+    model: str = "gpt-4o-mini-2024-07-18",
+    output_dir: str = "outputs/sample",
+    template_file: str = "src/prompts/generate_report.jinja",
+) -> LLMResponse:
+    messages = build_messages(
+        data_info,
+        user_request,
+        process_data_threads,
+        output_dir,
+        template_file,
+    )
     llm_response = openai.generate_response(
         messages,
         model=model,
+        stage="report",
+    )
+    _write_report(output_dir, llm_response.content)
+    return llm_response
+
+
+async def agenerate_report(
+    data_info: str,
+    user_request: str,
+    process_data_threads: list[DataThread] = [],
+    model: str = "gpt-4o-mini-2024-07-18",
+    output_dir: str = "outputs/sample",
+    template_file: str = "src/prompts/generate_report.jinja",
+) -> LLMResponse:
+    messages = build_messages(
+        data_info,
+        user_request,
+        process_data_threads,
+        output_dir,
+        template_file,
+    )
+    llm_response = await openai.agenerate_response(
+        messages,
+        model=model,
+        stage="report",
+    )
+    _write_report(output_dir, llm_response.content)
+    return llm_response
+
+
+def stream_report(
+    data_info: str,
+    user_request: str,
+    process_data_threads: list[DataThread] = [],
+    model: str = "gpt-4o-mini-2024-07-18",
+    output_dir: str = "outputs/sample",
+    template_file: str = "src/prompts/generate_report.jinja",
+) -> Generator[str, None, LLMResponse]:
+    """レポートを生成しながら report.md へ逐次書き込み、差分をyieldする"""
+    messages = build_messages(
+        data_info,
+        user_request,
+        process_data_threads,
+        output_dir,
+        template_file,
+    )
+    chunks = openai.stream_response(
+        messages, model=model, stage="report"
     )
     with open(f"{output_dir}/report.md", "w") as fo:
-        fo.write(llm_response.content)
+        while True:
+            try:
+                chunk = next(chunks)
+            except StopIteration as stop:
+                llm_response = stop.value
+                break
+            fo.write(chunk)
+            fo.flush()
+            yield chunk
         logger.success(f"WRITE ... {fo.name}")
     return llm_response
@@ -1,22 +1,56 @@
 from src.llms.apis import openai
+from src.llms.apis.batch import BatchRequest
 from src.llms.models import LLMResponse
-from src.llms.utils import load_template
+from src.llms.utils import PromptBudget, PromptTrimmer, load_template
 from src.models import DataThread, Review
 
 
-def generate_review(
+def build_messages(
     data_info: str,
     user_request: str,
     data_thread: DataThread,
-    has_results: bool = False,
-    remote_save_dir: str = "outputs/process_id/id",
+    has_results: bool,
+    remote_save_dir: str,
+    template_file: str,
+    budget: PromptBudget | None = None,
     model: str = "gpt-4o-mini-2024-07-18",
-    template_file: str = "src/prompts/generate_review.jinja",
-) -> LLMResponse:
+) -> list[dict]:
+    # トークン数の計算と切り詰めは実際に使うモデルのトークナイザで行う
+    trimmer = PromptTrimmer(budget, model=model)
+    # 先頭のシステムメッセージはタスク間で同一に保つ（プロンプトキャッシュ用）
     template = load_template(template_file)
     system_instruction = template.render(
-        data_info=data_info,
-        remote_save_dir=remote_save_dir,
+        data_info=trimmer.data_info(data_info),
+    )
+    reserved = [
+        {"role": "system", "content": system_instruction},
+        {"role": "user", "content": user_request},
+    ]
+    text_results = {
+        f"result_{i}": (res["content"], trimmer.budget.log_tokens)
+        for i, res in enumerate(data_thread.results if has_results else [])
+        if res["type"] != "png"
+    }
+    if has_results:
+        reserved.append(
+            {
+                "role": "system",
+                "content": [
+                    {"type": "image_url"}
+                    for res in data_thread.results
+                    if res["type"] == "png"
+                ],
+            }
+        )
+    # 生成コードと実行ログは長くなり得るため、セクションごとの予算内に切り詰める
+    sections = trimmer.fit(
+        {
+            "code": (data_thread.code, trimmer.budget.code_tokens),
+            "stdout": (data_thread.stdout, trimmer.budget.log_tokens),
+            "stderr": (data_thread.stderr, trimmer.budget.log_tokens),
+            **text_results,
+        },
+        reserved=reserved,
     )
     if has_results:
         results = [
@@ -27,23 +61,104 @@ def generate_review(
                 }
             }
             if res["type"] == "png"
-            else {"type": "text", "text": res["content"]}
-            for res in data_thread.results
+            else {"type": "text", "text": sections[f"result_{i}"]}
+            for i, res in enumerate(data_thread.results)
         ]
-    messages = [
+    return [
         {"role": "system", "content": system_instruction},
         {"role": "user", "content": user_request},
-        {"role": "assistant", "content": data_thread.code},
+        {"role": "assistant", "content": sections["code"]},
         *([{"role": "system", "content": results}] if has_results else []),
-        {"role": "system", "content": f"stdout: {data_thread.stdout}"},
-        {"role": "system", "content": f"stderr: {data_thread.stderr}"},
         {
             "role": "user",
-            "content": "実行結果に対するフィードバックを提供してください。",
+            "content": (
+                f"stdout: {sections['stdout']}\n\n"
+                f"stderr: {sections['stderr']}\n\n"
+                f"保存先ディレクトリ: \"{remote_save_dir}\"\n\n"
+                "実行結果に対するフィードバックを提供してください。"
+            ),
         },
     ]
+
+
+def generate_review(
+    data_info: str,
+    user_request: str,
+    data_thread: DataThread,
+    has_results: bool = False,
+    remote_save_dir: str = "outputs/process_id/id",
+    model: str = "gpt-4o-mini-2024-07-18",
+    template_file: str = "src/prompts/generate_review.jinja",
+) -> LLMResponse:
+    messages = build_messages(
+        data_info,
+        user_request,
+        data_thread,
+        has_results,
+        remote_save_dir,
+        template_file,
+        PromptBudget.for_model(model),
+        model,
+    )
     return openai.generate_response(
         messages,
         model=model,
         response_format=Review,
+        stage="review",
+    )
+
+
+def review_batch_request(
+    custom_id: str,
+    data_info: str,
+    user_request: str,
+    data_thread: DataThread,
+    has_results: bool = False,
+    remote_save_dir: str = "outputs/process_id/id",
+    model: str = "gpt-4o-mini-2024-07-18",
+    template_file: str = "src/prompts/generate_review.jinja",
+) -> BatchRequest:
+    messages = build_messages(
+        data_info,
+        user_request,
+        data_thread,
+        has_results,
+        remote_save_dir,
+        template_file,
+        PromptBudget.for_model(model),
+        model,
+    )
+    return BatchRequest(
+        custom_id=custom_id,
+        messages=messages,
+        model=model,
+        response_format=Review,
+        stage="review",
+    )
+
+
+async def agenerate_review(
+    data_info: str,
+    user_request: str,
+    data_thread: DataThread,
+    has_results: bool = False,
+    remote_save_dir: str = "outputs/process_id/id",
+    model: str = "gpt-4o-mini-2024-07-18",
+    template_file: str = "src/prompts/generate_review.jinja",
+) -> LLMResponse:
+    messages = build_messages(
+        data_info,
+        user_request,
+        data_thread,
+        has_results,
+        remote_save_dir,
+        template_file,
+        PromptBudget.for_model(model),
+        model,
+    )
+    return await openai.agenerate_response(
+        messages,
+        model=model,
+        response_format=Review,
+        stage="review",
     )
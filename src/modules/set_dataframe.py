@@ -1,20 +1,141 @@
 import io
+import json
+import os
+
+from pathlib import Path
+from typing import TYPE_CHECKING, BinaryIO, Literal
 
-from e2b_code_interpreter import Sandbox
 from e2b_code_interpreter.models import Execution
+from loguru import logger
+
+from src.models import DatasetProfile
+from src.utils.dataframe_io import (
+    HAS_PYARROW,
+    columnar_key,
+    detect_format,
+    encode_columnar,
+)
+from src.utils.profile_cache import DataSource, hash_source
+
+if TYPE_CHECKING:
+    # src.sandbox は src.modules に依存するため型注釈のみで参照する
+    from src.sandbox import CodeSandbox
+
+
+# サンドボックス内での読み込み方法（CSVは pyarrow エンジンを優先）
+READERS = {
+    "csv": (
+        "try:\n"
+        "    df = pd.read_csv({path!r}, engine='pyarrow', usecols={columns!r})\n"
+        "except ImportError:\n"
+        "    df = pd.read_csv({path!r}, usecols={columns!r})"
+    ),
+    "parquet": "df = pd.read_parquet({path!r}, columns={columns!r})",
+    "feather": "df = pd.read_feather({path!r}, columns={columns!r})",
+}
+EXTENSIONS = {"csv": "csv", "parquet": "parquet", "feather": "feather"}
+# raw はファイルをそのまま送る。parquet / feather はローカルで1度だけ変換して送る
+UploadFormat = Literal["raw", "parquet", "feather"]
+LOAD_PROFILE = (
+    "import json\n"
+    "with open({path!r}, encoding='utf-8') as _f:\n"
+    "    profile = json.load(_f)\n"
+    "profile['correlations'] = pd.DataFrame(profile['correlations'])"
+)
+
+
+def sandbox_profile(profile: DatasetProfile) -> dict:
+    """サンドボックスに渡す集計結果（列名で引ける dict）"""
+    return {
+        "n_rows": profile.n_rows,
+        "dtypes": profile.dtypes,
+        "columns": {
+            column.name: column.model_dump(exclude={"name"})
+            for column in profile.column_profiles
+        },
+        "correlations": profile.correlations,
+    }
+
+
+def _upload(
+    sandbox: "CodeSandbox",
+    path: str,
+    data: bytes,
+    reuse: bool,
+) -> None:
+    # 内容ハッシュ入りのパスなら、再利用中のサンドボックスには送り直さない
+    if reuse and sandbox.files.exists(path):
+        logger.debug(f"Reusing uploaded data: {path}")
+        return
+    sandbox.files.write(path, data)
+
+
+def _read_bytes(source: DataSource) -> bytes:
+    if isinstance(source, io.BytesIO):
+        return source.getvalue()
+    return Path(source).read_bytes()
 
 
 def set_dataframe(
-    sandbox: Sandbox,
-    file_object: io.BytesIO,
+    sandbox: "CodeSandbox",
+    file_object: DataSource | BinaryIO,
     timeout: int = 1200,
-    remote_data_path: str = "home/data.csv",
+    remote_data_path: str | None = None,
+    columns: list[str] | None = None,
+    profile: DatasetProfile | None = None,
+    remote_profile_path: str = "home/profile.json",
+    upload_format: UploadFormat | None = None,
 ) -> Execution:
-    sandbox.files.write(
-        remote_data_path,
-        file_object,
-    )
-    return sandbox.run_code(
-        f"import pandas as pd; df = pd.read_csv('{remote_data_path}')",
-        timeout=timeout,
-    )
+    """データを `df` として読み込む
+
+    upload_format（既定は SANDBOX_UPLOAD_FORMAT、未設定なら feather）が
+    parquet / feather の場合、CSVをローカルで zstd 圧縮の列指向形式に
+    変換して送る。サンドボックス側で読めなければ元のファイルを送り直す。
+    """
+    if isinstance(file_object, (io.BytesIO, str, Path)):
+        source = file_object
+    else:
+        source = io.BytesIO(file_object.read())
+    upload_format = upload_format or os.getenv("SANDBOX_UPLOAD_FORMAT", "feather")
+    fmt = detect_format(source)
+    execution = None
+    if upload_format != "raw" and fmt == "csv" and HAS_PYARROW:
+        key = columnar_key(source, upload_format, columns)
+        path = remote_data_path or f"home/data-{key[:16]}.{upload_format}"
+        data = encode_columnar(source, upload_format, columns)
+        _upload(sandbox, path, data, reuse=remote_data_path is None)
+        execution = sandbox.run_code(
+            "import pandas as pd\n"
+            + READERS[upload_format].format(path=path, columns=None),
+            timeout=timeout,
+        )
+        if execution.error is not None:
+            logger.warning(
+                f"Failed to load {upload_format} in sandbox, "
+                f"falling back to raw upload: {execution.error.name}"
+            )
+            execution = None
+    if execution is None:
+        path = (
+            remote_data_path
+            or f"home/data-{hash_source(source)[:16]}.{EXTENSIONS[fmt]}"
+        )
+        data = _read_bytes(source)
+        _upload(sandbox, path, data, reuse=remote_data_path is None)
+        execution = sandbox.run_code(
+            "import pandas as pd\n"
+            + READERS[fmt].format(path=path, columns=columns),
+            timeout=timeout,
+        )
+    # 集計済みの列プロファイルを `profile` として使えるようにする
+    if profile is not None:
+        sandbox.files.write(
+            remote_profile_path,
+            json.dumps(sandbox_profile(profile), ensure_ascii=False),
+        )
+        sandbox.run_code(
+            "import pandas as pd\n"
+            + LOAD_PROFILE.format(path=remote_profile_path),
+            timeout=timeout,
+        )
+    return execution
@@ -0,0 +1,29 @@
+from .artifacts import ArtifactSync
+from .backend import CodeSandbox, get_sandbox_backend, register_sandbox_backend
+from .local import LocalSandbox
+from .pool import SandboxPool
+from .setup import (
+    COMMON_LIBRARIES,
+    TEMPLATE_NAME,
+    create_sandbox,
+    install_libraries,
+    load_requirements,
+    missing_libraries,
+    prepare_sandbox,
+)
+
+__all__ = [
+    "ArtifactSync",
+    "COMMON_LIBRARIES",
+    "TEMPLATE_NAME",
+    "CodeSandbox",
+    "LocalSandbox",
+    "SandboxPool",
+    "create_sandbox",
+    "get_sandbox_backend",
+    "install_libraries",
+    "load_requirements",
+    "missing_libraries",
+    "prepare_sandbox",
+    "register_sandbox_backend",
+]
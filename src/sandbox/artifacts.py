@@ -0,0 +1,128 @@
+import gzip
+import io
+import tarfile
+import uuid
+
+from pathlib import Path, PurePosixPath
+
+from loguru import logger
+
+from src.sandbox.backend import CodeSandbox, stdout_json
+
+try:
+    import pyarrow as pa
+except ImportError:  # 未インストール時は gzip で受け取る
+    pa = None
+
+
+# 画像は実行結果（Result.png）から保存するため取得しない
+IMAGE_SUFFIXES = (".png", ".jpg", ".jpeg", ".gif", ".bmp")
+
+# 前回から size / mtime が変わったファイルだけを tar にまとめ、
+# zstd（pyarrow がなければ gzip）で圧縮して1ファイルに書き出す
+SYNC_CODE = """
+def _sync_artifacts(remote_dir, manifest, skip, archive, codec):
+    import io, json, os, tarfile
+    if os.path.exists(archive):
+        os.remove(archive)
+    current, changed = {{}}, []
+    for root, _, names in os.walk(remote_dir):
+        for name in sorted(names):
+            if name.lower().endswith(tuple(skip)):
+                continue
+            path = os.path.join(root, name)
+            rel = os.path.relpath(path, remote_dir)
+            stat = os.stat(path)
+            current[rel] = [stat.st_size, stat.st_mtime_ns]
+            if manifest.get(rel) != current[rel]:
+                changed.append(rel)
+    size = 0
+    if changed:
+        buf = io.BytesIO()
+        with tarfile.open(fileobj=buf, mode="w") as tar:
+            for rel in changed:
+                tar.add(os.path.join(remote_dir, rel), arcname=rel)
+        data = buf.getvalue()
+        size = len(data)
+        try:
+            if codec != "zstd":
+                raise ImportError
+            import pyarrow as pa
+            data = pa.compress(data, codec="zstd", asbytes=True)
+        except ImportError:
+            import gzip
+            codec = "gzip"
+            data = gzip.compress(data, compresslevel=6)
+        with open(archive, "wb") as f:
+            f.write(data)
+    print(json.dumps({{
+        "files": current, "changed": changed, "codec": codec, "size": size,
+    }}))
+_sync_artifacts({remote_dir!r}, {manifest!r}, {skip!r}, {archive!r}, {codec!r})
+del _sync_artifacts
+"""
+
+
+class ArtifactSync:
+    """サンドボックスの出力ディレクトリをローカルへ差分同期する
+
+    変更のあったファイルをサンドボックス内で1つのアーカイブにまとめ、
+    1回の転送で取得して展開する。manifest に前回の size / mtime を保持する。
+    """
+
+    def __init__(
+        self,
+        sandbox: CodeSandbox,
+        remote_dir: str,
+        local_dir: Path,
+        skip_suffixes: tuple[str, ...] = IMAGE_SUFFIXES,
+    ) -> None:
+        self.sandbox = sandbox
+        self.remote_dir = remote_dir
+        self.local_dir = local_dir
+        self.skip_suffixes = skip_suffixes
+        self.manifest: dict[str, list[int]] = {}
+        self.archive = f"/tmp/artifacts-{uuid.uuid4().hex[:12]}.tar"
+
+    def sync(self) -> dict[str, str]:
+        """同期して {サンドボックス内のパス: ローカルのパス} を返す（未変更分も含む）"""
+        execution = self.sandbox.run_code(
+            SYNC_CODE.format(
+                remote_dir=self.remote_dir,
+                manifest=self.manifest,
+                skip=list(self.skip_suffixes),
+                archive=self.archive,
+                codec="zstd" if pa is not None else "gzip",
+            )
+        )
+        if execution.error is not None:
+            raise RuntimeError(f"{execution.error.name}: {execution.error.value}")
+        status = stdout_json(execution)
+        if status["changed"]:
+            try:
+                data = bytes(self.sandbox.files.read(self.archive, format="bytes"))
+            finally:
+                # サンドボックス（ローカルではホストの /tmp）に残さない
+                self.sandbox.files.remove(self.archive)
+            self._extract(data, status["codec"], status["size"])
+            logger.info(
+                f"Synced {len(status['changed'])} artifacts "
+                f"({len(data) / 1e3:.1f}KB): {status['changed']}"
+            )
+        self.manifest = status["files"]
+        return {
+            str(PurePosixPath(self.remote_dir) / rel): str(self.local_dir / rel)
+            for rel in self.manifest
+        }
+
+    def _extract(self, data: bytes, codec: str, size: int) -> None:
+        if codec == "zstd":
+            data = pa.decompress(
+                data, decompressed_size=size, codec="zstd", asbytes=True
+            )
+        else:
+            data = gzip.decompress(data)
+        self.local_dir.mkdir(parents=True, exist_ok=True)
+        with tarfile.open(fileobj=io.BytesIO(data)) as tar:
+            # アーカイブ外へのパス（../ など）は展開しない
+            tar.extractall(self.local_dir, filter="data")
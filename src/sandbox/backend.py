@@ -0,0 +1,73 @@
+import json
+import os
+
+from collections.abc import Callable
+from typing import Protocol
+
+from e2b_code_interpreter import Sandbox
+from e2b_code_interpreter.models import Execution, OutputMessage
+
+
+class CodeSandbox(Protocol):
+    """execute_code / set_dataframe が使うサンドボックスの操作
+
+    e2b_code_interpreter.Sandbox と同じ呼び出し方・戻り値（Execution）に揃える。
+    on_stdout / on_stderr は実行中に出力を逐次受け取り、例外を送出すると実行を打ち切る。
+    """
+
+    sandbox_id: str
+    files: object
+
+    def run_code(
+        self,
+        code: str,
+        timeout: float | None = None,
+        on_stdout: Callable[[OutputMessage], object] | None = None,
+        on_stderr: Callable[[OutputMessage], object] | None = None,
+    ) -> Execution: ...
+
+    def is_running(self) -> bool: ...
+
+    def set_timeout(self, timeout: int) -> None: ...
+
+    def kill(self) -> bool: ...
+
+    def __enter__(self) -> "CodeSandbox": ...
+
+    def __exit__(self, *exc_info: object) -> None: ...
+
+
+def stdout_json(execution: Execution) -> object:
+    """stdout の最後の行を JSON として読む
+
+    logs.stdout は行ではなく受信したチャンクの列なので、結合してから行に分ける。
+    """
+    lines = "".join(execution.logs.stdout).strip().splitlines()
+    if not lines:
+        raise ValueError("no output")
+    return json.loads(lines[-1])
+
+
+# (テンプレート名, 寿命秒数) -> サンドボックス
+SandboxFactory = Callable[[str | None, int | None], CodeSandbox]
+
+_backends: dict[str, SandboxFactory] = {}
+
+
+def register_sandbox_backend(name: str, factory: SandboxFactory) -> None:
+    _backends[name] = factory
+
+
+def get_sandbox_backend(name: str | None = None) -> SandboxFactory:
+    """名前（未指定時は環境変数 SANDBOX_BACKEND、既定は e2b）で作成関数を選ぶ"""
+    name = name or os.getenv("SANDBOX_BACKEND", "e2b")
+    if name not in _backends:
+        raise ValueError(f"Unknown sandbox backend: {name}")
+    return _backends[name]
+
+
+def _create_e2b(template: str | None, timeout: int | None) -> CodeSandbox:
+    return Sandbox.create(template=template, timeout=timeout)
+
+
+register_sandbox_backend("e2b", _create_e2b)
@@ -0,0 +1,268 @@
+import os
+import shutil
+import signal
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import uuid
+
+from collections.abc import Callable
+from datetime import datetime
+from multiprocessing.connection import Connection
+from pathlib import Path
+from typing import IO, Literal
+
+from e2b.exceptions import TimeoutException
+from e2b.sandbox.filesystem.filesystem import EntryInfo, FileType, WriteInfo
+from e2b_code_interpreter.models import (
+    Execution,
+    ExecutionError,
+    Logs,
+    OutputMessage,
+    Result,
+)
+from loguru import logger
+
+from src.sandbox.backend import register_sandbox_backend
+
+
+WORKER = Path(__file__).with_name("local_worker.py")
+# タイムアウト時に中断（KeyboardInterrupt）を送ってから強制終了までの猶予
+INTERRUPT_GRACE = 5.0
+
+
+class LocalFiles:
+    """sandbox.files 互換のファイル操作（相対パスは作業ディレクトリ基準）"""
+
+    def __init__(self, root: Path) -> None:
+        self.root = root
+
+    def _path(self, path: str) -> Path:
+        return self.root / path
+
+    def write(self, path: str, data: str | bytes | IO) -> WriteInfo:
+        target = self._path(path)
+        target.parent.mkdir(parents=True, exist_ok=True)
+        if hasattr(data, "read"):
+            data = data.read()
+        if isinstance(data, str):
+            target.write_text(data, "utf-8")
+        else:
+            target.write_bytes(data)
+        return WriteInfo(name=target.name, type=FileType.FILE, path=str(target))
+
+    def read(
+        self,
+        path: str,
+        format: Literal["text", "bytes"] = "text",  # noqa: A002
+    ) -> str | bytearray:
+        target = self._path(path)
+        if format == "bytes":
+            return bytearray(target.read_bytes())
+        return target.read_text("utf-8")
+
+    def exists(self, path: str) -> bool:
+        return self._path(path).exists()
+
+    def list(self, path: str) -> list[EntryInfo]:
+        entries = []
+        for child in sorted(self._path(path).iterdir()):
+            stat = child.stat()
+            entries.append(
+                EntryInfo(
+                    name=child.name,
+                    type=FileType.DIR if child.is_dir() else FileType.FILE,
+                    path=str(child),
+                    size=stat.st_size,
+                    mode=stat.st_mode,
+                    permissions=oct(stat.st_mode & 0o777),
+                    owner=str(stat.st_uid),
+                    group=str(stat.st_gid),
+                    modified_time=datetime.fromtimestamp(stat.st_mtime),
+                )
+            )
+        return entries
+
+    def make_dir(self, path: str) -> bool:
+        target = self._path(path)
+        if target.exists():
+            return False
+        target.mkdir(parents=True)
+        return True
+
+    def remove(self, path: str) -> None:
+        target = self._path(path)
+        if target.is_dir():
+            shutil.rmtree(target)
+        else:
+            target.unlink(missing_ok=True)
+
+
+class LocalSandbox:
+    """ローカルの子プロセスでコードを実行するサンドボックス
+
+    タスクごとに独立したPythonプロセスと作業ディレクトリを持ち、
+    メモリ・CPU時間の上限を設定できる。実行結果は e2b と同じ Execution
+    （PNGは base64 の Result.png）で返す。信頼できるコード向けで、
+    ホストのファイルシステムやネットワークからは隔離されない。
+    """
+
+    def __init__(
+        self,
+        memory_mb: int = 0,
+        cpu_seconds: int = 0,
+        root_dir: str | None = None,
+    ) -> None:
+        self.sandbox_id = f"local-{uuid.uuid4().hex[:12]}"
+        self.root = Path(
+            tempfile.mkdtemp(prefix=f"{self.sandbox_id}-", dir=root_dir)
+        )
+        self.files = LocalFiles(self.root)
+        parent, child = socket.socketpair()
+        self._process = subprocess.Popen(
+            [
+                sys.executable,
+                str(WORKER),
+                str(child.fileno()),
+                str(memory_mb),
+                str(cpu_seconds),
+            ],
+            cwd=self.root,
+            pass_fds=(child.fileno(),),
+            stdin=subprocess.DEVNULL,
+            env={**os.environ, "MPLBACKEND": "Agg"},
+        )
+        child.close()
+        self._conn = Connection(parent.detach())
+        self._lock = threading.Lock()
+
+    @classmethod
+    def create(
+        cls,
+        template: str | None = None,  # noqa: ARG003  e2b との互換のため
+        timeout: int | None = None,  # noqa: ARG003
+    ) -> "LocalSandbox":
+        return cls(
+            memory_mb=int(os.getenv("LOCAL_SANDBOX_MEMORY_MB", "4096")),
+            cpu_seconds=int(os.getenv("LOCAL_SANDBOX_CPU_SECONDS", "0")),
+            root_dir=os.getenv("LOCAL_SANDBOX_DIR") or None,
+        )
+
+    def run_code(
+        self,
+        code: str,
+        timeout: float | None = None,
+        on_stdout: Callable[[OutputMessage], object] | None = None,
+        on_stderr: Callable[[OutputMessage], object] | None = None,
+        **kwargs: object,  # noqa: ARG002  e2b の on_result などは未対応
+    ) -> Execution:
+        """コードを実行する（出力は実行中に on_stdout / on_stderr へ渡す）
+
+        コールバックが例外を送出した場合は実行を中断し、その例外を送出する。
+        中断してもカーネルの状態は保たれる。
+        """
+        # e2b と同じく timeout=0 は無制限
+        deadline = time.monotonic() + timeout if timeout else None
+        handlers = {"stdout": on_stdout, "stderr": on_stderr}
+        logs = Logs()
+        with self._lock:
+            try:
+                self._conn.send(code)
+                while True:
+                    remaining = (
+                        None if deadline is None else deadline - time.monotonic()
+                    )
+                    if remaining is not None and remaining <= 0:
+                        break
+                    if not self._conn.poll(remaining):
+                        break
+                    message = self._conn.recv()
+                    if message["type"] == "execution":
+                        return _to_execution(message, logs)
+                    getattr(logs, message["type"]).append(message["text"])
+                    handler = handlers[message["type"]]
+                    if handler is None:
+                        continue
+                    try:
+                        handler(
+                            OutputMessage(
+                                message["text"],
+                                message["timestamp"],
+                                message["type"] == "stderr",
+                            )
+                        )
+                    except Exception:
+                        self._interrupt()
+                        raise
+            except (EOFError, OSError):
+                return self._dead_kernel()
+            # 時間切れ: 中断を送り、応答がなければプロセスごと終了する
+            self._interrupt()
+        raise TimeoutException(f"Execution timed out after {timeout} seconds")
+
+    def _interrupt(self) -> None:
+        """実行中のセルに中断を送り、残りの出力と結果を読み捨てる"""
+        self._process.send_signal(signal.SIGINT)
+        deadline = time.monotonic() + INTERRUPT_GRACE
+        try:
+            while self._conn.poll(max(deadline - time.monotonic(), 0)):
+                if self._conn.recv()["type"] == "execution":
+                    return
+            self._process.kill()
+        except (EOFError, OSError):
+            pass
+
+    def _dead_kernel(self) -> Execution:
+        returncode = self._process.wait()
+        logger.warning(f"Local sandbox {self.sandbox_id} exited: {returncode}")
+        return Execution(
+            error=ExecutionError(
+                name="DeadKernelError",
+                value=f"kernel exited with code {returncode}",
+                traceback=(
+                    "カーネルが終了しました"
+                    "（メモリまたはCPU時間の上限を超えた可能性があります）"
+                ),
+            )
+        )
+
+    def is_running(self) -> bool:
+        return self._process.poll() is None
+
+    def set_timeout(self, timeout: int) -> None:
+        """e2b との互換用（ローカルでは寿命の上限はない）"""
+
+    def kill(self) -> bool:
+        was_running = self.is_running()
+        if was_running:
+            try:
+                self._conn.send(None)
+                self._process.wait(timeout=INTERRUPT_GRACE)
+            except (OSError, subprocess.TimeoutExpired):
+                self._process.kill()
+                self._process.wait()
+        self._conn.close()
+        shutil.rmtree(self.root, ignore_errors=True)
+        return was_running
+
+    def __enter__(self) -> "LocalSandbox":
+        return self
+
+    def __exit__(self, *exc_info: object) -> None:
+        self.kill()
+
+
+def _to_execution(payload: dict, logs: Logs) -> Execution:
+    error = payload["error"]
+    return Execution(
+        results=[Result(**result) for result in payload["results"]],
+        logs=logs,
+        error=ExecutionError(**error) if error else None,
+        execution_count=payload["execution_count"],
+    )
+
+
+register_sandbox_backend("local", LocalSandbox.create)
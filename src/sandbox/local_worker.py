@@ -0,0 +1,280 @@
+"""LocalSandbox の子プロセスで動くカーネル（標準ライブラリのみで動作する）
+
+python local_worker.py <fd> <memory_mb> <cpu_seconds>
+"""
+
+import ast
+import base64
+import contextlib
+import io
+import re
+import shlex
+import signal
+import subprocess
+import sys
+import time
+import tokenize
+import traceback
+
+from collections.abc import Iterator
+from multiprocessing.connection import Connection
+
+try:
+    import resource
+except ImportError:  # Windows ではリソース制限なし
+    resource = None
+
+# 出力をまとめて送る間隔と量（細かい print ごとに送らない）
+FLUSH_INTERVAL = 0.1
+FLUSH_BYTES = 8192
+
+# Jupyter のマジックコマンド（`!pip ...` / `%matplotlib ...` / `x = !ls`）
+MAGIC_LINE = re.compile(r"^(\s*)([!%])(.*)$")
+MAGIC_ASSIGN = re.compile(r"^(\s*[\w\s,]+=\s*)([!%])(.*)$")
+# 何もしなくてよいラインマジック（図は実行後にまとめて PNG にする）
+NOOP_MAGICS = {"matplotlib"}
+
+
+def apply_limits(memory_mb: int, cpu_seconds: int) -> None:
+    if resource is None:
+        return
+    if memory_mb > 0:
+        limit = memory_mb * 1024 * 1024
+        resource.setrlimit(resource.RLIMIT_AS, (limit, limit))
+    if cpu_seconds > 0:
+        resource.setrlimit(resource.RLIMIT_CPU, (cpu_seconds, cpu_seconds))
+
+
+@contextlib.contextmanager
+def deferred_interrupt() -> Iterator[None]:
+    """送信中の中断でメッセージが途中で切れないよう、SIGINT を送信後まで保留する"""
+    if not hasattr(signal, "pthread_sigmask"):
+        yield
+        return
+    signal.pthread_sigmask(signal.SIG_BLOCK, {signal.SIGINT})
+    try:
+        yield
+    finally:
+        signal.pthread_sigmask(signal.SIG_UNBLOCK, {signal.SIGINT})
+
+
+class StreamWriter(io.TextIOBase):
+    """stdout / stderr への書き込みを実行中に親プロセスへ逐次送る"""
+
+    def __init__(self, conn: Connection, name: str) -> None:
+        self.conn = conn
+        self.name = name
+        self._chunks: list[str] = []
+        self._size = 0
+        self._sent_at = time.monotonic()
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, text: str) -> int:
+        self._chunks.append(text)
+        self._size += len(text)
+        if (
+            self._size >= FLUSH_BYTES
+            or time.monotonic() - self._sent_at >= FLUSH_INTERVAL
+        ):
+            self._send(complete_lines=True)
+        return len(text)
+
+    def flush(self) -> None:
+        self._send(complete_lines=False)
+
+    def _send(self, complete_lines: bool) -> None:
+        """バッファを送る（complete_lines なら改行までの完結した行だけ）
+
+        print は本文と改行を別々に write するため、途中で送ると1行が分かれて届く。
+        改行を含まないまま FLUSH_BYTES を超えた長い行だけは途中でも送る。
+        """
+        text = "".join(self._chunks)
+        end = text.rfind("\n") + 1 if complete_lines else len(text)
+        if end == 0 and len(text) >= FLUSH_BYTES:
+            end = len(text)
+        text, rest = text[:end], text[end:]
+        self._chunks, self._size = ([rest], len(rest)) if rest else ([], 0)
+        if not text:
+            return
+        self._sent_at = time.monotonic()
+        with deferred_interrupt():
+            self.conn.send(
+                {"type": self.name, "text": text, "timestamp": time.time_ns()}
+            )
+
+
+class Shell:
+    """IPython の get_ipython() のうち、マジックの変換先として使う部分だけの代替"""
+
+    def system(self, cmd: str) -> int:
+        """`!cmd`: シェルで実行し、出力をセルの標準出力へ流す"""
+        with subprocess.Popen(
+            cmd,
+            shell=True,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.STDOUT,
+            stdin=subprocess.DEVNULL,
+            text=True,
+        ) as process:
+            try:
+                for line in process.stdout:
+                    sys.stdout.write(line)
+                return process.wait()
+            except BaseException:
+                process.kill()
+                raise
+
+    def getoutput(self, cmd: str) -> list[str]:
+        """`x = !cmd`: 出力を行のリストで返す"""
+        completed = subprocess.run(
+            cmd,
+            shell=True,
+            capture_output=True,
+            stdin=subprocess.DEVNULL,
+            text=True,
+        )
+        return (completed.stdout + completed.stderr).splitlines()
+
+    def run_line_magic(self, name: str, line: str) -> object:
+        if name == "pip":
+            return self.system(f"{shlex.quote(sys.executable)} -m pip {line}")
+        if name in NOOP_MAGICS:
+            return None
+        raise NameError(
+            f"Line magic function `%{name}` はローカルサンドボックスでは使えません"
+        )
+
+
+def _at_statement_start(lines: list[str]) -> bool:
+    """lines の直後が新しい文の先頭か（括弧・文字列・行継続の途中でないか）"""
+    try:
+        for _ in tokenize.generate_tokens(io.StringIO("\n".join(lines)).readline):
+            pass
+    except (tokenize.TokenError, SyntaxError):
+        return False
+    return True
+
+
+def _magic_call(prefix: str, body: str, assigned: bool) -> str:
+    if prefix == "!":
+        method = "getoutput" if assigned else "system"
+        return f"get_ipython().{method}({body.strip()!r})"
+    name, _, line = body.strip().partition(" ")
+    return f"get_ipython().run_line_magic({name!r}, {line.strip()!r})"
+
+
+def transform_magics(code: str) -> str:
+    """文の先頭にあるマジックコマンドを get_ipython() の呼び出しに書き換える
+
+    IPython と同じ変換で、行番号は保つ。式の途中の継続行（`!= b` や `% n`）は残す。
+    """
+    lines: list[str] = []
+    for line in code.splitlines():
+        if (match := MAGIC_ASSIGN.match(line) or MAGIC_LINE.match(line)) and (
+            _at_statement_start(lines)
+        ):
+            head, prefix, body = match.groups()
+            assigned = match.re is MAGIC_ASSIGN
+            line = head + _magic_call(prefix, body, assigned)
+        lines.append(line)
+    return "\n".join(lines)
+
+
+def parse(code: str, filename: str) -> ast.Module:
+    """通常の Python として解析できなければ、マジックを書き換えて再試行する"""
+    try:
+        return ast.parse(code, filename)
+    except SyntaxError:
+        transformed = transform_magics(code)
+        if transformed == code:
+            raise
+        return ast.parse(transformed, filename)
+
+
+def figures() -> list[dict]:
+    """開いている図を PNG（base64）にして閉じる（Jupyter の表示と同じ扱い）"""
+    pyplot = sys.modules.get("matplotlib.pyplot")
+    if pyplot is None:
+        return []
+    results = []
+    for num in pyplot.get_fignums():
+        figure = pyplot.figure(num)
+        buf = io.BytesIO()
+        figure.savefig(buf, format="png", bbox_inches="tight")
+        results.append(
+            {
+                "png": base64.b64encode(buf.getvalue()).decode(),
+                "text": repr(figure),
+            }
+        )
+    pyplot.close("all")
+    return results
+
+
+def run(conn: Connection, code: str, namespace: dict, count: int) -> dict:
+    stdout, stderr = StreamWriter(conn, "stdout"), StreamWriter(conn, "stderr")
+    results: list[dict] = []
+    error = None
+    filename = f"<cell-{count}>"
+    try:
+        with contextlib.redirect_stdout(stdout), contextlib.redirect_stderr(stderr):
+            tree = parse(code, filename)
+            # 最後の式の値は Jupyter と同様に結果として返す
+            last = None
+            if tree.body and isinstance(tree.body[-1], ast.Expr):
+                last = ast.Expression(tree.body.pop().value)
+            exec(compile(tree, filename, "exec"), namespace)
+            if last is not None:
+                value = eval(compile(last, filename, "eval"), namespace)
+                if value is not None:
+                    results.append({"text": repr(value), "is_main_result": True})
+    except BaseException as e:  # noqa: BLE001  KeyboardInterrupt（中断）も結果として返す
+        tb = e.__traceback__.tb_next if e.__traceback__ else None
+        error = {
+            "name": type(e).__name__,
+            "value": str(e),
+            "traceback": "".join(traceback.format_exception(type(e), e, tb)),
+        }
+    try:
+        stdout.flush()
+        stderr.flush()
+        results = figures() + results
+    except KeyboardInterrupt:
+        # 中断が出力の送信後に届いた場合（結果はそのまま返す）
+        pass
+    return {
+        "type": "execution",
+        "results": results,
+        "error": error,
+        "execution_count": count,
+    }
+
+
+def main() -> None:
+    fd, memory_mb, cpu_seconds = (int(arg) for arg in sys.argv[1:4])
+    apply_limits(memory_mb, cpu_seconds)
+    conn = Connection(fd)
+    shell = Shell()
+    namespace: dict = {"__name__": "__main__", "get_ipython": lambda: shell}
+    count = 0
+    while True:
+        try:
+            code = conn.recv()
+            if code is None:
+                break
+            count += 1
+            result = run(conn, code, namespace, count)
+            with deferred_interrupt():
+                conn.send(result)
+        except KeyboardInterrupt:
+            # 実行の終了後に届いた中断は無視する
+            continue
+        except (EOFError, OSError):
+            # 親プロセスが接続を閉じた
+            break
+
+
+if __name__ == "__main__":
+    main()
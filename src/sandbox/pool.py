@@ -0,0 +1,242 @@
+import os
+import threading
+import time
+
+from collections.abc import Callable, Iterator
+from contextlib import contextmanager
+
+from loguru import logger
+
+from src.sandbox.backend import CodeSandbox
+from src.sandbox.setup import create_sandbox, prepare_sandbox
+from src.utils import ledger
+
+
+# 準備完了時点の変数を記録し、返却時にそれ以外を消して df を元に戻す
+# （"_" で始まる名前は IPython の履歴なので対象外）
+SNAPSHOT_CODE = """
+import shutil
+import matplotlib.pyplot as plt
+
+def _pool_reset():
+    g = globals()
+    for name in [n for n in g if n not in _pool_baseline and n[:1] != "_"]:
+        del g[name]
+    g.update(_pool_baseline)
+    g["df"] = _pool_df.copy()
+    plt.close("all")
+    shutil.rmtree("outputs", ignore_errors=True)
+
+_pool_df = df.copy()
+_pool_baseline = {k: v for k, v in globals().items() if k[:1] != "_"}
+"""
+RESET_CODE = "_pool_reset()"
+
+
+class PooledSandbox:
+    def __init__(self, sandbox: CodeSandbox) -> None:
+        self.sandbox = sandbox
+        self.created_at = time.time()
+        self.idle_since = time.time()
+        self.n_leases = 0
+        # 打ち切ったセルが実行中のまま残っているなど、再利用できない
+        self.is_broken = False
+
+
+class SandboxPool:
+    """ライブラリ導入・データ読み込み済みのサンドボックスを貸し出すプール
+
+    size 個を事前に起動しておき、lease() で1つを貸し出す。
+    返却時に変数と出力ディレクトリを初期化して再利用し、
+    アイドル時間や利用回数が上限を超えたものは破棄して補充する。
+    """
+
+    def __init__(
+        self,
+        data_file: str,
+        size: int = 4,
+        idle_timeout: float = 600.0,
+        max_leases: int = 20,
+        sandbox_timeout: int = 3600,
+        factory: Callable[..., CodeSandbox] = create_sandbox,
+    ) -> None:
+        self.data_file = data_file
+        self.size = size
+        self.idle_timeout = idle_timeout
+        self.max_leases = max_leases
+        self.sandbox_timeout = sandbox_timeout
+        self.factory = factory
+        self._idle: list[PooledSandbox] = []
+        self._n_starting = 0
+        self._leased: dict[int, PooledSandbox] = {}
+        self._cond = threading.Condition()
+        self._closed = False
+        self._reaper: threading.Thread | None = None
+
+    @classmethod
+    def from_env(cls, data_file: str) -> "SandboxPool":
+        return cls(
+            data_file,
+            size=int(os.getenv("SANDBOX_POOL_SIZE", "4")),
+            idle_timeout=float(os.getenv("SANDBOX_IDLE_TIMEOUT", "600")),
+        )
+
+    def start(self) -> "SandboxPool":
+        """バックグラウンドで size 個を起動する（完了は待たない）"""
+        if self._reaper is not None:
+            return self
+        self._fill()
+        self._reaper = threading.Thread(target=self._reap_loop, daemon=True)
+        self._reaper.start()
+        return self
+
+    def _fill(self) -> None:
+        with self._cond:
+            n_missing = self.size - len(self._idle) - self._n_starting
+            self._n_starting += max(n_missing, 0)
+        for _ in range(n_missing):
+            threading.Thread(target=self._warm_one, daemon=True).start()
+
+    def _create(self) -> PooledSandbox:
+        sandbox = self.factory(timeout=self.sandbox_timeout)
+        prepare_sandbox(sandbox, self.data_file)
+        sandbox.run_code(SNAPSHOT_CODE)
+        return PooledSandbox(sandbox)
+
+    def _warm_one(self) -> None:
+        try:
+            pooled = self._create()
+        except Exception as e:
+            logger.warning(f"Failed to warm sandbox: {e}")
+            pooled = None
+        with self._cond:
+            self._n_starting -= 1
+            if pooled is not None and not self._closed:
+                self._idle.append(pooled)
+            elif pooled is not None:
+                _kill(pooled)
+            self._cond.notify_all()
+
+    def _healthy(self, pooled: PooledSandbox) -> bool:
+        try:
+            execution = pooled.sandbox.run_code("df.shape", timeout=30)
+        except Exception as e:
+            logger.warning(f"Sandbox health check failed: {e}")
+            return False
+        return execution.error is None
+
+    def _acquire(self, timeout: float | None) -> PooledSandbox:
+        deadline = None if timeout is None else time.time() + timeout
+        while True:
+            with self._cond:
+                # 準備中のものがあれば待ち、なければその場で起動する
+                while not self._idle and self._n_starting > 0:
+                    remaining = None if deadline is None else deadline - time.time()
+                    if remaining is not None and remaining <= 0:
+                        break
+                    self._cond.wait(remaining)
+                pooled = self._idle.pop() if self._idle else None
+            if pooled is None:
+                logger.info("No warm sandbox available; starting one")
+                return self._create()
+            if self._healthy(pooled):
+                return pooled
+            _kill(pooled)
+            self._fill()
+
+    @contextmanager
+    def lease(self, timeout: float | None = None) -> Iterator[CodeSandbox]:
+        """温まったサンドボックスを借りる（ブロックを抜けると初期化して返却）"""
+        started_at = time.time()
+        pooled = self._acquire(timeout)
+        pooled.n_leases += 1
+        ledger.record("sandbox_lease", started_at)
+        with self._cond:
+            self._leased[id(pooled.sandbox)] = pooled
+        try:
+            yield pooled.sandbox
+        finally:
+            with self._cond:
+                self._leased.pop(id(pooled.sandbox), None)
+            self._release(pooled)
+
+    def mark_broken(self, sandbox: CodeSandbox) -> None:
+        """貸出中のサンドボックスを返却時に初期化せず破棄させる"""
+        with self._cond:
+            pooled = self._leased.get(id(sandbox))
+        if pooled is not None:
+            pooled.is_broken = True
+
+    def _release(self, pooled: PooledSandbox) -> None:
+        recycle = (
+            not self._closed
+            and not pooled.is_broken
+            and pooled.n_leases < self.max_leases
+        )
+        if recycle:
+            try:
+                execution = pooled.sandbox.run_code(RESET_CODE, timeout=60)
+                recycle = execution.error is None
+            except Exception as e:
+                logger.warning(f"Failed to reset sandbox: {e}")
+                recycle = False
+        if not recycle:
+            _kill(pooled)
+            if not self._closed:
+                self._fill()
+            return
+        pooled.idle_since = time.time()
+        with self._cond:
+            # 混雑時にその場で起動した分は size を超えて保持しない
+            if len(self._idle) < self.size:
+                self._idle.append(pooled)
+                self._cond.notify_all()
+                return
+        _kill(pooled)
+
+    def _reap_loop(self) -> None:
+        while not self._closed:
+            time.sleep(min(self.idle_timeout / 4, 30))
+            now = time.time()
+            with self._cond:
+                expired = [
+                    p for p in self._idle if now - p.idle_since > self.idle_timeout
+                ]
+                self._idle = [p for p in self._idle if p not in expired]
+            for pooled in expired:
+                logger.info(f"Evicting idle sandbox {pooled.sandbox.sandbox_id}")
+                _kill(pooled)
+
+    def close(self, wait: float = 60.0) -> None:
+        """アイドル中のものを破棄し、起動中のものは準備完了を待って破棄させる"""
+        with self._cond:
+            self._closed = True
+            idle, self._idle = self._idle, []
+        for pooled in idle:
+            _kill(pooled)
+        # 起動中のものは _warm_one が完了時に破棄する。起動スレッドはデーモンなので
+        # 待たずにプロセスが終了すると、サンドボックスが残って課金され続ける
+        deadline = time.time() + wait
+        with self._cond:
+            while self._n_starting > 0:
+                remaining = deadline - time.time()
+                if remaining <= 0:
+                    logger.warning(
+                        f"{self._n_starting} sandboxes are still starting; "
+                        "they may be left running"
+                    )
+                    break
+                self._cond.wait(remaining)
+
+    def __enter__(self) -> "SandboxPool":
+        return self.start()
+
+    def __exit__(self, *exc_info: object) -> None:
+        self.close()
+
+
+def _kill(pooled: PooledSandbox) -> None:
+    try:
+        pooled.sandbox.kill()
+    except Exception as e:
+        logger.warning(f"Failed to kill sandbox: {e}")
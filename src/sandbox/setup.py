@@ -0,0 +1,103 @@
+import os
+import time
+
+from pathlib import Path
+
+from loguru import logger
+
+from src.modules import profile_dataframe, set_dataframe
+from src.sandbox.backend import CodeSandbox, get_sandbox_backend, stdout_json
+from src.sandbox.local import LocalSandbox
+from src.utils import ledger
+
+
+REQUIREMENTS_FILE = Path(__file__).with_name("requirements.txt")
+TEMPLATE_NAME = "oshin-data-analysis"
+
+# インストール済みのバージョンを JSON で出力する（未インストールは null）
+CHECK_CODE = """
+import json
+from importlib import metadata
+_versions = {{}}
+for _name in {names!r}:
+    try:
+        _versions[_name] = metadata.version(_name)
+    except metadata.PackageNotFoundError:
+        _versions[_name] = None
+print(json.dumps(_versions))
+"""
+
+
+def load_requirements(path: Path = REQUIREMENTS_FILE) -> list[str]:
+    lines = path.read_text("utf-8").splitlines()
+    return [line.strip() for line in lines if line.strip() and line[0] != "#"]
+
+
+# 分析コードでよく使うライブラリ（バージョン固定）
+COMMON_LIBRARIES = load_requirements()
+
+
+def create_sandbox(timeout: int | None = None) -> CodeSandbox:
+    """SANDBOX_BACKEND のサンドボックスを起動する
+
+    SANDBOX_TEMPLATE（ビルド済みテンプレート）があればそこから起動する。
+    """
+    template = os.getenv("SANDBOX_TEMPLATE") or None
+    return get_sandbox_backend()(template, timeout)
+
+
+def missing_libraries(
+    sandbox: CodeSandbox,
+    libraries: list[str],
+    strict: bool = False,
+) -> list[str]:
+    """未インストールのもの（strict なら固定バージョンと異なるものも）を返す"""
+    pins = dict(lib.partition("==")[::2] for lib in libraries)
+    execution = sandbox.run_code(CHECK_CODE.format(names=list(pins)))
+    if execution.error is not None or not execution.logs.stdout:
+        return libraries
+    installed = stdout_json(execution)
+    missing = []
+    for lib, (name, version) in zip(libraries, pins.items(), strict=True):
+        if installed.get(name) is None:
+            missing.append(lib)
+        elif version and installed[name] != version:
+            logger.debug(f"{name}=={installed[name]} (固定: {version})")
+            if strict:
+                missing.append(lib)
+    return missing
+
+
+def install_libraries(
+    sandbox: CodeSandbox,
+    libraries: list[str] = COMMON_LIBRARIES,
+    strict: bool = False,
+) -> None:
+    # テンプレートやベースイメージに含まれていれば pip を呼ばない
+    libraries = missing_libraries(sandbox, libraries, strict)
+    if not libraries:
+        logger.debug("分析ライブラリはインストール済みです")
+        return
+    install_cmd = (
+        "import subprocess; "
+        "subprocess.run(['pip', 'install', '--quiet', "
+        + ", ".join([f"'{lib}'" for lib in libraries])
+        + "], check=False)"
+    )
+    sandbox.run_code(install_cmd)
+    logger.info(f"一般的なライブラリをインストールしました: {libraries}")
+
+
+def prepare_sandbox(sandbox: CodeSandbox, data_file: str) -> None:
+    """ライブラリを導入し、データを `df`（と集計済みの `profile`）として読み込む"""
+    started_at = time.time()
+    # ローカルはホストの環境をそのまま使う（requirements.txt は手動で導入）
+    if not isinstance(sandbox, LocalSandbox):
+        install_libraries(sandbox)
+    # パスを渡すと内容ハッシュがメモ化され、変換済みのデータも使い回される
+    set_dataframe(
+        sandbox=sandbox,
+        file_object=data_file,
+        profile=profile_dataframe(data_file),
+    )
+    ledger.record("sandbox_setup", started_at)
@@ -0,0 +1,23 @@
+from .ledger import (
+    RunLedger,
+    get_run_ledger,
+    ledger_scope,
+    start_run,
+)
+from .profile_cache import (
+    ProfileCache,
+    get_profile_cache,
+    hash_source,
+    set_profile_cache,
+)
+
+__all__ = [
+    "ProfileCache",
+    "RunLedger",
+    "get_profile_cache",
+    "get_run_ledger",
+    "hash_source",
+    "ledger_scope",
+    "set_profile_cache",
+    "start_run",
+]
@@ -0,0 +1,105 @@
+import math
+
+import numpy as np
+import pandas as pd
+
+from src.models import ColumnProfile
+
+
+def is_numeric(series: pd.Series) -> bool:
+    return pd.api.types.is_numeric_dtype(series) and not pd.api.types.is_bool_dtype(
+        series
+    )
+
+
+def top_values(counts: pd.Series, top_k: int) -> dict[str, int]:
+    """件数の多い順（同数は値の昇順）に上位 top_k 件"""
+    if len(counts) > top_k:
+        # 上位 top_k 件目と同数以上の値だけを並べ替えの対象にする
+        counts = counts[counts >= counts.nlargest(top_k).iloc[-1]]
+    keys = counts.index
+    if not pd.api.types.is_numeric_dtype(keys) or pd.api.types.is_bool_dtype(keys):
+        keys = keys.astype(str)
+    order = np.lexsort((keys.to_numpy(), -counts.to_numpy()))[:top_k]
+    return {str(k): int(v) for k, v in counts.iloc[order].items()}
+
+
+def column_profiles(
+    df: pd.DataFrame,
+    top_k: int = 5,
+    bins: int = 10,
+) -> list[ColumnProfile]:
+    """列ごとの件数・欠損率・水準数・上位値・ヒストグラムをまとめて求める"""
+    n_rows = len(df)
+    counts = df.count()
+    profiles = []
+    for column in df.columns:
+        series = df[column]
+        value_counts = series.value_counts()
+        histogram_edges = histogram_counts = None
+        if is_numeric(series) and counts[column] > 0:
+            hist, edges = np.histogram(series.dropna().to_numpy(float), bins=bins)
+            histogram_edges, histogram_counts = edges.tolist(), hist.tolist()
+        profiles.append(
+            ColumnProfile(
+                name=str(column),
+                dtype=str(series.dtype),
+                count=int(counts[column]),
+                null_rate=1 - counts[column] / n_rows if n_rows else 0.0,
+                n_unique=len(value_counts),
+                top_values=top_values(value_counts, top_k),
+                histogram_edges=histogram_edges,
+                histogram_counts=histogram_counts,
+            )
+        )
+    return profiles
+
+
+def correlations(df: pd.DataFrame) -> dict[str, dict[str, float]]:
+    numeric = df[[c for c in df.columns if is_numeric(df[c])]]
+    if numeric.shape[1] < 2:
+        return {}
+    return corr_to_dict(numeric.corr())
+
+
+def corr_to_dict(corr: pd.DataFrame) -> dict[str, dict[str, float]]:
+    return {
+        str(i): {
+            str(j): round(float(v), 4)
+            for j, v in row.items()
+            if not math.isnan(v)
+        }
+        for i, row in corr.iterrows()
+    }
+
+
+def render_column_profiles(
+    profiles: list[ColumnProfile],
+    corr: dict[str, dict[str, float]],
+    n_pairs: int = 5,
+) -> str:
+    """プロンプト用の要約（列ごとの表と、相関の強い列の組）"""
+    rows = [
+        {
+            "column": p.name,
+            "null_rate": round(p.null_rate, 4),
+            "n_unique": f"{p.n_unique}+" if p.n_unique_truncated else p.n_unique,
+            "top_values": ", ".join(f"{k}({v})" for k, v in p.top_values.items()),
+        }
+        for p in profiles
+    ]
+    text = pd.DataFrame(rows).to_markdown(index=False) if rows else ""
+    pairs = sorted(
+        (
+            (abs(v), a, b, v)
+            for a, row in corr.items()
+            for b, v in row.items()
+            if a < b
+        ),
+        reverse=True,
+    )[:n_pairs]
+    if pairs:
+        text += "\n\n相関の強い列の組:\n" + "\n".join(
+            f"- {a} / {b}: {v:.3f}" for _, a, b, v in pairs
+        )
+    return text
@@ -0,0 +1,198 @@
+import hashlib
+import io
+import json
+import threading
+
+from collections.abc import Iterator
+from pathlib import Path
+from typing import Literal
+
+import pandas as pd
+
+from loguru import logger
+
+from src.utils.profile_cache import DataSource, hash_source
+
+try:
+    import pyarrow as pa
+    import pyarrow.ipc as ipc
+    import pyarrow.parquet as pq
+except ImportError:  # 未インストール時はCSVのみ（pandas標準エンジン）
+    pa = None
+    ipc = None
+    pq = None
+
+
+DataFormat = Literal["csv", "parquet", "feather"]
+ColumnarFormat = Literal["parquet", "feather"]
+HAS_PYARROW = pa is not None
+
+SUFFIXES: dict[str, DataFormat] = {
+    ".csv": "csv",
+    ".parquet": "parquet",
+    ".pq": "parquet",
+    ".feather": "feather",
+    ".arrow": "feather",
+    ".ipc": "feather",
+}
+
+
+def detect_format(source: DataSource) -> DataFormat:
+    """拡張子（BytesIO の場合は先頭のマジックバイト）から形式を判定する"""
+    if isinstance(source, io.BytesIO):
+        head = bytes(source.getbuffer()[:6])
+        if head[:4] == b"PAR1":
+            return "parquet"
+        if head == b"ARROW1":
+            return "feather"
+        return "csv"
+    return SUFFIXES.get(Path(source).suffix.lower(), "csv")
+
+
+def _sidecar_path(source: DataSource) -> Path | None:
+    if isinstance(source, io.BytesIO):
+        return None
+    path = Path(source)
+    return path.with_name(f"{path.name}.dtypes.json")
+
+
+def _load_dtypes(source: DataSource) -> dict[str, str] | None:
+    """CSVの隣に保存した型情報（内容が変わっていれば無効）"""
+    sidecar = _sidecar_path(source)
+    if sidecar is None or not sidecar.exists():
+        return None
+    cached = json.loads(sidecar.read_text("utf-8"))
+    if cached.get("content_hash") != hash_source(source):
+        return None
+    # 日時型は dtype では指定できないため推定に任せる
+    return {k: v for k, v in cached["dtypes"].items() if "datetime" not in v}
+
+
+def _save_dtypes(source: DataSource, df: pd.DataFrame) -> None:
+    sidecar = _sidecar_path(source)
+    if sidecar is None:
+        return
+    dtypes = {str(k): str(v) for k, v in df.dtypes.items()}
+    try:
+        sidecar.write_text(
+            json.dumps({"content_hash": hash_source(source), "dtypes": dtypes}),
+            "utf-8",
+        )
+    except OSError as e:
+        logger.warning(f"Could not write dtype sidecar {sidecar}: {e}")
+
+
+def _rewind(source: DataSource) -> None:
+    if isinstance(source, io.BytesIO):
+        source.seek(0)
+
+
+def read_dataframe(
+    source: DataSource,
+    columns: list[str] | None = None,
+) -> pd.DataFrame:
+    """CSV / Parquet / Feather(Arrow IPC) を読み込む（columns で列を絞れる）
+
+    CSVは pyarrow があればマルチスレッドの pyarrow エンジンで読み込み、
+    推定した型を <file>.dtypes.json に保存して次回以降の推定を省く。
+    """
+    _rewind(source)
+    fmt = detect_format(source)
+    if fmt == "parquet":
+        return pd.read_parquet(source, columns=columns)
+    if fmt == "feather":
+        return pd.read_feather(source, columns=columns)
+
+    dtypes = _load_dtypes(source)
+    if dtypes is not None and columns is not None:
+        dtypes = {k: v for k, v in dtypes.items() if k in columns}
+    df = pd.read_csv(
+        source,
+        engine="pyarrow" if pa is not None else "c",
+        usecols=columns,
+        dtype=dtypes,
+    )
+    if dtypes is None and columns is None:
+        _save_dtypes(source, df)
+    return df
+
+
+def iter_dataframe(
+    source: DataSource,
+    chunk_size: int,
+    columns: list[str] | None = None,
+) -> Iterator[pd.DataFrame]:
+    """chunk_size 行ずつ DataFrame を返す（全体をメモリに載せない）"""
+    _rewind(source)
+    fmt = detect_format(source)
+    if fmt == "parquet":
+        parquet_file = pq.ParquetFile(source)
+        for batch in parquet_file.iter_batches(batch_size=chunk_size, columns=columns):
+            yield batch.to_pandas()
+        return
+    if fmt == "feather":
+        # Arrow IPC はレコードバッチ単位でメモリマップから読む
+        source_file = (
+            pa.BufferReader(source.getbuffer())
+            if isinstance(source, io.BytesIO)
+            else pa.memory_map(str(source))
+        )
+        reader = ipc.open_file(source_file)
+        for i in range(reader.num_record_batches):
+            batch = reader.get_batch(i)
+            if columns is not None:
+                batch = batch.select(columns)
+            for offset in range(0, batch.num_rows, chunk_size):
+                yield batch.slice(offset, chunk_size).to_pandas()
+        return
+
+    dtypes = _load_dtypes(source)
+    if dtypes is not None and columns is not None:
+        dtypes = {k: v for k, v in dtypes.items() if k in columns}
+    with pd.read_csv(
+        source, chunksize=chunk_size, usecols=columns, dtype=dtypes
+    ) as reader:
+        yield from reader
+
+
+# (内容ハッシュ, 形式, 列) -> 変換済みバイト列（直近の数件のみ保持）
+_columnar: dict[str, bytes] = {}
+_columnar_lock = threading.Lock()
+MAX_COLUMNAR_ENTRIES = 4
+
+
+def columnar_key(
+    source: DataSource,
+    fmt: ColumnarFormat,
+    columns: list[str] | None = None,
+) -> str:
+    payload = json.dumps([hash_source(source), fmt, columns])
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+def encode_columnar(
+    source: DataSource,
+    fmt: ColumnarFormat = "feather",
+    columns: list[str] | None = None,
+) -> bytes:
+    """zstd 圧縮の Parquet / Feather に変換する（同じ内容は1度だけ変換）
+
+    型情報ごと保存されるため、読み込み側で型推定や文字列の解析が不要になる。
+    """
+    key = columnar_key(source, fmt, columns)
+    with _columnar_lock:
+        if key in _columnar:
+            return _columnar[key]
+        df = read_dataframe(source, columns=columns)
+        buf = io.BytesIO()
+        if fmt == "parquet":
+            df.to_parquet(buf, compression="zstd", index=False)
+        else:
+            df.reset_index(drop=True).to_feather(buf, compression="zstd")
+        if len(_columnar) >= MAX_COLUMNAR_ENTRIES:
+            _columnar.pop(next(iter(_columnar)))
+        _columnar[key] = buf.getvalue()
+        logger.debug(
+            f"Encoded {fmt}: {len(df)} rows -> {len(_columnar[key]) / 1e6:.1f}MB"
+        )
+        return _columnar[key]
@@ -0,0 +1,121 @@
+import contextvars
+import threading
+import time
+import uuid
+
+from collections.abc import Iterator
+from contextlib import contextmanager
+from pathlib import Path
+
+from loguru import logger
+from tabulate import tabulate
+
+from src.llms.models import LLMResponse
+from src.models import LedgerEntry, StageSummary
+
+
+# process_id / thread_id などのタグ（スレッド・タスクごとに独立）
+_tags: contextvars.ContextVar[dict] = contextvars.ContextVar(
+    "ledger_tags", default={}
+)
+
+
+@contextmanager
+def ledger_scope(**tags: str | int | None) -> Iterator[None]:
+    """このブロック内で記録されるエントリにタグを付与する"""
+    token = _tags.set({**_tags.get(), **tags})
+    try:
+        yield
+    finally:
+        _tags.reset(token)
+
+
+class RunLedger:
+    """1回の実行（run）におけるトークン・コスト・処理時間の台帳"""
+
+    def __init__(self, run_id: str | None = None) -> None:
+        self.run_id = run_id or uuid.uuid4().hex[:12]
+        self.entries: list[LedgerEntry] = []
+        self._lock = threading.Lock()
+
+    def record(self, stage: str, started_at: float, **fields: object) -> None:
+        entry = LedgerEntry(
+            run_id=self.run_id,
+            stage=stage,
+            started_at=started_at,
+            wall_seconds=time.time() - started_at,
+            **{**_tags.get(), **fields},
+        )
+        with self._lock:
+            self.entries.append(entry)
+
+    def summary(self) -> list[StageSummary]:
+        with self._lock:
+            entries = list(self.entries)
+        stages: dict[str, list[LedgerEntry]] = {}
+        for entry in entries:
+            stages.setdefault(entry.stage, []).append(entry)
+        return [
+            StageSummary(
+                stage=stage,
+                calls=len(items),
+                errors=sum(1 for e in items if e.error),
+                wall_seconds=sum(e.wall_seconds for e in items),
+                input_tokens=sum(e.input_tokens for e in items),
+                output_tokens=sum(e.output_tokens for e in items),
+                cached_tokens=sum(e.cached_tokens for e in items),
+                trimmed_tokens=sum(e.trimmed_tokens for e in items),
+                cost=sum(e.cost for e in items),
+            )
+            for stage, items in stages.items()
+        ]
+
+    def summary_table(self) -> str:
+        rows = [s.model_dump() for s in self.summary()]
+        return tabulate(rows, headers="keys", tablefmt="github", floatfmt=".4f")
+
+    def export_jsonl(self, path: str | Path) -> Path:
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with self._lock, open(path, "w", encoding="utf-8") as fo:
+            for entry in self.entries:
+                fo.write(entry.model_dump_json() + "\n")
+        logger.success(f"WRITE ... {path}")
+        return path
+
+
+_active: RunLedger | None = None
+
+
+def start_run(run_id: str | None = None) -> RunLedger:
+    global _active
+    _active = RunLedger(run_id)
+    return _active
+
+
+def get_run_ledger() -> RunLedger | None:
+    return _active
+
+
+def record(stage: str, started_at: float, **fields: object) -> None:
+    """実行中のrunがあれば台帳に記録する（なければ何もしない）"""
+    if _active is not None:
+        _active.record(stage, started_at, **fields)
+
+
+def record_llm_response(
+    stage: str | None,
+    started_at: float,
+    llm_response: LLMResponse,
+) -> None:
+    record(
+        stage or "llm",
+        started_at,
+        model=llm_response.model,
+        input_tokens=llm_response.input_tokens,
+        output_tokens=llm_response.output_tokens,
+        cached_tokens=llm_response.cached_tokens,
+        # キャッシュから返した応答は課金されない
+        cost=0.0 if llm_response.from_cache else llm_response.cost or 0.0,
+        from_cache=llm_response.from_cache,
+    )
@@ -0,0 +1,97 @@
+import os
+
+from collections import deque
+
+from e2b_code_interpreter.models import OutputMessage
+
+
+class OutputLimitExceeded(Exception):
+    """出力が上限を超えたため実行を中断した"""
+
+    def __init__(self, total_bytes: int, max_bytes: int) -> None:
+        super().__init__(
+            f"output exceeded {max_bytes} bytes ({total_bytes} bytes so far)"
+        )
+        self.total_bytes = total_bytes
+        self.max_bytes = max_bytes
+
+
+class OutputBuffer:
+    """先頭と末尾だけを保持する出力バッファ（中間は捨ててバイト数だけ数える）"""
+
+    def __init__(self, head_bytes: int, tail_bytes: int) -> None:
+        self.head_bytes = head_bytes
+        self.tail_bytes = tail_bytes
+        self.head = bytearray()
+        self.tail: deque[bytes] = deque()
+        self.tail_size = 0
+        self.total_bytes = 0
+
+    def append(self, text: str) -> None:
+        data = text.encode("utf-8")
+        self.total_bytes += len(data)
+        room = self.head_bytes - len(self.head)
+        if room > 0:
+            self.head += data[:room]
+            data = data[room:]
+        if not data:
+            return
+        self.tail.append(data)
+        self.tail_size += len(data)
+        # 末尾として不要になった古いチャンクを捨てる（リングバッファ）
+        while self.tail and self.tail_size - len(self.tail[0]) >= self.tail_bytes:
+            self.tail_size -= len(self.tail.popleft())
+
+    def text(self) -> str:
+        tail = b"".join(self.tail)[-self.tail_bytes :] if self.tail_bytes else b""
+        omitted = self.total_bytes - len(self.head) - len(tail)
+        if omitted <= 0:
+            return (bytes(self.head) + tail).decode("utf-8", errors="replace")
+        # 切れ目で壊れたマルチバイト文字は捨てる
+        return (
+            self.head.decode("utf-8", errors="ignore")
+            + f"\n... ({omitted} バイト省略) ...\n"
+            + tail.decode("utf-8", errors="ignore")
+        )
+
+
+class OutputCapture:
+    """run_code の on_stdout / on_stderr に渡して出力を逐次受け取る
+
+    stdout と stderr の合計が max_bytes を超えたら OutputLimitExceeded を送出し、
+    サンドボックス側の実行を打ち切らせる。保持するのは各ストリームの
+    先頭 head_bytes と末尾 tail_bytes だけなので、メモリとプロンプトを圧迫しない。
+    """
+
+    def __init__(
+        self,
+        max_bytes: int = 1_000_000,
+        head_bytes: int = 4000,
+        tail_bytes: int = 4000,
+    ) -> None:
+        self.max_bytes = max_bytes
+        self.stdout = OutputBuffer(head_bytes, tail_bytes)
+        self.stderr = OutputBuffer(head_bytes, tail_bytes)
+
+    @classmethod
+    def from_env(cls) -> "OutputCapture":
+        return cls(
+            max_bytes=int(os.getenv("SANDBOX_MAX_OUTPUT_BYTES", "1000000")),
+            head_bytes=int(os.getenv("SANDBOX_OUTPUT_HEAD_BYTES", "4000")),
+            tail_bytes=int(os.getenv("SANDBOX_OUTPUT_TAIL_BYTES", "4000")),
+        )
+
+    @property
+    def total_bytes(self) -> int:
+        return self.stdout.total_bytes + self.stderr.total_bytes
+
+    def on_stdout(self, message: OutputMessage) -> None:
+        self._append(self.stdout, message.line)
+
+    def on_stderr(self, message: OutputMessage) -> None:
+        self._append(self.stderr, message.line)
+
+    def _append(self, buffer: OutputBuffer, text: str) -> None:
+        buffer.append(text)
+        if self.max_bytes > 0 and self.total_bytes > self.max_bytes:
+            raise OutputLimitExceeded(self.total_bytes, self.max_bytes)
@@ -0,0 +1,255 @@
+import ast
+import builtins
+import io
+import re
+import tokenize
+
+from pydantic import BaseModel
+
+
+# サンドボックスで最初から使える名前（set_dataframe と IPython が定義する）
+SANDBOX_NAMES = frozenset(
+    {"df", "pd", "profile", "display", "get_ipython", "In", "Out"}
+)
+MODULE_NAMES = frozenset({"__name__", "__file__", "__doc__", "__builtins__"})
+
+# ヘッドレスのサンドボックスでは動かない、または入力待ちで止まるモジュール
+DISALLOWED_IMPORTS = {
+    "tkinter": "GUIは表示できません",
+    "turtle": "GUIは表示できません",
+    "PyQt5": "GUIは表示できません",
+    "PyQt6": "GUIは表示できません",
+    "PySide2": "GUIは表示できません",
+    "PySide6": "GUIは表示できません",
+    "getpass": "入力待ちで停止します",
+}
+MAX_SLEEP_SECONDS = 60
+
+# Jupyter のマジックコマンド（`!pip ...` / `%matplotlib ...` / `x = !ls`）
+MAGIC_LINE = re.compile(r"^(\s*)[!%]")
+MAGIC_ASSIGN = re.compile(r"^(\s*[\w\s,]+=\s*)[!%].*$")
+
+
+class PreflightIssue(BaseModel):
+    line: int | None
+    kind: str
+    message: str
+
+    def __str__(self) -> str:
+        where = f"{self.line}行目" if self.line else "全体"
+        return f"- {where} [{self.kind}] {self.message}"
+
+
+def _at_statement_start(lines: list[str]) -> bool:
+    """lines の直後が新しい文の先頭か（括弧・文字列・行継続の途中でないか）"""
+    try:
+        for _ in tokenize.generate_tokens(io.StringIO("\n".join(lines)).readline):
+            pass
+    except (tokenize.TokenError, SyntaxError):
+        return False
+    return True
+
+
+def strip_magics(code: str) -> str:
+    """マジックコマンドの行を同じインデントの pass に置き換える（行番号は保つ）
+
+    `!` や `%` で始まっていても、式の途中の継続行（`!= b` や `% n`）は残す。
+    """
+    lines: list[str] = []
+    for line in code.splitlines():
+        if MAGIC_LINE.match(line) or MAGIC_ASSIGN.match(line):
+            if _at_statement_start(lines):
+                if match := MAGIC_ASSIGN.match(line):
+                    line = f"{match.group(1)}None"
+                elif match := MAGIC_LINE.match(line):
+                    line = f"{match.group(1)}pass"
+        lines.append(line)
+    return "\n".join(lines)
+
+
+def parse(code: str) -> ast.Module:
+    """コードを構文解析する（通常の Python として解析できなければマジックを除いて再試行）"""
+    try:
+        return ast.parse(code)
+    except SyntaxError:
+        stripped = strip_magics(code)
+        if stripped == code:
+            raise
+        return ast.parse(stripped)
+
+
+def bound_names(tree: ast.AST) -> set[str]:
+    """コード中のどこかで束縛される名前（出現順やスコープは区別しない）"""
+    names: set[str] = set()
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Name) and isinstance(node.ctx, (ast.Store, ast.Del)):
+            names.add(node.id)
+        elif isinstance(node, (ast.Import, ast.ImportFrom)):
+            for alias in node.names:
+                names.add(alias.asname or alias.name.split(".")[0])
+        elif isinstance(
+            node, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)
+        ):
+            names.add(node.name)
+        elif isinstance(node, ast.arg):
+            names.add(node.arg)
+        elif isinstance(node, ast.ExceptHandler) and node.name:
+            names.add(node.name)
+        elif isinstance(node, (ast.Global, ast.Nonlocal)):
+            names.update(node.names)
+        elif isinstance(node, (ast.MatchAs, ast.MatchStar)) and node.name:
+            names.add(node.name)
+        elif isinstance(node, ast.MatchMapping) and node.rest:
+            names.add(node.rest)
+    return names
+
+
+def code_bound_names(code: str | None) -> set[str]:
+    """実行済みのセルが定義した名前（構文エラーなら空）"""
+    if not code:
+        return set()
+    try:
+        return bound_names(parse(code))
+    except SyntaxError:
+        return set()
+
+
+def _is_dynamic(tree: ast.AST) -> bool:
+    """名前を動的に作り得るコードでは未定義名の検査をしない"""
+    for node in ast.walk(tree):
+        if isinstance(node, ast.ImportFrom) and any(
+            alias.name == "*" for alias in node.names
+        ):
+            return True
+        if (
+            isinstance(node, ast.Call)
+            and isinstance(node.func, ast.Name)
+            and node.func.id in ("exec", "eval", "globals", "locals", "vars")
+        ):
+            return True
+    return False
+
+
+def _undefined_names(tree: ast.AST, known: set[str]) -> list[PreflightIssue]:
+    defined = bound_names(tree) | known | set(dir(builtins)) | MODULE_NAMES
+    issues: dict[str, PreflightIssue] = {}
+    for node in ast.walk(tree):
+        if (
+            isinstance(node, ast.Name)
+            and isinstance(node.ctx, ast.Load)
+            and node.id not in defined
+            and node.id not in issues
+        ):
+            issues[node.id] = PreflightIssue(
+                line=node.lineno,
+                kind="NameError",
+                message=f"`{node.id}` が定義されていません",
+            )
+    return sorted(issues.values(), key=lambda issue: issue.line or 0)
+
+
+def _call_name(node: ast.Call) -> str:
+    func = node.func
+    if isinstance(func, ast.Name):
+        return func.id
+    if isinstance(func, ast.Attribute) and isinstance(func.value, ast.Name):
+        return f"{func.value.id}.{func.attr}"
+    return ""
+
+
+def _has_break(loop: ast.While) -> bool:
+    """ループを抜ける文があるか（ネストしたループ内の break は数えない）"""
+    stack = [(node, False) for node in loop.body]
+    while stack:
+        node, nested = stack.pop()
+        if isinstance(node, (ast.Return, ast.Raise)) or (
+            isinstance(node, ast.Break) and not nested
+        ):
+            return True
+        if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)):
+            continue
+        inner = nested or isinstance(node, (ast.For, ast.AsyncFor, ast.While))
+        stack.extend((child, inner) for child in ast.iter_child_nodes(node))
+    return False
+
+
+def _blocking_patterns(tree: ast.AST) -> list[PreflightIssue]:
+    issues = []
+    for node in ast.walk(tree):
+        if isinstance(node, (ast.Import, ast.ImportFrom)):
+            modules = (
+                [alias.name for alias in node.names]
+                if isinstance(node, ast.Import)
+                else [node.module or ""]
+            )
+            for module in modules:
+                root = module.split(".")[0]
+                if root in DISALLOWED_IMPORTS:
+                    reason = DISALLOWED_IMPORTS[root]
+                    issues.append(
+                        PreflightIssue(
+                            line=node.lineno,
+                            kind="DisallowedImport",
+                            message=f"`{module}` は使えません（{reason}）",
+                        )
+                    )
+        elif isinstance(node, ast.Call):
+            name = _call_name(node)
+            if name == "input":
+                issues.append(
+                    PreflightIssue(
+                        line=node.lineno,
+                        kind="Blocking",
+                        message="`input()` は入力待ちで停止します",
+                    )
+                )
+            elif (
+                name in ("time.sleep", "sleep")
+                and node.args
+                and isinstance(node.args[0], ast.Constant)
+                and isinstance(node.args[0].value, (int, float))
+                and node.args[0].value >= MAX_SLEEP_SECONDS
+            ):
+                issues.append(
+                    PreflightIssue(
+                        line=node.lineno,
+                        kind="LongRunning",
+                        message=f"`{name}({node.args[0].value})` は長すぎます",
+                    )
+                )
+        elif (
+            isinstance(node, ast.While)
+            and isinstance(node.test, ast.Constant)
+            and node.test.value
+            and not _has_break(node)
+        ):
+            issues.append(
+                PreflightIssue(
+                    line=node.lineno,
+                    kind="LongRunning",
+                    message="`while True` に break がなく終了しません",
+                )
+            )
+    return issues
+
+
+def preflight(code: str, known_names: set[str] | None = None) -> list[PreflightIssue]:
+    """実行前に検出できる問題（構文・未定義名・禁止モジュール・停止するコード）
+
+    誤検出で正しいコードを弾かないよう、確実に失敗するものだけを返す。
+    """
+    try:
+        tree = parse(code)
+    except SyntaxError as e:
+        return [
+            PreflightIssue(
+                line=e.lineno,
+                kind="SyntaxError",
+                message=f"{e.msg}: {(e.text or '').strip()}",
+            )
+        ]
+    issues = _blocking_patterns(tree)
+    if not _is_dynamic(tree):
+        known = SANDBOX_NAMES | (known_names or set())
+        issues += _undefined_names(tree, known)
+    return issues
@@ -0,0 +1,138 @@
+import hashlib
+import io
+import os
+import threading
+
+from collections.abc import Callable
+from pathlib import Path
+
+from loguru import logger
+
+from src.models import DatasetProfile, ProfileOptions
+
+
+DataSource = io.BytesIO | str | Path
+
+# (パス, サイズ, 更新時刻) -> 内容ハッシュ（同じファイルを何度も読まないため）
+_file_hashes: dict[tuple[str, int, int], str] = {}
+_hash_lock = threading.Lock()
+
+
+def hash_source(source: DataSource) -> str:
+    """データの内容ハッシュ（パスの場合はサイズと更新時刻が同じ間はメモ化）"""
+    if isinstance(source, io.BytesIO):
+        return hashlib.sha256(source.getbuffer()).hexdigest()
+    path = Path(source).resolve()
+    stat = path.stat()
+    stat_key = (str(path), stat.st_size, stat.st_mtime_ns)
+    with _hash_lock:
+        if stat_key in _file_hashes:
+            return _file_hashes[stat_key]
+    digest = hashlib.sha256()
+    with open(path, "rb") as fi:
+        while block := fi.read(1 << 20):
+            digest.update(block)
+    with _hash_lock:
+        _file_hashes[stat_key] = digest.hexdigest()
+    return _file_hashes[stat_key]
+
+
+def profile_key(content_hash: str, options: ProfileOptions) -> str:
+    """データ内容・作成条件・テンプレート本文から決まるキー"""
+    template = Path(options.template_file).read_bytes()
+    payload = (
+        content_hash.encode()
+        + options.model_dump_json().encode()
+        + hashlib.sha256(template).digest()
+    )
+    return hashlib.sha256(payload).hexdigest()
+
+
+class ProfileCache:
+    """データ概要のキャッシュ（メモリ + 任意でディスク）
+
+    スレッド間で共有し、同じキーの概要は1スレッドだけが作成する。
+    """
+
+    def __init__(self, root_dir: str | Path | None = ".cache/profiles") -> None:
+        self.root_dir = Path(root_dir) if root_dir else None
+        self._memory: dict[str, DatasetProfile] = {}
+        self._key_locks: dict[str, threading.Lock] = {}
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls) -> "ProfileCache":
+        # PROFILE_CACHE_DIR を空にするとメモリのみ
+        return cls(os.getenv("PROFILE_CACHE_DIR", ".cache/profiles"))
+
+    def _path(self, key: str) -> Path | None:
+        return self.root_dir / f"{key}.json" if self.root_dir else None
+
+    def _load(self, key: str) -> DatasetProfile | None:
+        path = self._path(key)
+        if path is None or not path.exists():
+            return None
+        try:
+            return DatasetProfile.model_validate_json(path.read_text("utf-8"))
+        except ValueError as e:
+            logger.warning(f"Broken profile cache {path}: {e}")
+            return None
+
+    def _save(self, key: str, profile: DatasetProfile) -> None:
+        path = self._path(key)
+        if path is None:
+            return
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = path.with_suffix(f".{threading.get_ident()}.tmp")
+        tmp_path.write_text(profile.model_dump_json(), "utf-8")
+        tmp_path.replace(path)
+
+    def get_or_create(
+        self,
+        content_hash: str,
+        options: ProfileOptions,
+        factory: Callable[[], DatasetProfile],
+    ) -> DatasetProfile:
+        key = profile_key(content_hash, options)
+        if key in self._memory:
+            return self._memory[key]
+        with self._lock:
+            key_lock = self._key_locks.setdefault(key, threading.Lock())
+        # 同じデータを複数スレッドが同時に解析しないよう、キーごとに直列化する
+        with key_lock:
+            if key in self._memory:
+                return self._memory[key]
+            profile = self._load(key)
+            if profile is None:
+                profile = factory()
+                self._save(key, profile)
+            else:
+                logger.debug(f"Profile cache hit: {key[:12]}")
+            self._memory[key] = profile
+        return profile
+
+
+_cache: ProfileCache | None = None
+_configured = False
+_cache_lock = threading.Lock()
+
+
+def get_profile_cache() -> ProfileCache | None:
+    """既定のキャッシュ（PROFILE_CACHE=0 で無効）"""
+    global _cache, _configured
+    if os.getenv("PROFILE_CACHE", "1") == "0":
+        return None
+    if not _configured:
+        with _cache_lock:
+            if not _configured:
+                _cache = ProfileCache.from_env()
+                _configured = True
+    return _cache
+
+
+def set_profile_cache(cache: ProfileCache | None) -> None:
+    """既定のキャッシュを差し替える（None で無効）"""
+    global _cache, _configured
+    with _cache_lock:
+        _cache = cache
+        _configured = True
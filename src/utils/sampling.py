@@ -0,0 +1,51 @@
+import numpy as np
+import pandas as pd
+
+
+def categorical_columns(df: pd.DataFrame, max_levels: int = 20) -> list[str]:
+    """層別に使う列（数値以外で水準数が 2 以上 max_levels 以下）"""
+    columns = []
+    for column in df.columns:
+        series = df[column]
+        if pd.api.types.is_numeric_dtype(series) and not pd.api.types.is_bool_dtype(
+            series
+        ):
+            continue
+        if 2 <= series.nunique() <= max_levels:
+            columns.append(column)
+    return columns
+
+
+def stratified_sample(
+    df: pd.DataFrame,
+    n: int,
+    seed: int | None = 0,
+    stratify_by: list[str] | None = None,
+) -> pd.DataFrame:
+    """シード固定で、層別列の水準をなるべく多く含む n 行を選ぶ
+
+    まだ含まれていない (列, 水準) を最も多く含む行を貪欲に選び、
+    同点はシードで決めた順序で解決する。層別列がなければ単純無作為抽出と同じ。
+    """
+    n = min(n, len(df))
+    rng = np.random.default_rng(seed)
+    candidates = df.iloc[rng.permutation(len(df))]
+    stratify_by = [c for c in stratify_by or [] if c in df.columns]
+    if not stratify_by:
+        return candidates.head(n)
+
+    covered: dict[str, set] = {column: set() for column in stratify_by}
+    chosen: list[int] = []
+    available = np.ones(len(candidates), dtype=bool)
+    for _ in range(n):
+        gain = np.zeros(len(candidates), dtype=int)
+        for column in stratify_by:
+            values = candidates[column]
+            gain += (~values.isin(covered[column]) & values.notna()).to_numpy()
+        gain[~available] = -1
+        position = int(np.argmax(gain))
+        available[position] = False
+        chosen.append(position)
+        for column in stratify_by:
+            covered[column].add(candidates[column].iloc[position])
+    return candidates.iloc[chosen]
@@ -0,0 +1,366 @@
+import math
+
+import numpy as np
+import pandas as pd
+
+from src.models import ColumnProfile
+from src.utils.column_stats import is_numeric, corr_to_dict, top_values
+from src.utils.sampling import categorical_columns, stratified_sample
+
+
+MB = 1 << 20
+# 列ごとに件数を数える値の種類の上限（超えたら以降は数えない）
+MAX_TRACKED_VALUES = 10_000
+
+
+def _sizeof_fmt(num: float, suffix: str = "") -> str:
+    # df.info() と同じ表記
+    for unit in ["bytes", "KB", "MB", "GB", "TB"]:
+        if num < 1024.0:
+            return f"{num:3.1f}{suffix} {unit}"
+        num /= 1024.0
+    return f"{num:3.1f}{suffix} PB"
+
+
+def _merge_dtype(current: np.dtype | None, new: np.dtype) -> np.dtype:
+    """チャンク間で型が揺れた場合（欠損で int -> float など）の統合"""
+    if current is None or current == new:
+        return new
+    if pd.api.types.is_numeric_dtype(current) and pd.api.types.is_numeric_dtype(
+        new
+    ) and not (pd.api.types.is_bool_dtype(current) or pd.api.types.is_bool_dtype(new)):
+        return np.dtype("float64")
+    return np.dtype("object")
+
+
+class Reservoir:
+    """一様な固定サイズ標本（Algorithm R をチャンク単位でベクトル化）
+
+    数値配列は ndarray のまま、行は選ばれたもの（pd.Series）だけを list に保持する。
+    """
+
+    def __init__(self, size: int, rng: np.random.Generator) -> None:
+        self.size = size
+        self.rng = rng
+        self.seen = 0
+        self.values: list | np.ndarray = []
+
+    def update(self, values: "np.ndarray | _LazyRows") -> None:
+        n = len(values)
+        if n == 0:
+            return
+        # 空きがある間はそのまま追加
+        fill = min(max(self.size - len(self.values), 0), n)
+        if isinstance(values, np.ndarray):
+            self.values = np.concatenate([np.asarray(self.values), values[:fill]])
+        else:
+            self.values.extend(values[:fill])
+        if fill < n:
+            positions = np.arange(self.seen + fill, self.seen + n)
+            slots = self.rng.integers(0, positions + 1)
+            offsets = np.flatnonzero(slots < self.size)
+            if isinstance(values, np.ndarray):
+                self.values[slots[offsets]] = values[fill + offsets]
+            else:
+                for offset in offsets:
+                    self.values[slots[offset]] = values[fill + offset]
+        self.seen += n
+
+
+class StreamingProfiler:
+    """チャンクごとに df.info / df.describe / df.sample 相当を集計する
+
+    数値列の件数・平均・分散・最小・最大はオンラインで厳密に、
+    分位点は列ごとの固定サイズ標本から近似的に求めるため、
+    メモリ使用量はチャンクサイズと標本サイズだけで決まる。
+    """
+
+    def __init__(
+        self,
+        n_sample: int = 5,
+        quantile_sample_size: int = 10_000,
+        seed: int | None = None,
+        stratify_by: list[str] | None = None,
+        max_levels: int = 20,
+        top_k: int = 5,
+        histogram_bins: int = 10,
+    ) -> None:
+        self.seed = seed
+        self.rng = np.random.default_rng(seed)
+        self.n_sample = n_sample
+        self.n_rows = 0
+        self.memory_bytes = 0
+        self.dtypes: dict[str, np.dtype] = {}
+        self.non_null: dict[str, int] = {}
+        # 数値列の (件数, 平均, 偏差平方和, 最小, 最大)
+        self.moments: dict[str, list[float]] = {}
+        self.quantile_samples: dict[str, Reservoir] = {}
+        self.quantile_sample_size = quantile_sample_size
+        # 層別抽出の候補: 全体の標本と、層別列の水準ごとの標本
+        self.rows = Reservoir(4 * n_sample, self.rng)
+        self.stratify_by = stratify_by
+        self.max_levels = max_levels
+        self.level_rows: dict[str, dict[object, Reservoir]] = {}
+        self.top_k = top_k
+        self.histogram_bins = histogram_bins
+        self.value_counts: dict[str, pd.Series] = {}
+        self.truncated_counts: set[str] = set()
+        # 相関用: 数値列の組ごとに、両方が欠損でない行の (件数, 和, 二乗和, 積和)
+        # （DataFrame.corr() と同じ pairwise で集計する）
+        self.corr_columns: list[str] | None = None
+        self.corr_shift: np.ndarray | None = None
+        self.corr_sums: list = [0.0, 0.0, 0.0, 0.0]
+
+    def update(self, chunk: pd.DataFrame) -> None:
+        # インデックスを通し番号にして、標本の行番号をファイル全体の行番号にする
+        chunk = chunk.set_axis(pd.RangeIndex(self.n_rows, self.n_rows + len(chunk)))
+        if self.stratify_by is None:
+            self.stratify_by = categorical_columns(chunk, self.max_levels)
+        self.memory_bytes += int(chunk.memory_usage(index=False, deep=False).sum())
+        for column in chunk.columns:
+            series = chunk[column]
+            self.dtypes[column] = _merge_dtype(self.dtypes.get(column), series.dtype)
+            self.non_null[column] = self.non_null.get(column, 0) + int(
+                series.count()
+            )
+            if is_numeric(series):
+                self._update_moments(column, series.dropna().to_numpy(float))
+            self._update_value_counts(column, series)
+        self.rows.update(_LazyRows(chunk))
+        self._update_levels(chunk)
+        self._update_corr(chunk)
+        self.n_rows += len(chunk)
+
+    def _update_value_counts(self, column: str, series: pd.Series) -> None:
+        if column in self.truncated_counts:
+            return
+        counts = series.value_counts()
+        if column in self.value_counts:
+            counts = self.value_counts[column].add(counts, fill_value=0)
+        if len(counts) > MAX_TRACKED_VALUES:
+            self.truncated_counts.add(column)
+        self.value_counts[column] = counts
+
+    def _update_corr(self, chunk: pd.DataFrame) -> None:
+        if self.corr_columns is None:
+            self.corr_columns = [c for c in chunk.columns if is_numeric(chunk[c])]
+        if len(self.corr_columns) < 2:
+            return
+        # 途中のチャンクで型が変わった列も数値に変換して集計する
+        # （最終的に数値型にならなかった列は correlations() で除く）
+        values = np.column_stack(
+            [
+                pd.to_numeric(chunk[c], errors="coerce").to_numpy(
+                    dtype=float, na_value=np.nan
+                )
+                for c in self.corr_columns
+            ]
+        )
+        present = ~np.isnan(values)
+        # 桁落ちを避けるため、最初のチャンクの平均を引いてから積和を取る
+        if self.corr_shift is None:
+            counts = present.sum(axis=0)
+            totals = np.where(present, values, 0.0).sum(axis=0)
+            self.corr_shift = np.divide(
+                totals, counts, out=np.zeros_like(totals), where=counts > 0
+            )
+        values = np.where(present, values - self.corr_shift, 0.0)
+        mask = present.astype(float)
+        n, sums, squares, cross = self.corr_sums
+        # [i, j] は列 i と列 j が両方ある行での集計（sums は列 i の和）
+        self.corr_sums = [
+            n + mask.T @ mask,
+            sums + values.T @ mask,
+            squares + (values**2).T @ mask,
+            cross + values.T @ values,
+        ]
+
+    def _update_levels(self, chunk: pd.DataFrame) -> None:
+        for column in self.stratify_by:
+            if column not in chunk.columns:
+                continue
+            levels = self.level_rows.setdefault(column, {})
+            codes, uniques = pd.factorize(chunk[column])
+            for code, level in enumerate(uniques):
+                if level not in levels:
+                    # 水準数が多すぎる列は層別の対象から外れたものとして扱う
+                    if len(levels) >= self.max_levels:
+                        continue
+                    levels[level] = Reservoir(1, self.rng)
+                positions = np.flatnonzero(codes == code)
+                levels[level].update(_LazyRows(chunk.iloc[positions]))
+
+    def _update_moments(self, column: str, values: np.ndarray) -> None:
+        if len(values) == 0:
+            return
+        # Chan らの並列アルゴリズムでチャンクの統計量を合成する
+        n_b, mean_b = len(values), float(values.mean())
+        m2_b = float(((values - mean_b) ** 2).sum())
+        min_b, max_b = float(values.min()), float(values.max())
+        if column not in self.moments:
+            self.moments[column] = [n_b, mean_b, m2_b, min_b, max_b]
+        else:
+            n_a, mean_a, m2_a, min_a, max_a = self.moments[column]
+            n = n_a + n_b
+            delta = mean_b - mean_a
+            self.moments[column] = [
+                n,
+                mean_a + delta * n_b / n,
+                m2_a + m2_b + delta**2 * n_a * n_b / n,
+                min(min_a, min_b),
+                max(max_a, max_b),
+            ]
+        reservoir = self.quantile_samples.setdefault(
+            column, Reservoir(self.quantile_sample_size, self.rng)
+        )
+        reservoir.update(values)
+
+    def info(self) -> str:
+        columns = list(self.dtypes)
+        counts = [f"{self.non_null[c]} non-null" for c in columns]
+        dtypes = [str(self.dtypes[c]) for c in columns]
+        # 各列幅は df.info() と同様に見出しと値の長い方に合わせる
+        width = max([len("Column"), *(len(str(c)) for c in columns)])
+        count_width = max([len("Non-Null Count"), *(len(c) for c in counts)])
+        dtype_width = max([len("Dtype"), *(len(d) for d in dtypes)])
+        lines = [
+            str(pd.DataFrame),
+            f"RangeIndex: {self.n_rows} entries, 0 to {max(self.n_rows - 1, 0)}",
+            f"Data columns (total {len(columns)} columns):",
+            f" #   {'Column':<{width}}  {'Non-Null Count':<{count_width}}  "
+            f"{'Dtype':<{dtype_width}}",
+            f"---  {'------':<{width}}  {'-' * 14:<{count_width}}  "
+            f"{'-----':<{dtype_width}}",
+        ]
+        for i, (column, count, dtype) in enumerate(
+            zip(columns, counts, dtypes, strict=True)
+        ):
+            lines.append(
+                f" {i:<3} {column!s:<{width}}  {count:<{count_width}}  "
+                f"{dtype:<{dtype_width}}"
+            )
+        dtype_counts: dict[str, int] = {}
+        for dtype in dtypes:
+            dtype_counts[dtype] = dtype_counts.get(dtype, 0) + 1
+        plus = "+" if "object" in dtype_counts else ""
+        lines.append(
+            "dtypes: "
+            + ", ".join(f"{k}({v})" for k, v in sorted(dtype_counts.items()))
+        )
+        memory_bytes = self.memory_bytes + pd.RangeIndex(self.n_rows).memory_usage()
+        lines.append(f"memory usage: {_sizeof_fmt(memory_bytes, plus)}")
+        return "\n".join(lines) + "\n"
+
+    def describe(self) -> pd.DataFrame:
+        stats = {}
+        for column, dtype in self.dtypes.items():
+            if column not in self.moments or dtype == np.dtype("object"):
+                continue
+            n, mean, m2, min_, max_ = self.moments[column]
+            q25, q50, q75 = np.quantile(
+                np.asarray(self.quantile_samples[column].values), [0.25, 0.5, 0.75]
+            )
+            stats[column] = [
+                n,
+                mean,
+                math.sqrt(m2 / (n - 1)) if n > 1 else math.nan,
+                min_,
+                q25,
+                q50,
+                q75,
+                max_,
+            ]
+        return pd.DataFrame(
+            stats, index=["count", "mean", "std", "min", "25%", "50%", "75%", "max"]
+        )
+
+    def sample(self) -> pd.DataFrame:
+        candidates = {row.name: row for row in self.rows.values}
+        for levels in self.level_rows.values():
+            for reservoir in levels.values():
+                candidates.update((row.name, row) for row in reservoir.values)
+        if not candidates:
+            return pd.DataFrame(columns=list(self.dtypes))
+        # 行番号順に並べてから選ぶ（同じシードなら同じ結果になる）
+        rows = pd.DataFrame([candidates[k] for k in sorted(candidates)])
+        return stratified_sample(rows, self.n_sample, self.seed, self.stratify_by)
+
+    def column_profiles(self) -> list[ColumnProfile]:
+        profiles = []
+        for column, dtype in self.dtypes.items():
+            counts = self.value_counts.get(column, pd.Series(dtype=int))
+            histogram_edges = histogram_counts = None
+            if column in self.moments and dtype != np.dtype("object"):
+                # 分位点用の標本からヒストグラムを作り、件数を全体に合わせる
+                n, _, _, min_, max_ = self.moments[column]
+                sample = np.asarray(self.quantile_samples[column].values)
+                hist, edges = np.histogram(
+                    sample, bins=self.histogram_bins, range=(min_, max_)
+                )
+                histogram_edges = edges.tolist()
+                histogram_counts = np.round(hist * n / len(sample)).astype(int).tolist()
+            profiles.append(
+                ColumnProfile(
+                    name=str(column),
+                    dtype=str(dtype),
+                    count=self.non_null[column],
+                    null_rate=(
+                        1 - self.non_null[column] / self.n_rows if self.n_rows else 0.0
+                    ),
+                    n_unique=len(counts),
+                    n_unique_truncated=column in self.truncated_counts,
+                    top_values=top_values(counts.astype(int), self.top_k),
+                    histogram_edges=histogram_edges,
+                    histogram_counts=histogram_counts,
+                )
+            )
+        return profiles
+
+    def correlations(self) -> dict[str, dict[str, float]]:
+        if self.corr_columns is None or len(self.corr_columns) < 2:
+            return {}
+        n, sums, squares, cross = self.corr_sums
+        if not isinstance(n, np.ndarray):
+            return {}
+        with np.errstate(divide="ignore", invalid="ignore"):
+            mean_x, mean_y = sums / n, sums.T / n
+            cov = cross / n - mean_x * mean_y
+            var_x = squares / n - mean_x**2
+            var_y = squares.T / n - mean_y**2
+            corr = cov / np.sqrt(var_x * var_y)
+        corr[(n < 2) | ~np.isfinite(corr)] = np.nan
+        corr = pd.DataFrame(
+            np.clip(corr, -1.0, 1.0),
+            index=self.corr_columns,
+            columns=self.corr_columns,
+        )
+        # 全体で数値型にならなかった列（途中で文字列が混ざった列など）は除く
+        numeric = [c for c in self.corr_columns if is_numeric(self.dtypes[c])]
+        if len(numeric) < 2:
+            return {}
+        return corr_to_dict(corr.loc[numeric, numeric])
+
+
+class _LazyRows:
+    """標本に選ばれた行だけを取り出す（チャンク全体を行に分解しない）"""
+
+    def __init__(self, chunk: pd.DataFrame) -> None:
+        self.chunk = chunk
+
+    def __len__(self) -> int:
+        return len(self.chunk)
+
+    def __getitem__(self, i: int | slice) -> pd.Series | list[pd.Series]:
+        if isinstance(i, slice):
+            return [row for _, row in self.chunk.iloc[i].iterrows()]
+        return self.chunk.iloc[i]
+
+
+def estimate_chunk_rows(
+    head: pd.DataFrame,
+    max_memory_mb: float,
+    min_rows: int = 1_000,
+) -> int:
+    """先頭行のメモリ使用量から、上限の1/4に収まるチャンク行数を見積もる"""
+    bytes_per_row = head.memory_usage(deep=True).sum() / max(len(head), 1)
+    return max(min_rows, int(max_memory_mb * MB / 4 / max(bytes_per_row, 1)))
@@ -0,0 +1,95 @@
+import socket
+import subprocess
+import sys
+
+from multiprocessing.connection import Connection
+
+import pytest
+
+from src.sandbox.local import WORKER
+
+
+@pytest.fixture
+def worker():
+    parent, child = socket.socketpair()
+    process = subprocess.Popen(
+        [sys.executable, str(WORKER), str(child.fileno()), "0", "0"],
+        pass_fds=(child.fileno(),),
+        stdin=subprocess.DEVNULL,
+    )
+    child.close()
+    conn = Connection(parent.detach())
+    yield conn
+    conn.send(None)
+    process.wait(timeout=10)
+    conn.close()
+
+
+def run(conn: Connection, code: str) -> tuple[list[dict], dict]:
+    conn.send(code)
+    messages = []
+    while True:
+        assert conn.poll(10)
+        message = conn.recv()
+        if message["type"] == "execution":
+            return messages, message
+        messages.append(message)
+
+
+def test_print_after_flush_interval_arrives_as_one_line(worker):
+    # 時間経過による送信で print の本文と改行が別のメッセージに分かれないこと
+    messages, execution = run(
+        worker, "import json, time\ntime.sleep(0.2)\nprint(json.dumps({'a': 1}))"
+    )
+    assert execution["error"] is None
+    assert [m["text"] for m in messages] == ['{"a": 1}\n']
+
+
+def test_streamed_lines_are_complete(worker):
+    messages, execution = run(
+        worker,
+        "import time\n"
+        "for i in range(30):\n"
+        "    print('row', i)\n"
+        "    time.sleep(0.01)",
+    )
+    assert execution["error"] is None
+    assert len(messages) > 1
+    assert all(m["text"].endswith("\n") for m in messages)
+    assert "".join(m["text"] for m in messages) == "".join(
+        f"row {i}\n" for i in range(30)
+    )
+
+
+def test_partial_line_is_sent_at_end_of_cell(worker):
+    messages, _ = run(worker, "import sys\nsys.stdout.write('no newline')")
+    assert "".join(m["text"] for m in messages) == "no newline"
+
+
+def test_shell_magics_run_like_ipython(worker):
+    messages, execution = run(
+        worker,
+        "!echo hello\n"
+        "files = !echo a; echo b\n"
+        "%matplotlib inline\n"
+        "print(files)",
+    )
+    assert execution["error"] is None
+    assert "".join(m["text"] for m in messages) == "hello\n['a', 'b']\n"
+
+
+def test_pip_magic_uses_the_kernel_interpreter(worker):
+    messages, execution = run(worker, "%pip --version")
+    assert execution["error"] is None
+    assert "pip" in "".join(m["text"] for m in messages)
+
+
+def test_continuation_lines_are_not_magics(worker):
+    messages, execution = run(worker, "x = (3\n!= 4)\ny = (7\n% 4)\nprint(x, y)")
+    assert execution["error"] is None
+    assert "".join(m["text"] for m in messages) == "True 3\n"
+
+
+def test_unknown_line_magic_is_an_error(worker):
+    _, execution = run(worker, "%timeit sum(range(10))")
+    assert execution["error"]["name"] == "NameError"
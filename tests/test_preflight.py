@@ -0,0 +1,62 @@
+import pytest
+
+from src.utils.preflight import code_bound_names, preflight
+
+
+@pytest.mark.parametrize(
+    "code",
+    [
+        # `!` / `%` で始まる継続行はマジックではない
+        "a, b = 1, 2\nif (a\n    != b):\n    print(a)",
+        'n = 3\nmessage = ("%d rows"\n % n)',
+        "x = 10\ny = (\n    x\n    % 3\n)",
+        "x = 10\ny = x \\\n    % 3",
+        # マジックコマンドは除いて検査する
+        "!pip install -q seaborn\nimport seaborn as sns\nprint(sns)",
+        "%matplotlib inline\nfor i in range(3):\n    %time print(i)",
+        "files = !ls\nprint(files)",
+    ],
+)
+def test_valid_code_passes(code):
+    assert preflight(code) == []
+
+
+def test_magic_and_continuation_in_same_cell():
+    code = "%matplotlib inline\na = 1\nok = (a\n      != 2)\nprint(ok)"
+    assert preflight(code) == []
+
+
+def test_syntax_error():
+    issues = preflight("print(df.shape")
+    assert [issue.kind for issue in issues] == ["SyntaxError"]
+
+
+def test_undefined_name():
+    issues = preflight("print(df.shape)\nprint(total)")
+    assert [(issue.kind, issue.line) for issue in issues] == [("NameError", 2)]
+
+
+def test_known_names_from_previous_cells():
+    known = code_bound_names("total = df['score'].sum()")
+    assert preflight("print(total)", known) == []
+
+
+def test_dynamic_code_skips_name_check():
+    assert preflight("exec('z = 1')\nprint(z)") == []
+
+
+@pytest.mark.parametrize(
+    ("code", "kind"),
+    [
+        ("import tkinter", "DisallowedImport"),
+        ("name = input()", "Blocking"),
+        ("import time\ntime.sleep(600)", "LongRunning"),
+        ("while True:\n    pass", "LongRunning"),
+    ],
+)
+def test_blocking_patterns(code, kind):
+    assert [issue.kind for issue in preflight(code)] == [kind]
+
+
+def test_while_true_with_break_passes():
+    assert preflight("while True:\n    break") == []
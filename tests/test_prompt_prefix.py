@@ -0,0 +1,70 @@
+import io
+import json
+
+import pytest
+
+from src.models import DataThread
+from src.modules import describe_dataframe
+from src.modules.generate_code import build_messages as build_code_messages
+from src.modules.generate_review import build_messages as build_review_messages
+
+
+USER_REQUESTS = ["スコアの分布を可視化して", "チャネル別の購入金額を比較して"]
+
+
+@pytest.fixture(scope="module")
+def data_info() -> str:
+    with open("data/sample.csv", "rb") as fi:
+        file_object = io.BytesIO(fi.read())
+    return describe_dataframe(file_object=file_object)
+
+
+def prefix(messages: list[dict]) -> str:
+    return json.dumps(messages[0], ensure_ascii=False, sort_keys=True)
+
+
+def previous_thread(idx: int, thread_id: int, user_request: str) -> DataThread:
+    return DataThread(
+        process_id=f"sample-{idx}",
+        thread_id=thread_id,
+        user_request=user_request,
+        code="print(df.shape)",
+        stdout="(500, 19)",
+        stderr="FutureWarning: ...",
+        observation="グラフが保存されていません",
+        namespace="df: DataFrame shape=(500, 19)",
+    )
+
+
+def test_code_prompt_prefix_is_shared_by_all_tasks_and_retries(data_info):
+    # 先頭（テンプレート+data_info）が変わるとプロンプトキャッシュが効かない
+    prefixes = set()
+    for idx, user_request in enumerate(USER_REQUESTS):
+        thread = None
+        for thread_id in range(3):
+            messages = build_code_messages(
+                data_info,
+                user_request,
+                f"outputs/sample-{idx}",
+                thread,
+                "src/prompts/generate_code.jinja",
+            )
+            prefixes.add(prefix(messages))
+            thread = previous_thread(idx, thread_id, user_request)
+    assert len(prefixes) == 1
+
+
+def test_review_prompt_prefix_is_shared_by_all_tasks_and_retries(data_info):
+    prefixes = set()
+    for idx, user_request in enumerate(USER_REQUESTS):
+        for thread_id in range(3):
+            messages = build_review_messages(
+                data_info,
+                user_request,
+                previous_thread(idx, thread_id, user_request),
+                False,
+                f"outputs/sample-{idx}",
+                "src/prompts/generate_review.jinja",
+            )
+            prefixes.add(prefix(messages))
+    assert len(prefixes) == 1